@@ -0,0 +1,250 @@
+import sys
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+
+import banco
+
+# Importado na primeira análise (_carregar_numpy): não pesa na abertura do caixa
+numpy = None
+
+# ---------------- Análise de vendas ----------------
+# Lê as linhas de itens_venda do período em blocos (banco.em_blocos) e
+# acumula cada bloco com numpy.bincount em vetores indexados pelo id do
+# produto e pela célula dia da semana x hora, sem laço Python por linha.
+# A memória depende do número de produtos, não do número de linhas do
+# período. O resumo de cada período fica em cache; períodos que ainda
+# podem receber vendas são refeitos quando entram vendas novas. Requer o pacote opcional numpy.
+#
+#   python analise.py inicio fim [pdv.db]
+
+class ErroAnalise(Exception):
+    pass
+
+DIAS_SEMANA = ("Seg", "Ter", "Qua", "Qui", "Sex", "Sáb", "Dom")
+HORAS = 24
+CLASSES_ABC = ("A", "B", "C")
+# Fatia acumulada da receita: A até 80%, B até 95%, C o resto
+LIMITES_ABC = (0.80, 0.95)
+PERIODOS_EM_CACHE = 8
+LIMITE_LISTAS = 20
+
+class ResumoVendas:
+    def __init__(self, inicio, fim, ultima_venda):
+        self.inicio = inicio
+        self.fim = fim
+        self.dias = (date.fromisoformat(fim) - date.fromisoformat(inicio)).days + 1
+        # Maior id de venda quando o resumo foi feito: outro valor indica vendas novas
+        self.ultima_venda = ultima_venda
+        self.linhas = 0
+        self.vendas = 0
+        # Posição = id do produto
+        self.receita = numpy.zeros(0)
+        self.quantidade = numpy.zeros(0)
+        # Linha = dia da semana (0 = segunda), coluna = hora
+        self.mapa_receita = numpy.zeros((len(DIAS_SEMANA), HORAS))
+        self.mapa_vendas = numpy.zeros((len(DIAS_SEMANA), HORAS))
+
+def _somar(acumulado, indices, pesos=None):
+    # Soma por índice; cresce o vetor se aparecer um id maior
+    soma = numpy.bincount(indices, weights=pesos, minlength=len(acumulado)).astype(numpy.float64)
+    soma[:len(acumulado)] += acumulado
+    return soma
+
+def _carregar_numpy():
+    global numpy
+    if numpy is None:
+        try:
+            import numpy as modulo
+        except ImportError:
+            raise ErroAnalise("A análise de vendas requer o pacote numpy (pip install numpy)")
+        numpy = modulo
+
+def _data(texto):
+    try:
+        return date.fromisoformat(texto).isoformat()
+    except (TypeError, ValueError):
+        raise ErroAnalise(f"Data inválida: {texto} (use AAAA-MM-DD)")
+
+def resumir(inicio, fim):
+    # Thread-safe: uma passada pelas linhas do período
+    _carregar_numpy()
+    resumo = ResumoVendas(inicio, fim, banco.ultima_venda())
+    celulas = len(DIAS_SEMANA) * HORAS
+    mapa_receita = numpy.zeros(celulas)
+    mapa_vendas = numpy.zeros(celulas)
+    venda_anterior = -1
+    for bloco in banco.blocos_analise(inicio, fim):
+        # venda_id, célula (dia da semana * 24 + hora), produto_id, quantidade, total_item
+        dados = numpy.array(bloco, dtype=numpy.float64)
+        venda = dados[:, 0].astype(numpy.int64)
+        celula = dados[:, 1].astype(numpy.intp)
+        produto = dados[:, 2].astype(numpy.intp)
+
+        resumo.receita = _somar(resumo.receita, produto, dados[:, 4])
+        resumo.quantidade = _somar(resumo.quantidade, produto, dados[:, 3])
+        mapa_receita += numpy.bincount(celula, weights=dados[:, 4], minlength=celulas)
+        # Os itens de uma venda vêm juntos: a primeira linha de cada venda conta a venda
+        primeira = numpy.empty(len(venda), dtype=bool)
+        primeira[0] = venda[0] != venda_anterior
+        primeira[1:] = venda[1:] != venda[:-1]
+        mapa_vendas += numpy.bincount(celula[primeira], minlength=celulas)
+        venda_anterior = venda[-1]
+        resumo.linhas += len(bloco)
+        resumo.vendas += int(primeira.sum())
+    resumo.mapa_receita = mapa_receita.reshape(len(DIAS_SEMANA), HORAS)
+    resumo.mapa_vendas = mapa_vendas.reshape(len(DIAS_SEMANA), HORAS)
+    return resumo
+
+# ---------------- Cache por período ----------------
+_cache = OrderedDict()
+_trava_cache = threading.Lock()
+
+def _periodo_fechado(fim):
+    # vendas.data é gravada em UTC (CURRENT_TIMESTAMP); folga de um dia
+    return fim < (datetime.now(timezone.utc).date() - timedelta(days=1)).isoformat()
+
+def resumo_periodo(inicio, fim):
+    _carregar_numpy()
+    inicio, fim = _data(inicio), _data(fim)
+    if fim < inicio:
+        raise ErroAnalise("A data final é anterior à inicial!")
+    chave = (banco.caminho_banco(), inicio, fim)
+    with _trava_cache:
+        resumo = _cache.get(chave)
+    if resumo is not None and (_periodo_fechado(fim) or resumo.ultima_venda == banco.ultima_venda()):
+        with _trava_cache:
+            _cache.move_to_end(chave)
+        return resumo
+    resumo = resumir(inicio, fim)
+    with _trava_cache:
+        _cache[chave] = resumo
+        while len(_cache) > PERIODOS_EM_CACHE:
+            _cache.popitem(last=False)
+    return resumo
+
+def limpar_cache():
+    with _trava_cache:
+        _cache.clear()
+
+# ---------------- Indicadores ----------------
+def _nomes(ids):
+    return {linha[0]: linha[1] for linha in banco.linhas_estoque(ids)} if len(ids) else {}
+
+def _maiores(valores, limite):
+    # Índices dos `limite` maiores valores positivos, do maior para o menor
+    limite = min(limite, int(numpy.count_nonzero(valores > 0)))
+    if not limite:
+        return numpy.zeros(0, dtype=numpy.intp)
+    ids = numpy.argpartition(-valores, limite - 1)[:limite]
+    return ids[numpy.argsort(-valores[ids], kind="stable")]
+
+def mais_vendidos(resumo, por="receita", limite=LIMITE_LISTAS):
+    # [(produto_id, nome, quantidade, receita)]
+    ids = _maiores(resumo.receita if por == "receita" else resumo.quantidade, limite)
+    nomes = _nomes(ids.tolist())
+    return [(prod_id, nomes.get(prod_id, f"#{prod_id}"), int(resumo.quantidade[prod_id]),
+             float(resumo.receita[prod_id])) for prod_id in ids.tolist()]
+
+def curva_abc(resumo):
+    # Produtos vendidos, da maior receita para a menor, e a classe de cada
+    # um (0 = A, 1 = B, 2 = C) pela fatia acumulada antes dele
+    vendidos = numpy.flatnonzero(resumo.receita > 0)
+    ids = vendidos[numpy.argsort(-resumo.receita[vendidos], kind="stable")]
+    receita = resumo.receita[ids]
+    if not len(ids):
+        return ids, numpy.zeros(0, dtype=numpy.intp)
+    acumulada_antes = (numpy.cumsum(receita) - receita) / receita.sum()
+    return ids, numpy.searchsorted(LIMITES_ABC, acumulada_antes, side="right")
+
+def resumo_abc(resumo):
+    # [(classe, produtos, receita, fatia da receita)]
+    ids, classes = curva_abc(resumo)
+    receita = resumo.receita[ids]
+    total = receita.sum()
+    produtos = numpy.bincount(classes, minlength=len(CLASSES_ABC))
+    receitas = numpy.bincount(classes, weights=receita, minlength=len(CLASSES_ABC))
+    return [(classe, int(produtos[i]), float(receitas[i]), float(receitas[i] / total) if total else 0.0)
+            for i, classe in enumerate(CLASSES_ABC)]
+
+def _estoque_atual():
+    # (estoque por id, cadastrado por id)
+    ids = []
+    estoques = []
+    for bloco in banco.blocos_estoque_atual():
+        dados = numpy.array(bloco, dtype=numpy.int64).reshape(-1, 2)
+        ids.append(dados[:, 0])
+        estoques.append(dados[:, 1])
+    ids = numpy.concatenate(ids) if ids else numpy.zeros(0, dtype=numpy.int64)
+    tamanho = int(ids.max()) + 1 if len(ids) else 0
+    estoque = numpy.zeros(tamanho)
+    cadastrado = numpy.zeros(tamanho, dtype=bool)
+    if tamanho:
+        estoque[ids] = numpy.concatenate(estoques)
+        cadastrado[ids] = True
+    return estoque, cadastrado
+
+def giro_estoque(resumo, limite=LIMITE_LISTAS, parados=False):
+    # Dias de estoque = estoque atual / média diária vendida no período.
+    # parados=False: os que acabam primeiro; True: os que mais demoram a
+    # girar (sem venda no período conta como infinito).
+    # [(produto_id, nome, estoque, media_diaria, dias)]
+    estoque, cadastrado = _estoque_atual()
+    quantidade = numpy.zeros(len(estoque))
+    comum = min(len(estoque), len(resumo.quantidade))
+    quantidade[:comum] = resumo.quantidade[:comum]
+    media = quantidade / resumo.dias
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        dias = numpy.where(media > 0, estoque / media, numpy.inf)
+    if parados:
+        candidatos = numpy.flatnonzero(cadastrado & (estoque > 0))
+        ordem = numpy.argsort(-dias[candidatos], kind="stable")
+    else:
+        candidatos = numpy.flatnonzero(cadastrado & (estoque > 0) & (media > 0))
+        ordem = numpy.argsort(dias[candidatos], kind="stable")
+    ids = candidatos[ordem[:limite]].tolist()
+    nomes = _nomes(ids)
+    return [(prod_id, nomes.get(prod_id, f"#{prod_id}"), int(estoque[prod_id]), float(media[prod_id]),
+             float(dias[prod_id])) for prod_id in ids]
+
+class Analise:
+    def __init__(self, resumo, limite=LIMITE_LISTAS):
+        self.resumo = resumo
+        self.por_receita = mais_vendidos(resumo, "receita", limite)
+        self.por_quantidade = mais_vendidos(resumo, "quantidade", limite)
+        self.abc = resumo_abc(resumo)
+        self.acabando = giro_estoque(resumo, limite)
+        self.parados = giro_estoque(resumo, limite, parados=True)
+
+def analisar(inicio, fim, limite=LIMITE_LISTAS):
+    # Thread-safe: tudo que a tela mostra, calculado fora da thread do Tk
+    return Analise(resumo_periodo(inicio, fim), limite)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Uso: python analise.py inicio fim [pdv.db]")
+        sys.exit(2)
+    banco.iniciar(sys.argv[3] if len(sys.argv) > 3 else banco.CAMINHO_BANCO)
+    try:
+        analise = analisar(sys.argv[1], sys.argv[2])
+    except ErroAnalise as e:
+        print(e)
+        sys.exit(1)
+    finally:
+        banco.fechar()
+    resumo = analise.resumo
+    print(f"{resumo.inicio} a {resumo.fim}: {resumo.vendas} vendas, {resumo.linhas} itens, "
+          f"R$ {resumo.receita.sum():.2f}")
+    print("\nMais vendidos (receita):")
+    for prod_id, nome, quantidade, receita in analise.por_receita[:10]:
+        print(f"  {nome[:40]:<40} {quantidade:>8} un  R$ {receita:>12.2f}")
+    print("\nCurva ABC:")
+    for classe, produtos, receita, fatia in analise.abc:
+        print(f"  {classe}: {produtos:>6} produtos  R$ {receita:>14.2f}  ({fatia:.1%})")
+    print("\nVendas por hora (" + " ".join(DIAS_SEMANA) + "):")
+    for hora in range(HORAS):
+        if resumo.mapa_vendas[:, hora].any():
+            print(f"  {hora:02d}h " + " ".join(f"{int(v):>5}" for v in resumo.mapa_vendas[:, hora]))
+    print("\nAcabam primeiro:")
+    for prod_id, nome, estoque, media, dias in analise.acabando[:10]:
+        print(f"  {nome[:40]:<40} estoque {estoque:>6}  {media:>7.2f}/dia  {dias:>7.1f} dias")
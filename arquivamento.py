@@ -0,0 +1,252 @@
+import os
+import sqlite3
+import sys
+from datetime import datetime, timezone
+
+import backup
+import banco
+
+# ---------------- Arquivamento de vendas ----------------
+# Move os meses fechados de vendas e itens_venda para arquivos separados
+# (pdv_AAAAMM.db, ao lado do banco), para o banco do dia a dia continuar
+# pequeno: backups, VACUUM e relatórios ficam proporcionais aos meses
+# recentes. Os relatórios por período e a busca de uma venda por id
+# continuam vendo os meses arquivados (banco.particao).
+#
+# Cada mês é arquivado em duas etapas. A cópia roda numa conexão própria
+# da partição, lendo o banco anexado somente leitura (não trava o caixa);
+# a partição é gravada, conferida linha a linha contra o banco e só então
+# as linhas do mês saem do banco, numa transação que confere de novo as
+# contagens. Uma falha no meio deixa no máximo o mês nos dois lugares, e
+# rodar de novo termina o serviço. A remoção trava as vendas enquanto
+# dura: rode fora do horário de movimento.
+#
+#   python arquivamento.py [--meses N] [--sem-backup] [pdv.db]
+#   python arquivamento.py --compactar [pdv.db]
+
+class ErroArquivamento(Exception):
+    pass
+
+# Meses que ficam no banco principal, contando o atual
+MESES_NO_BANCO = 3
+
+# ---------------- SQL da partição ----------------
+# Executado na conexão da partição (main) com o banco anexado como "quente"
+SQL_CRIAR_PARTICAO = [
+    """CREATE TABLE IF NOT EXISTS vendas (
+        id INTEGER PRIMARY KEY,
+        data TIMESTAMP,
+        total_geral REAL,
+        caixa INTEGER NOT NULL DEFAULT 1
+    )""",
+    """CREATE TABLE IF NOT EXISTS itens_venda (
+        id INTEGER PRIMARY KEY,
+        venda_id INTEGER,
+        produto_id INTEGER,
+        quantidade INTEGER,
+        preco_unitario REAL,
+        total_item REAL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_vendas_data ON vendas (data)",
+    "CREATE INDEX IF NOT EXISTS idx_itens_venda_venda ON itens_venda (venda_id)",
+    "CREATE INDEX IF NOT EXISTS idx_itens_venda_produto ON itens_venda (produto_id)",
+]
+
+SQL_MES_QUENTE = """SELECT COUNT(*), MAX(id) FROM quente.vendas
+WHERE data >= :inicio AND data < DATE(:inicio, '+1 month')"""
+
+SQL_ITENS_MES_QUENTE = """SELECT COUNT(*) FROM quente.vendas v
+JOIN quente.itens_venda i ON i.venda_id = v.id
+WHERE v.data >= :inicio AND v.data < DATE(:inicio, '+1 month') AND v.id <= :ultima"""
+
+SQL_COPIAR_VENDAS = """INSERT OR IGNORE INTO main.vendas (id, data, total_geral, caixa)
+SELECT id, data, total_geral, caixa FROM quente.vendas
+WHERE data >= :inicio AND data < DATE(:inicio, '+1 month') AND id <= :ultima"""
+
+SQL_COPIAR_ITENS = """INSERT OR IGNORE INTO main.itens_venda
+    (id, venda_id, produto_id, quantidade, preco_unitario, total_item)
+SELECT i.id, i.venda_id, i.produto_id, i.quantidade, i.preco_unitario, i.total_item
+FROM quente.vendas v
+JOIN quente.itens_venda i ON i.venda_id = v.id
+WHERE v.data >= :inicio AND v.data < DATE(:inicio, '+1 month') AND v.id <= :ultima"""
+
+# Linhas do banco que não estão iguais na partição: as duas contagens têm de dar zero
+SQL_CONFERIR_COPIA = """SELECT
+    (SELECT COUNT(*) FROM quente.vendas v
+     WHERE v.data >= :inicio AND v.data < DATE(:inicio, '+1 month') AND v.id <= :ultima
+       AND NOT EXISTS (SELECT 1 FROM main.vendas p WHERE p.id = v.id AND p.data IS v.data
+                       AND p.total_geral IS v.total_geral AND p.caixa IS v.caixa)),
+    (SELECT COUNT(*) FROM quente.vendas v
+     JOIN quente.itens_venda i ON i.venda_id = v.id
+     WHERE v.data >= :inicio AND v.data < DATE(:inicio, '+1 month') AND v.id <= :ultima
+       AND NOT EXISTS (SELECT 1 FROM main.itens_venda p WHERE p.id = i.id AND p.venda_id IS i.venda_id
+                       AND p.produto_id IS i.produto_id AND p.quantidade IS i.quantidade
+                       AND p.preco_unitario IS i.preco_unitario AND p.total_item IS i.total_item))"""
+
+# primeira_venda, ultima_venda, vendas, itens, total: a linha de particoes_vendas
+SQL_RESUMO_PARTICAO = """SELECT MIN(id), MAX(id), COUNT(*), (SELECT COUNT(*) FROM itens_venda),
+    COALESCE(SUM(total_geral), 0)
+FROM vendas"""
+
+def _conectar_particao(caminho):
+    # Diário de rollback (não WAL): a partição é um arquivo só, que pode
+    # ser copiado ou compactado sem levar -wal/-shm junto
+    conn = sqlite3.connect(f"file:{caminho}", uri=True, isolation_level=None)
+    conn.execute(f"PRAGMA busy_timeout = {banco.PRAGMAS['busy_timeout']}")
+    conn.execute("PRAGMA journal_mode = DELETE")
+    conn.execute("PRAGMA synchronous = FULL")
+    return conn
+
+def _copiar_mes(caminho, inicio):
+    # (vendas, itens, maior id) copiados, ou None se o mês não tem vendas no banco
+    conn = _conectar_particao(caminho)
+    try:
+        for sql in SQL_CRIAR_PARTICAO:
+            conn.execute(sql)
+        conn.execute("ATTACH DATABASE ? AS quente", (f"file:{banco.caminho_banco()}?mode=ro",))
+        # Uma transação só: a leitura do banco é um retrato fixo do começo ao fim
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            vendas, ultima = conn.execute(SQL_MES_QUENTE, {"inicio": inicio}).fetchone()
+            if not vendas:
+                conn.execute("ROLLBACK")
+                return None
+            parametros = {"inicio": inicio, "ultima": ultima}
+            conn.execute(SQL_COPIAR_VENDAS, parametros)
+            conn.execute(SQL_COPIAR_ITENS, parametros)
+            faltam_vendas, faltam_itens = conn.execute(SQL_CONFERIR_COPIA, parametros).fetchone()
+            if faltam_vendas or faltam_itens:
+                raise ErroArquivamento(f"{caminho}: {faltam_vendas} vendas e {faltam_itens} itens "
+                                       f"diferentes do banco; nada foi removido")
+            itens = conn.execute(SQL_ITENS_MES_QUENTE, parametros).fetchone()[0]
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("DETACH DATABASE quente")
+        return vendas, itens, ultima
+    finally:
+        conn.close()
+
+def _resumo_particao(caminho):
+    conn = sqlite3.connect(f"file:{caminho}?mode=ro", uri=True)
+    try:
+        return conn.execute(SQL_RESUMO_PARTICAO).fetchone()
+    finally:
+        conn.close()
+
+def arquivar_mes(mes, copia_backup=True):
+    # mes: "AAAA-MM". Retorna (vendas, itens) removidos do banco, ou None
+    # se o mês não tinha vendas lá
+    arquivo = banco.arquivo_particao(mes)
+    caminho = banco.caminho_particao(arquivo)
+    inicio = mes + "-01"
+    nova = not os.path.exists(caminho)
+    copiado = _copiar_mes(caminho, inicio)
+    if copiado is None:
+        # Mês sem vendas: não deixa partição vazia para trás
+        if nova:
+            os.remove(caminho)
+        return None
+    vendas, itens, ultima = copiado
+    resumo = _resumo_particao(caminho)
+
+    with banco.transacao() as cursor:
+        parametros = {"inicio": inicio, "ultima": ultima}
+        # Algo mudou no mês entre a cópia e agora: melhor não remover nada
+        if cursor.execute(banco.SQL_CONTAR_MES, parametros).fetchone() != (vendas, itens):
+            raise ErroArquivamento(f"As vendas de {mes} mudaram durante o arquivamento; tente de novo")
+        cursor.execute(banco.SQL_APAGAR_ITENS_MES, parametros)
+        cursor.execute(banco.SQL_APAGAR_VENDAS_MES, parametros)
+        cursor.execute(banco.SQL_REGISTRAR_PARTICAO, (mes, arquivo, *resumo))
+
+    if copia_backup:
+        # As partições não entram mais no backup do banco: cada uma ganha a sua
+        os.makedirs(backup.DIRETORIO_BACKUP, exist_ok=True)
+        backup.compactar(caminho, os.path.join(backup.DIRETORIO_BACKUP, f"particao_{arquivo}.gz"))
+    return vendas, itens
+
+def meses_para_arquivar(meses_no_banco=MESES_NO_BANCO):
+    # Do mês da venda mais antiga do banco até antes dos `meses_no_banco`
+    # mais recentes. vendas.data é gravada em UTC.
+    primeiro = banco.primeiro_mes_vendas()
+    if primeiro is None:
+        return []
+    hoje = datetime.now(timezone.utc).date()
+    corte = hoje.year * 12 + hoje.month - 1 - (meses_no_banco - 1)
+    ano, mes = map(int, primeiro.split("-"))
+    return [f"{numero // 12:04d}-{numero % 12 + 1:02d}" for numero in range(ano * 12 + mes - 1, corte)]
+
+def arquivar(meses_no_banco=MESES_NO_BANCO, copia_backup=True, ao_arquivar=None):
+    # ao_arquivar(mes, vendas, itens) a cada mês movido. Retorna [(mes, vendas, itens)].
+    if meses_no_banco < 1:
+        raise ErroArquivamento("O mês atual fica sempre no banco (--meses 1 ou mais)")
+    arquivados = []
+    for mes in meses_para_arquivar(meses_no_banco):
+        removidos = arquivar_mes(mes, copia_backup)
+        if removidos is None:
+            continue
+        arquivados.append((mes, *removidos))
+        if ao_arquivar is not None:
+            ao_arquivar(mes, *removidos)
+    return arquivados
+
+# ---------------- Verificação e compactação ----------------
+def compactar_particao(mes, arquivo, vendas, itens, total):
+    # integrity_check, conferência com o registro em particoes_vendas e
+    # VACUUM. Retorna (bytes antes, bytes depois).
+    caminho = banco.caminho_particao(arquivo)
+    if not os.path.exists(caminho):
+        raise ErroArquivamento(f"{mes}: partição {caminho} não encontrada")
+    try:
+        backup.verificar(caminho)
+    except backup.ErroBackup as e:
+        raise ErroArquivamento(f"{mes}: {e}")
+    antes = os.path.getsize(caminho)
+    conn = _conectar_particao(caminho)
+    try:
+        _, _, encontradas, itens_encontrados, total_encontrado = conn.execute(SQL_RESUMO_PARTICAO).fetchone()
+        if (encontradas, itens_encontrados) != (vendas, itens) or round(total_encontrado - total, 2):
+            raise ErroArquivamento(f"{mes}: a partição tem {encontradas} vendas e {itens_encontrados} itens, "
+                                   f"o registro diz {vendas} e {itens}")
+        # Partições de antes de algum índice novo ganham o índice aqui
+        for sql in SQL_CRIAR_PARTICAO:
+            conn.execute(sql)
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    return antes, os.path.getsize(caminho)
+
+def compactar(ao_compactar=None):
+    # Todas as partições registradas; ao_compactar(mes, antes, depois) a cada uma
+    resultados = []
+    for mes, arquivo, _, _, vendas, itens, total in banco.particoes_vendas():
+        antes, depois = compactar_particao(mes, arquivo, vendas, itens, total)
+        resultados.append((mes, antes, depois))
+        if ao_compactar is not None:
+            ao_compactar(mes, antes, depois)
+    return resultados
+
+if __name__ == "__main__":
+    argumentos = sys.argv[1:]
+    meses = MESES_NO_BANCO
+    if "--meses" in argumentos:
+        posicao = argumentos.index("--meses")
+        meses = int(argumentos[posicao + 1])
+        del argumentos[posicao:posicao + 2]
+    caminhos = [arg for arg in argumentos if not arg.startswith("--")]
+    banco.iniciar(caminhos[0] if caminhos else banco.CAMINHO_BANCO)
+    try:
+        if "--compactar" in argumentos:
+            resultados = compactar(lambda mes, antes, depois:
+                                   print(f"{mes}: ok, {antes // 1024} KB -> {depois // 1024} KB"))
+            print(f"{len(resultados)} partições verificadas")
+        else:
+            arquivados = arquivar(meses, "--sem-backup" not in argumentos,
+                                  lambda mes, vendas, itens: print(f"{mes}: {vendas} vendas, {itens} itens arquivados"))
+            print(f"{len(arquivados)} meses arquivados" if arquivados else "Nenhum mês para arquivar")
+    except ErroArquivamento as e:
+        print(e)
+        sys.exit(1)
+    finally:
+        banco.fechar()
@@ -0,0 +1,98 @@
+import glob
+import gzip
+import os
+import shutil
+import sqlite3
+import sys
+from datetime import datetime
+
+import banco
+
+# ---------------- Backup online ----------------
+# Usa a API de backup do SQLite sobre uma conexão somente leitura com uma
+# transação de leitura aberta: em modo WAL isso fixa um retrato consistente
+# do banco sem bloquear as vendas, e a cópia em passos não é reiniciada a
+# cada gravação do caixa. A cópia é verificada com integrity_check antes de
+# ser compactada, e só os backups mais recentes são mantidos.
+
+DIRETORIO_BACKUP = "backups"
+MANTER_BACKUPS = 14
+PAGINAS_POR_PASSO = 256
+PAUSA_ENTRE_PASSOS = 0.002
+INTERVALO_AGENDADO_HORAS = 6
+
+class ErroBackup(Exception):
+    pass
+
+def fazer_backup(origem=None, diretorio=DIRETORIO_BACKUP, manter=MANTER_BACKUPS, ao_progresso=None):
+    origem = origem or banco.CAMINHO_BANCO
+    os.makedirs(diretorio, exist_ok=True)
+    nome = f"backup_pdv_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
+    copia_temp = os.path.join(diretorio, nome + ".tmp")
+    destino = os.path.join(diretorio, nome + ".gz")
+
+    try:
+        copiar(origem, copia_temp, ao_progresso)
+        verificar(copia_temp)
+        compactar(copia_temp, destino)
+    finally:
+        if os.path.exists(copia_temp):
+            os.remove(copia_temp)
+
+    rotacionar(diretorio, manter)
+    return destino
+
+def copiar(origem, destino, ao_progresso=None):
+    fonte = sqlite3.connect(f"file:{origem}?mode=ro", uri=True)
+    copia = sqlite3.connect(destino)
+    try:
+        fonte.execute("BEGIN")
+        fonte.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+
+        def progresso(status, restantes, total):
+            if ao_progresso is not None:
+                ao_progresso(total - restantes, total)
+
+        fonte.backup(copia, pages=PAGINAS_POR_PASSO, progress=progresso, sleep=PAUSA_ENTRE_PASSOS)
+        fonte.rollback()
+    finally:
+        copia.close()
+        fonte.close()
+
+def verificar(caminho):
+    conn = sqlite3.connect(caminho)
+    try:
+        resultado = [linha[0] for linha in conn.execute("PRAGMA integrity_check")]
+    finally:
+        conn.close()
+    if resultado != ["ok"]:
+        raise ErroBackup("Backup corrompido: " + "; ".join(resultado[:5]))
+
+def compactar(origem, destino):
+    temporario = destino + ".tmp"
+    with open(origem, "rb") as entrada, gzip.open(temporario, "wb", compresslevel=6) as saida:
+        shutil.copyfileobj(entrada, saida, 1024 * 1024)
+    os.replace(temporario, destino)
+
+def listar_backups(diretorio=DIRETORIO_BACKUP):
+    # O nome tem data e hora, então a ordem alfabética é a cronológica
+    return sorted(glob.glob(os.path.join(diretorio, "backup_pdv_*.db.gz")))
+
+def rotacionar(diretorio=DIRETORIO_BACKUP, manter=MANTER_BACKUPS):
+    antigos = listar_backups(diretorio)[:-manter] if manter > 0 else []
+    for arquivo in antigos:
+        os.remove(arquivo)
+    return antigos
+
+def restaurar_para(arquivo_backup, destino):
+    # Descompacta um backup num arquivo separado, para conferência ou troca manual
+    with gzip.open(arquivo_backup, "rb") as entrada, open(destino, "wb") as saida:
+        shutil.copyfileobj(entrada, saida, 1024 * 1024)
+    verificar(destino)
+    return destino
+
+if __name__ == "__main__":
+    # Para rodar agendado pelo sistema (cron / Agendador de Tarefas)
+    origem = sys.argv[1] if len(sys.argv) > 1 else banco.CAMINHO_BANCO
+    arquivo = fazer_backup(origem, ao_progresso=lambda feitas, total: print(f"\r{feitas}/{total} páginas", end=""))
+    print(f"\nBackup verificado: {arquivo}")
@@ -0,0 +1,921 @@
+import heapq
+import json
+import os
+import queue
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import desempenho
+import migracoes
+from catalogo import ESTOQUE_MINIMO_PADRAO
+
+# ---------------- Acesso a dados ----------------
+# Uma conexão de escrita (protegida por trava, transações BEGIN IMMEDIATE)
+# e uma conexão somente leitura por thread. Em modo WAL leitores e o
+# escritor não se bloqueiam, então relatórios podem rodar em threads de
+# segundo plano enquanto o caixa grava vendas. Todo SQL do sistema fica
+# aqui em constantes: o cache de statements do sqlite3 reaproveita o preparo.
+# As conexões são desempenho.ConexaoMedida, que cronometra cada consulta.
+
+CAMINHO_BANCO = "pdv.db"
+
+PRAGMAS = {
+    "synchronous": "NORMAL",
+    "cache_size": -32000,       # ~32 MB por conexão
+    "mmap_size": 268435456,     # 256 MB
+    "busy_timeout": 5000,
+    "temp_store": "MEMORY",
+}
+
+STATEMENTS_EM_CACHE = 256
+
+# Linhas por fetchmany nas leituras em fluxo (exportações)
+TAMANHO_BLOCO = 10000
+
+# Vários caixas (processos) gravando no mesmo banco: além do busy_timeout,
+# a abertura da transação de escrita é repetida com espera crescente
+TENTATIVAS_ESCRITA = 5
+ESPERA_ESCRITA = 0.05   # segundos, dobra a cada tentativa
+
+_caminho = CAMINHO_BANCO
+_escrita = None
+_trava_escrita = threading.RLock()
+_local = threading.local()
+_conexoes_leitura = []
+
+def _aplicar_pragmas(conn):
+    for nome, valor in PRAGMAS.items():
+        conn.execute(f"PRAGMA {nome} = {valor}")
+
+def iniciar(caminho=CAMINHO_BANCO):
+    global _caminho, _escrita
+    fechar()
+    _caminho = caminho
+    _escrita = sqlite3.connect(caminho, isolation_level=None, check_same_thread=False,
+                               timeout=PRAGMAS["busy_timeout"] / 1000, cached_statements=STATEMENTS_EM_CACHE,
+                               factory=desempenho.FABRICA_CONEXAO)
+    _escrita.execute("PRAGMA journal_mode = WAL")
+    _aplicar_pragmas(_escrita)
+    migracoes.migrar(_escrita)
+    return _escrita
+
+def caminho_banco():
+    return _caminho
+
+def fechar():
+    global _escrita, _gravacao_em_grupo
+    if _gravacao_em_grupo is not None:
+        _gravacao_em_grupo.parar()
+        _gravacao_em_grupo = None
+    while _conexoes_leitura:
+        _conexoes_leitura.pop().close()
+    _local.__dict__.clear()
+    if _escrita is not None:
+        _escrita.close()
+        _escrita = None
+
+def leitura():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(f"file:{_caminho}?mode=ro", uri=True, check_same_thread=False,
+                               cached_statements=STATEMENTS_EM_CACHE, factory=desempenho.FABRICA_CONEXAO)
+        _aplicar_pragmas(conn)
+        conn.execute("PRAGMA query_only = ON")
+        _local.conn = conn
+        _conexoes_leitura.append(conn)
+    return conn
+
+def _banco_ocupado(erro):
+    mensagem = str(erro)
+    return "locked" in mensagem or "busy" in mensagem
+
+def _comecar_escrita(cursor):
+    espera = ESPERA_ESCRITA
+    for tentativa in range(TENTATIVAS_ESCRITA):
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            return
+        except sqlite3.OperationalError as erro:
+            if not _banco_ocupado(erro) or tentativa == TENTATIVAS_ESCRITA - 1:
+                raise
+        # Espera com variação aleatória, para os caixas não tentarem juntos de novo
+        time.sleep(espera * random.uniform(0.5, 1.5))
+        espera *= 2
+
+@contextmanager
+def transacao():
+    with _trava_escrita:
+        cursor = _escrita.cursor()
+        _comecar_escrita(cursor)
+        try:
+            yield cursor
+            cursor.execute("COMMIT")
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+
+# ---------------- SQL ----------------
+SQL_LISTAR_PRODUTOS = "SELECT id, nome, preco, estoque, codigo_barras, estoque_minimo FROM produtos"
+
+SQL_FREQUENCIA_VENDAS = "SELECT produto_id, SUM(quantidade) FROM itens_venda GROUP BY produto_id"
+
+SQL_INSERIR_PRODUTO = f"""INSERT INTO produtos (nome, preco, estoque, codigo_barras, estoque_minimo)
+VALUES (?, ?, ?, ?, COALESCE(?, {ESTOQUE_MINIMO_PADRAO}))"""
+
+# Atualiza preço e estoque de quem já existe: primeiro pelo código de
+# barras; sem conflito de código, pelo nome (que herda o código se não tiver).
+# Código de barras de um produto com outro nome, ou nome de um produto com
+# outro código, não altera nada (a linha não conta em rowcount e é
+# rejeitada). Estoque mínimo nulo (coluna ausente no CSV) mantém o valor
+# gravado.
+SQL_UPSERT_PRODUTO = f"""INSERT INTO produtos (nome, preco, estoque, codigo_barras, estoque_minimo)
+VALUES (?1, ?2, ?3, ?4, COALESCE(?5, {ESTOQUE_MINIMO_PADRAO}))
+ON CONFLICT(codigo_barras) DO UPDATE SET preco = excluded.preco, estoque = excluded.estoque,
+    estoque_minimo = COALESCE(?5, produtos.estoque_minimo)
+    WHERE produtos.nome = excluded.nome
+ON CONFLICT(nome) DO UPDATE SET preco = excluded.preco, estoque = excluded.estoque,
+    codigo_barras = COALESCE(produtos.codigo_barras, excluded.codigo_barras),
+    estoque_minimo = COALESCE(?5, produtos.estoque_minimo)
+    WHERE excluded.codigo_barras IS NULL OR produtos.codigo_barras IS NULL
+        OR produtos.codigo_barras = excluded.codigo_barras"""
+
+SQL_CODIGO_DO_PRODUTO = "SELECT codigo_barras FROM produtos WHERE nome = ?"
+
+# Consultas pontuais usadas enquanto o catálogo em memória ainda carrega
+SQL_PRODUTO_POR_CODIGO = "SELECT id, nome, preco, estoque FROM produtos WHERE codigo_barras = ?"
+
+SQL_PRODUTO_POR_NOME = "SELECT id, nome, preco, estoque FROM produtos WHERE nome = ?"
+
+SQL_PRODUTO_POR_ID = "SELECT id, nome, preco, estoque FROM produtos WHERE id = ?"
+
+SQL_PAGINA_ESTOQUE = """SELECT id, nome, preco, estoque, codigo_barras, estoque_minimo FROM produtos
+WHERE nome > ? ORDER BY nome LIMIT ?"""
+
+# Página anterior à primeira linha carregada, da mais próxima para a mais distante
+SQL_PAGINA_ESTOQUE_ANTERIOR = """SELECT id, nome, preco, estoque, codigo_barras, estoque_minimo FROM produtos
+WHERE nome < ? ORDER BY nome DESC LIMIT ?"""
+
+SQL_LINHAS_ESTOQUE = """SELECT id, nome, preco, estoque, codigo_barras, estoque_minimo FROM produtos
+WHERE id IN (SELECT value FROM json_each(?))"""
+
+SQL_PAGINA_VENDAS = """SELECT id, DATE(data), total_geral, caixa FROM vendas
+WHERE id < ? ORDER BY id DESC LIMIT ?"""
+
+SQL_PAGINA_VENDAS_ANTERIOR = """SELECT id, DATE(data), total_geral, caixa FROM vendas
+WHERE id > ? ORDER BY id LIMIT ?"""
+
+SQL_LINHAS_VENDAS = """SELECT id, DATE(data), total_geral, caixa FROM vendas
+WHERE id IN (SELECT value FROM json_each(?))"""
+
+SQL_INSERIR_VENDA = "INSERT INTO vendas (total_geral, caixa) VALUES (?, ?)"
+
+# Chave do diário do caixa (diario.py): reenviar a mesma venda não grava de
+# novo. As chaves ficam DIAS_CHAVES_VENDAS dias.
+DIAS_CHAVES_VENDAS = 30
+
+SQL_VENDA_DA_CHAVE = "SELECT venda_id FROM diario_vendas WHERE chave = ?"
+
+SQL_REGISTRAR_CHAVE_VENDA = "INSERT INTO diario_vendas (chave, caixa, venda_id) VALUES (?, ?, ?)"
+
+SQL_LIMPAR_CHAVES_VENDAS = "DELETE FROM diario_vendas WHERE gravada_em < DATETIME('now', ?)"
+
+SQL_INSERIR_ITEM_VENDA = """INSERT INTO itens_venda
+(venda_id, produto_id, quantidade, preco_unitario, total_item)
+VALUES (?, ?, ?, ?, ?)"""
+
+# Só baixa se houver estoque: linhas não alteradas indicam falta de produto
+SQL_BAIXAR_ESTOQUE = "UPDATE produtos SET estoque = estoque - ? WHERE id = ? AND estoque >= ?"
+
+SQL_ESTOQUE_PRODUTOS = "SELECT id, estoque FROM produtos WHERE id IN (SELECT value FROM json_each(?))"
+
+SQL_TOTAL_ULTIMO_DIA = "SELECT dia, total FROM vendas_diarias ORDER BY dia DESC LIMIT 1"
+
+SQL_VENDAS_PERIODO = """SELECT dia, total, quantidade FROM vendas_diarias
+WHERE dia BETWEEN ? AND ? ORDER BY dia"""
+
+# Consultas de vendas com {esquema}: "main" no banco principal ou o
+# esquema de uma partição anexada (particao()); produtos vem sempre do main
+SQL_ITENS_VENDA = """SELECT p.nome, i.quantidade, i.preco_unitario, i.total_item
+FROM {esquema}.itens_venda i
+JOIN main.produtos p ON i.produto_id = p.id
+WHERE i.venda_id = ?"""
+
+SQL_CUPOM = """SELECT v.id, v.data, v.total_geral, p.nome, i.quantidade, i.preco_unitario, i.total_item
+FROM {esquema}.vendas v
+JOIN {esquema}.itens_venda i ON v.id = i.venda_id
+JOIN main.produtos p ON i.produto_id = p.id
+WHERE v.id = ?"""
+
+SQL_CUPONS_INTERVALO = """SELECT v.id, v.data, v.total_geral, p.nome, i.quantidade, i.preco_unitario, i.total_item
+FROM {esquema}.vendas v
+JOIN {esquema}.itens_venda i ON v.id = i.venda_id
+JOIN main.produtos p ON i.produto_id = p.id
+WHERE v.id BETWEEN ? AND ?
+ORDER BY v.id, i.id"""
+
+# Exportações: percorridas em blocos na ordem de um índice, sem ordenação
+# em memória, então o consumo não depende do tamanho do período
+SQL_EXPORTAR_VENDAS = """SELECT id, data, caixa, total_geral FROM {esquema}.vendas
+WHERE data >= ? AND data < DATE(?, '+1 day') ORDER BY data, id"""
+
+SQL_EXPORTAR_ITENS = """SELECT v.id, v.data, v.caixa, i.produto_id, p.codigo_barras, p.nome,
+    i.quantidade, i.preco_unitario, i.total_item
+FROM {esquema}.vendas v
+JOIN {esquema}.itens_venda i ON v.id = i.venda_id
+JOIN main.produtos p ON i.produto_id = p.id
+WHERE v.data >= ? AND v.data < DATE(?, '+1 day')
+ORDER BY v.data, v.id"""
+
+SQL_EXPORTAR_ESTOQUE = """SELECT id, codigo_barras, nome, preco, estoque, estoque_minimo FROM produtos
+ORDER BY nome"""
+
+# Análise de vendas: a célula dia da semana x hora (dia * 24 + hora, com
+# 0 = segunda-feira) já vem calculada, na hora local: vendas.data é UTC
+SQL_ANALISE_ITENS = """SELECT v.id,
+    ((CAST(strftime('%w', v.data, 'localtime') AS INTEGER) + 6) % 7) * 24
+        + CAST(strftime('%H', v.data, 'localtime') AS INTEGER),
+    i.produto_id, i.quantidade, i.total_item
+FROM {esquema}.vendas v
+JOIN {esquema}.itens_venda i ON v.id = i.venda_id
+WHERE v.data >= ? AND v.data < DATE(?, '+1 day')
+ORDER BY v.data, v.id"""
+
+SQL_ESTOQUE_ATUAL = "SELECT id, estoque FROM produtos"
+
+SQL_ULTIMA_VENDA = "SELECT MAX(id) FROM vendas"
+
+SQL_PARTICOES_PERIODO = """SELECT mes, arquivo FROM particoes_vendas
+WHERE mes BETWEEN substr(?, 1, 7) AND substr(?, 1, 7) ORDER BY mes"""
+
+SQL_PARTICOES_VENDAS = """SELECT mes, arquivo, primeira_venda, ultima_venda, vendas, itens, total
+FROM particoes_vendas ORDER BY mes"""
+
+# particoes_vendas tem uma linha por mês arquivado: a varredura é barata
+SQL_PARTICOES_INTERVALO = """SELECT mes, arquivo FROM particoes_vendas
+WHERE ultima_venda >= ? AND primeira_venda <= ? ORDER BY mes"""
+
+# Arquivamento (arquivamento.py): vendas de um mês até um id, por
+# :inicio = primeiro dia do mês e :ultima = maior id copiado para a partição
+SQL_PRIMEIRO_MES = "SELECT substr(MIN(data), 1, 7) FROM vendas"
+
+SQL_CONTAR_MES = """SELECT
+    (SELECT COUNT(*) FROM vendas
+     WHERE data >= :inicio AND data < DATE(:inicio, '+1 month') AND id <= :ultima),
+    (SELECT COUNT(*) FROM itens_venda WHERE venda_id IN (
+        SELECT id FROM vendas WHERE data >= :inicio AND data < DATE(:inicio, '+1 month') AND id <= :ultima))"""
+
+SQL_APAGAR_ITENS_MES = """DELETE FROM itens_venda WHERE venda_id IN (
+    SELECT id FROM vendas WHERE data >= :inicio AND data < DATE(:inicio, '+1 month') AND id <= :ultima)"""
+
+SQL_APAGAR_VENDAS_MES = """DELETE FROM vendas
+WHERE data >= :inicio AND data < DATE(:inicio, '+1 month') AND id <= :ultima"""
+
+SQL_REGISTRAR_PARTICAO = """INSERT INTO particoes_vendas
+    (mes, arquivo, primeira_venda, ultima_venda, vendas, itens, total)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(mes) DO UPDATE SET arquivo = excluded.arquivo, primeira_venda = excluded.primeira_venda,
+    ultima_venda = excluded.ultima_venda, vendas = excluded.vendas, itens = excluded.itens,
+    total = excluded.total, arquivado_em = CURRENT_TIMESTAMP"""
+
+# Busca de texto: produtos pelo índice FTS5 (produtos_busca), do mais
+# relevante para o menos, e itens de um produto do mais novo para o mais
+# antigo pelo índice (produto_id, id) de itens_venda
+SQL_BUSCAR_PRODUTOS = """SELECT p.id, p.nome, p.preco, p.estoque, p.codigo_barras
+FROM produtos_busca b
+JOIN produtos p ON p.id = b.rowid
+WHERE produtos_busca MATCH ?
+ORDER BY b.rank LIMIT ?"""
+
+SQL_ITENS_DO_PRODUTO = """SELECT i.id, v.id, DATE(v.data), v.total_geral, v.caixa
+FROM {esquema}.itens_venda i
+JOIN {esquema}.vendas v ON v.id = i.venda_id
+WHERE i.produto_id = ? AND i.id < ?
+ORDER BY i.id DESC LIMIT ?"""
+
+# Contagem de estoque (inventario.py). :contagem = id da contagem,
+# :zerar = 1 para zerar os produtos com estoque que não foram contados
+SQL_ABRIR_CONTAGEM = "INSERT INTO contagens (descricao, caixa) VALUES (?, ?)"
+
+SQL_CONTAGEM_ABERTA = """SELECT id, descricao, aberta_em FROM contagens
+WHERE situacao = 'aberta' ORDER BY id DESC LIMIT 1"""
+
+# Soma na contagem; estoque_sistema fica o da primeira vez que o produto foi contado
+SQL_GRAVAR_CONTAGEM = """INSERT INTO contagem_itens (contagem_id, produto_id, quantidade, estoque_sistema)
+SELECT ?, id, ?, estoque FROM produtos WHERE id = ?
+ON CONFLICT (contagem_id, produto_id) DO UPDATE SET quantidade = quantidade + excluded.quantidade"""
+
+SQL_RESUMO_CONTAGEM = "SELECT COUNT(*), COALESCE(SUM(quantidade), 0) FROM contagem_itens WHERE contagem_id = ?"
+
+SQL_QUANTIDADE_CONTADA = "SELECT quantidade FROM contagem_itens WHERE contagem_id = ? AND produto_id = ?"
+
+# A diferença é contra o estoque do sistema na hora da contagem: vendas
+# feitas depois dela continuam descontadas quando o ajuste é aplicado
+_SQL_AJUSTES_CONTAGEM = """SELECT p.id, p.nome, p.codigo_barras, p.estoque AS anterior,
+    c.estoque_sistema AS sistema, c.quantidade AS contado, c.quantidade - c.estoque_sistema AS diferenca
+FROM contagem_itens c
+JOIN produtos p ON p.id = c.produto_id
+WHERE c.contagem_id = :contagem AND c.quantidade <> c.estoque_sistema
+UNION ALL
+SELECT p.id, p.nome, p.codigo_barras, p.estoque, p.estoque, 0, -p.estoque
+FROM produtos p
+WHERE :zerar AND p.estoque <> 0
+  AND NOT EXISTS (SELECT 1 FROM contagem_itens c WHERE c.contagem_id = :contagem AND c.produto_id = p.id)"""
+
+SQL_DIFERENCAS_CONTAGEM = f"""SELECT id, nome, codigo_barras, sistema, contado, diferenca
+FROM ({_SQL_AJUSTES_CONTAGEM})
+ORDER BY ABS(diferenca) DESC, nome"""
+
+# Estoque novo nunca negativo; a diferença registrada é a aplicada de fato
+SQL_REGISTRAR_AJUSTES = f"""INSERT INTO movimentos_estoque
+    (produto_id, tipo, referencia, estoque_anterior, estoque_novo, diferenca)
+SELECT id, 'inventario', :contagem, anterior, MAX(0, anterior + diferenca), MAX(0, anterior + diferenca) - anterior
+FROM ({_SQL_AJUSTES_CONTAGEM})"""
+
+SQL_APLICAR_AJUSTES = """UPDATE produtos SET estoque = m.estoque_novo
+FROM movimentos_estoque m
+WHERE m.tipo = 'inventario' AND m.referencia = :contagem AND m.produto_id = produtos.id"""
+
+SQL_AJUSTES_APLICADOS = """SELECT produto_id, estoque_novo FROM movimentos_estoque
+WHERE tipo = 'inventario' AND referencia = ?"""
+
+SQL_ENCERRAR_CONTAGEM = """UPDATE contagens SET situacao = ?, encerrada_em = CURRENT_TIMESTAMP, ajustes = ?
+WHERE id = ? AND situacao = 'aberta'"""
+
+SQL_LIMPAR_CONTAGEM = "DELETE FROM contagem_itens WHERE contagem_id = ?"
+
+# Lê só o índice parcial idx_produtos_estoque_baixo
+SQL_ESTOQUE_BAIXO = """SELECT id, nome, estoque, estoque_minimo, codigo_barras FROM produtos
+WHERE estoque <= estoque_minimo ORDER BY estoque ASC"""
+
+# ---------------- Produtos ----------------
+def listar_produtos():
+    return leitura().execute(SQL_LISTAR_PRODUTOS).fetchall()
+
+def frequencia_vendas():
+    return leitura().execute(SQL_FREQUENCIA_VENDAS).fetchall()
+
+def inserir_produto(nome, preco, estoque, codigo_barras=None, estoque_minimo=None):
+    with transacao() as cursor:
+        cursor.execute(SQL_INSERIR_PRODUTO, (nome, preco, estoque, codigo_barras or None, estoque_minimo))
+        return cursor.lastrowid
+
+def upsert_produtos(lotes):
+    # lotes: iterável de listas [(linha, nome, preco, estoque, codigo_barras, estoque_minimo)].
+    # Tudo numa transação; cada lote vai num executemany sob um SAVEPOINT.
+    # Se o lote violar alguma restrição ou trouxer um produto com nome e
+    # código de barras que não combinam com o cadastro, é refeito linha a
+    # linha para separar as linhas rejeitadas. Retorna (gravadas, [(linha, motivo)]).
+    gravadas = 0
+    rejeitadas = []
+    with transacao() as cursor:
+        for lote in lotes:
+            cursor.execute("SAVEPOINT lote")
+            try:
+                cursor.executemany(SQL_UPSERT_PRODUTO, [registro[1:] for registro in lote])
+                if cursor.rowcount == len(lote):
+                    cursor.execute("RELEASE lote")
+                    gravadas += len(lote)
+                    continue
+            except sqlite3.IntegrityError:
+                pass
+            cursor.execute("ROLLBACK TO lote")
+            cursor.execute("RELEASE lote")
+            for linha, *registro in lote:
+                cursor.execute("SAVEPOINT linha")
+                try:
+                    if cursor.execute(SQL_UPSERT_PRODUTO, registro).rowcount:
+                        gravadas += 1
+                    else:
+                        rejeitadas.append((linha, _motivo_conflito(cursor, registro[0], registro[3])))
+                    cursor.execute("RELEASE linha")
+                except sqlite3.IntegrityError as e:
+                    cursor.execute("ROLLBACK TO linha")
+                    cursor.execute("RELEASE linha")
+                    rejeitadas.append((linha, str(e)))
+    return gravadas, rejeitadas
+
+def _motivo_conflito(cursor, nome, codigo_barras):
+    # Linha que o upsert não gravou: o código é de outro produto ou o produto tem outro código
+    outro = cursor.execute(SQL_PRODUTO_POR_CODIGO, (codigo_barras,)).fetchone()
+    if outro is not None:
+        return f"Código de barras {codigo_barras} já cadastrado para {outro[1]}"
+    atual = cursor.execute(SQL_CODIGO_DO_PRODUTO, (nome,)).fetchone()
+    return f"{nome} já cadastrado com o código de barras {atual[0]}"
+
+def produto_por_codigo(codigo):
+    return leitura().execute(SQL_PRODUTO_POR_CODIGO, (codigo,)).fetchone()
+
+def produto_por_nome(nome):
+    # Os nomes são gravados com title() (validar_produto)
+    return leitura().execute(SQL_PRODUTO_POR_NOME, (" ".join(nome.split()).title(),)).fetchone()
+
+def produto_por_id(prod_id):
+    return leitura().execute(SQL_PRODUTO_POR_ID, (prod_id,)).fetchone()
+
+def estoque_produtos(ids):
+    return leitura().execute(SQL_ESTOQUE_PRODUTOS, (json.dumps(list(ids)),)).fetchall()
+
+def pagina_estoque(apos_nome, limite):
+    return leitura().execute(SQL_PAGINA_ESTOQUE, ("" if apos_nome is None else apos_nome, limite)).fetchall()
+
+def pagina_estoque_anterior(antes_nome, limite):
+    return leitura().execute(SQL_PAGINA_ESTOQUE_ANTERIOR, (antes_nome, limite)).fetchall()
+
+def linhas_estoque(ids):
+    return leitura().execute(SQL_LINHAS_ESTOQUE, (json.dumps(list(ids)),)).fetchall()
+
+def produtos_estoque_baixo():
+    return leitura().execute(SQL_ESTOQUE_BAIXO).fetchall()
+
+# ---------------- Contagem de estoque ----------------
+class ContagemEncerrada(Exception):
+    pass
+
+def abrir_contagem(descricao=None, caixa=1):
+    with transacao() as cursor:
+        cursor.execute(SQL_ABRIR_CONTAGEM, (descricao, caixa))
+        return cursor.lastrowid
+
+def contagem_aberta():
+    # (id, descricao, aberta_em) da contagem em andamento, ou None
+    return leitura().execute(SQL_CONTAGEM_ABERTA).fetchone()
+
+def gravar_contagem(contagem_id, contados):
+    # contados: [(produto_id, quantidade)], somados ao que já foi contado
+    with transacao() as cursor:
+        cursor.executemany(SQL_GRAVAR_CONTAGEM,
+                           [(contagem_id, quantidade, prod_id) for prod_id, quantidade in contados])
+
+def quantidade_contada(contagem_id, produto_id):
+    # Já gravado na contagem (0 se o produto não foi contado)
+    linha = leitura().execute(SQL_QUANTIDADE_CONTADA, (contagem_id, produto_id)).fetchone()
+    return linha[0] if linha else 0
+
+def resumo_contagem(contagem_id):
+    # (produtos contados, unidades contadas)
+    return leitura().execute(SQL_RESUMO_CONTAGEM, (contagem_id,)).fetchone()
+
+def diferencas_contagem(contagem_id, zerar_nao_contados=False):
+    # [(id, nome, codigo_barras, estoque no sistema, contado, diferença)], maiores diferenças primeiro
+    return leitura().execute(SQL_DIFERENCAS_CONTAGEM,
+                             {"contagem": contagem_id, "zerar": int(zerar_nao_contados)}).fetchall()
+
+def aplicar_contagem(contagem_id, zerar_nao_contados=False):
+    # Uma transação: registra os ajustes em movimentos_estoque, aplica todos
+    # de uma vez a partir desse registro e encerra a contagem.
+    # Retorna [(produto_id, estoque novo)].
+    parametros = {"contagem": contagem_id, "zerar": int(zerar_nao_contados)}
+    with transacao() as cursor:
+        cursor.execute(SQL_REGISTRAR_AJUSTES, parametros)
+        cursor.execute(SQL_APLICAR_AJUSTES, parametros)
+        ajustes = cursor.execute(SQL_AJUSTES_APLICADOS, (contagem_id,)).fetchall()
+        if not cursor.execute(SQL_ENCERRAR_CONTAGEM, ("aplicada", len(ajustes), contagem_id)).rowcount:
+            raise ContagemEncerrada(contagem_id)
+        cursor.execute(SQL_LIMPAR_CONTAGEM, (contagem_id,))
+    return ajustes
+
+def cancelar_contagem(contagem_id):
+    with transacao() as cursor:
+        cursor.execute(SQL_ENCERRAR_CONTAGEM, ("cancelada", 0, contagem_id))
+        cursor.execute(SQL_LIMPAR_CONTAGEM, (contagem_id,))
+
+# ---------------- Vendas ----------------
+class EstoqueInsuficiente(Exception):
+    def __init__(self, faltas):
+        # faltas: [(produto_id, disponivel, pedido)]
+        self.faltas = faltas
+        super().__init__("Estoque insuficiente")
+
+def agrupar_itens(itens):
+    # Soma linhas do mesmo produto: uma linha em itens_venda por produto
+    if len(itens) == 1:
+        return list(itens)
+    agrupados = {}
+    for produto_id, quantidade, preco_unitario, total_item in itens:
+        if produto_id in agrupados:
+            _, qtd, preco, total = agrupados[produto_id]
+            agrupados[produto_id] = (produto_id, qtd + quantidade, preco, total + total_item)
+        else:
+            agrupados[produto_id] = (produto_id, quantidade, preco_unitario, total_item)
+    return list(agrupados.values())
+
+def _gravar_venda(cursor, total_geral, itens, caixa, chave):
+    # itens já agrupados; dentro de uma transação de escrita
+    if chave is not None:
+        gravada = cursor.execute(SQL_VENDA_DA_CHAVE, (chave,)).fetchone()
+        if gravada:
+            return gravada[0]
+    cursor.execute(SQL_INSERIR_VENDA, (total_geral, caixa))
+    venda_id = cursor.lastrowid
+    if len(itens) == 1:
+        # Carrinho de uma linha: execute direto, sem montar o executemany
+        produto_id, qtd, _, _ = itens[0]
+        cursor.execute(SQL_INSERIR_ITEM_VENDA, (venda_id,) + tuple(itens[0]))
+        cursor.execute(SQL_BAIXAR_ESTOQUE, (qtd, produto_id, qtd))
+    else:
+        cursor.executemany(SQL_INSERIR_ITEM_VENDA, [(venda_id,) + item for item in itens])
+        cursor.executemany(SQL_BAIXAR_ESTOQUE, [(qtd, produto_id, qtd) for produto_id, qtd, _, _ in itens])
+    if cursor.rowcount != len(itens):
+        # Alguma baixa condicional não casou: desfaz a venda inteira
+        raise EstoqueInsuficiente([])
+    if chave is not None:
+        cursor.execute(SQL_REGISTRAR_CHAVE_VENDA, (chave, caixa, venda_id))
+    return venda_id
+
+def _preencher_faltas(erro, itens):
+    # Depois do rollback: o estoque lido agora é o efetivo, sem as baixas parciais
+    pedidos = {produto_id: qtd for produto_id, qtd, _, _ in itens}
+    atuais = dict(estoque_produtos(pedidos))
+    erro.faltas = [(produto_id, atuais.get(produto_id, 0), qtd) for produto_id, qtd in pedidos.items()
+                   if atuais.get(produto_id, 0) < qtd]
+
+def registrar_venda(total_geral, itens, caixa=1, chave=None):
+    # itens: (produto_id, quantidade, preco_unitario, total_item)
+    # chave: do diário do caixa; a venda com a chave já gravada não é repetida
+    itens = agrupar_itens(itens)
+    try:
+        with transacao() as cursor:
+            return _gravar_venda(cursor, total_geral, itens, caixa, chave)
+    except EstoqueInsuficiente as erro:
+        _preencher_faltas(erro, itens)
+        raise
+
+def venda_da_chave(chave):
+    linha = leitura().execute(SQL_VENDA_DA_CHAVE, (chave,)).fetchone()
+    return linha[0] if linha else None
+
+def limpar_chaves_vendas(dias=DIAS_CHAVES_VENDAS):
+    # Um caixa só recupera a venda da última execução: chaves antigas não servem mais
+    with transacao() as cursor:
+        cursor.execute(SQL_LIMPAR_CHAVES_VENDAS, (f"-{dias} days",))
+        return cursor.rowcount
+
+# ---------------- Durabilidade e gravação em grupo ----------------
+# "normal": WAL com synchronous NORMAL, o commit não espera o disco. Fechar
+# o programa à força não perde nada; uma queda de energia pode perder as
+# últimas vendas, sem corromper o banco.
+# "total": synchronous FULL, um fsync a cada venda.
+# "grupo": FULL, mas as vendas que chegam juntas (vários caixas pelo
+# servidor de vendas) são gravadas numa transação só, um fsync por lote.
+# Quem grava espera o commit do seu lote; o lote espera no máximo
+# JANELA_GRUPO_MS por mais vendas depois da primeira.
+DURABILIDADES = {"normal": "NORMAL", "total": "FULL", "grupo": "FULL"}
+JANELA_GRUPO_MS = 2
+VENDAS_POR_GRUPO = 64
+
+_gravacao_em_grupo = None
+
+class _VendaPendente:
+    __slots__ = ("dados", "venda_id", "erro", "pronta")
+
+    def __init__(self, dados):
+        self.dados = dados
+        self.venda_id = None
+        self.erro = None
+        self.pronta = threading.Event()
+
+class GravacaoEmGrupo:
+    # registrar_venda com o mesmo contrato de banco.registrar_venda,
+    # chamado de várias threads ao mesmo tempo
+    def __init__(self, janela_ms=JANELA_GRUPO_MS, maximo=VENDAS_POR_GRUPO):
+        self.janela = janela_ms / 1000
+        self.maximo = maximo
+        self.lotes = 0
+        self._fila = queue.Queue()
+        self._thread = threading.Thread(target=self._gravar, name="gravacao-em-grupo", daemon=True)
+        self._thread.start()
+
+    def registrar_venda(self, total_geral, itens, caixa=1, chave=None):
+        pendente = _VendaPendente((total_geral, agrupar_itens(itens), caixa, chave))
+        self._fila.put(pendente)
+        pendente.pronta.wait()
+        if pendente.erro is not None:
+            raise pendente.erro
+        return pendente.venda_id
+
+    def parar(self):
+        self._fila.put(None)
+        self._thread.join()
+
+    def _gravar(self):
+        parar = False
+        while not parar:
+            pendente = self._fila.get()
+            if pendente is None:
+                return
+            lote = [pendente]
+            prazo = time.monotonic() + self.janela
+            while len(lote) < self.maximo:
+                try:
+                    pendente = self._fila.get(timeout=max(0.0, prazo - time.monotonic()))
+                except queue.Empty:
+                    break
+                if pendente is None:
+                    parar = True
+                    break
+                lote.append(pendente)
+            self._gravar_lote(lote)
+
+    def _gravar_lote(self, lote):
+        try:
+            with transacao() as cursor:
+                for pendente in lote:
+                    # Uma venda recusada não desfaz as outras do lote
+                    cursor.execute("SAVEPOINT venda")
+                    try:
+                        pendente.venda_id = _gravar_venda(cursor, *pendente.dados)
+                    except Exception as erro:
+                        cursor.execute("ROLLBACK TO venda")
+                        pendente.erro = erro
+                    cursor.execute("RELEASE venda")
+        except Exception as erro:
+            # O commit falhou: nenhuma venda do lote foi gravada
+            for pendente in lote:
+                pendente.venda_id = None
+                pendente.erro = erro
+        self.lotes += 1
+        for pendente in lote:
+            if isinstance(pendente.erro, EstoqueInsuficiente):
+                _preencher_faltas(pendente.erro, pendente.dados[1])
+            pendente.pronta.set()
+
+def definir_durabilidade(durabilidade):
+    # Depois de iniciar(). Retorna quem grava as vendas: registrar_venda ou
+    # o registrar_venda da gravação em grupo
+    global _gravacao_em_grupo
+    if durabilidade not in DURABILIDADES:
+        raise ValueError(f"Durabilidade inválida: {durabilidade} (use {', '.join(DURABILIDADES)})")
+    _escrita.execute(f"PRAGMA synchronous = {DURABILIDADES[durabilidade]}")
+    if durabilidade != "grupo":
+        return registrar_venda
+    if _gravacao_em_grupo is None:
+        _gravacao_em_grupo = GravacaoEmGrupo()
+    return _gravacao_em_grupo.registrar_venda
+
+def pagina_vendas(apos_id, limite):
+    return leitura().execute(SQL_PAGINA_VENDAS, (sys.maxsize if apos_id is None else apos_id, limite)).fetchall()
+
+def pagina_vendas_anterior(antes_id, limite):
+    return leitura().execute(SQL_PAGINA_VENDAS_ANTERIOR, (antes_id, limite)).fetchall()
+
+def linhas_vendas(ids):
+    return leitura().execute(SQL_LINHAS_VENDAS, (json.dumps(list(ids)),)).fetchall()
+
+# ---------------- Relatórios ----------------
+def total_ultimo_dia():
+    return leitura().execute(SQL_TOTAL_ULTIMO_DIA).fetchone()
+
+def vendas_periodo(inicio, fim):
+    return leitura().execute(SQL_VENDAS_PERIODO, (inicio, fim)).fetchall()
+
+def itens_venda(venda_id):
+    return _consultar_venda(SQL_ITENS_VENDA, venda_id)
+
+def cupom_venda(venda_id):
+    return _consultar_venda(SQL_CUPOM, venda_id)
+
+def cupons_intervalo(primeiro_id, ultimo_id):
+    linhas = []
+    for mes, arquivo in leitura().execute(SQL_PARTICOES_INTERVALO, (primeiro_id, ultimo_id)).fetchall():
+        with particao(mes, arquivo) as esquema:
+            linhas += leitura().execute(SQL_CUPONS_INTERVALO.format(esquema=esquema),
+                                        (primeiro_id, ultimo_id)).fetchall()
+    return linhas + leitura().execute(SQL_CUPONS_INTERVALO.format(esquema="main"),
+                                      (primeiro_id, ultimo_id)).fetchall()
+
+def em_blocos(sql, parametros=(), tamanho=TAMANHO_BLOCO):
+    # Gerador de listas com até `tamanho` linhas. O cursor mantém uma
+    # transação de leitura aberta até o fim: o resultado é um retrato
+    # consistente mesmo com o caixa gravando vendas enquanto isso.
+    cursor = leitura().execute(sql, parametros)
+    try:
+        while True:
+            bloco = cursor.fetchmany(tamanho)
+            if not bloco:
+                return
+            yield bloco
+    finally:
+        cursor.close()
+
+def blocos_vendas(inicio, fim):
+    return _blocos_periodo(SQL_EXPORTAR_VENDAS, inicio, fim)
+
+def blocos_itens_vendidos(inicio, fim):
+    return _blocos_periodo(SQL_EXPORTAR_ITENS, inicio, fim)
+
+def blocos_estoque():
+    return em_blocos(SQL_EXPORTAR_ESTOQUE)
+
+def blocos_analise(inicio, fim):
+    return _blocos_periodo(SQL_ANALISE_ITENS, inicio, fim)
+
+def blocos_estoque_atual():
+    return em_blocos(SQL_ESTOQUE_ATUAL)
+
+def ultima_venda():
+    return leitura().execute(SQL_ULTIMA_VENDA).fetchone()[0] or 0
+
+def reconstruir_vendas_diarias():
+    with _trava_escrita:
+        return migracoes.reconstruir_vendas_diarias(_escrita)
+
+# ---------------- Partições de vendas ----------------
+# Meses fechados podem ser movidos (arquivamento.py) para pdv_AAAAMM.db, ao
+# lado do banco, e ficam registrados em particoes_vendas. As consultas de
+# vendas por período ou por id anexam (ATTACH) só as partições de que
+# precisam, somente leitura, na conexão de leitura da thread, e desanexam
+# no fim. Cada partição é lida numa transação separada: arquivar um mês
+# enquanto um relatório do mesmo período roda pode deixá-lo incompleto.
+
+def arquivo_particao(mes, caminho=None):
+    # "2024-01" -> pdv_202401.db
+    base = os.path.splitext(os.path.basename(caminho or _caminho))[0]
+    return f"{base}_{mes.replace('-', '')}.db"
+
+def caminho_particao(arquivo):
+    # particoes_vendas.arquivo é relativo à pasta do banco
+    return os.path.join(os.path.dirname(_caminho), arquivo)
+
+@contextmanager
+def particao(mes, arquivo):
+    # Rende o nome do esquema ("p202401"). Pode ser aninhado: a partição só
+    # é desanexada quando o último uso termina.
+    conn = leitura()
+    esquema = "p" + mes.replace("-", "")
+    anexadas = _local.__dict__.setdefault("particoes", {})
+    if esquema not in anexadas:
+        conn.execute("ATTACH DATABASE ? AS " + esquema, (f"file:{caminho_particao(arquivo)}?mode=ro",))
+        anexadas[esquema] = 0
+    anexadas[esquema] += 1
+    try:
+        yield esquema
+    finally:
+        anexadas[esquema] -= 1
+        if not anexadas[esquema]:
+            del anexadas[esquema]
+            conn.execute("DETACH DATABASE " + esquema)
+
+def particoes_periodo(inicio, fim):
+    # [(mes, arquivo)] dos meses arquivados que o período toca
+    return leitura().execute(SQL_PARTICOES_PERIODO, (inicio, fim)).fetchall()
+
+def particoes_vendas():
+    return leitura().execute(SQL_PARTICOES_VENDAS).fetchall()
+
+def primeiro_mes_vendas():
+    return leitura().execute(SQL_PRIMEIRO_MES).fetchone()[0]
+
+def _blocos_periodo(sql, inicio, fim):
+    # As partições do período em ordem de mês e depois o banco principal:
+    # só meses fechados são arquivados, então a ordem por data se mantém
+    for mes, arquivo in particoes_periodo(inicio, fim):
+        with particao(mes, arquivo) as esquema:
+            yield from em_blocos(sql.format(esquema=esquema), (inicio, fim))
+    yield from em_blocos(sql.format(esquema="main"), (inicio, fim))
+
+def _consultar_venda(sql, venda_id):
+    # No banco principal; se a venda não estiver lá, na partição do seu id
+    linhas = leitura().execute(sql.format(esquema="main"), (venda_id,)).fetchall()
+    if linhas:
+        return linhas
+    for mes, arquivo in leitura().execute(SQL_PARTICOES_INTERVALO, (venda_id, venda_id)).fetchall():
+        with particao(mes, arquivo) as esquema:
+            linhas = leitura().execute(sql.format(esquema=esquema), (venda_id,)).fetchall()
+        if linhas:
+            break
+    return linhas
+
+# ---------------- Busca de texto ----------------
+LIMITE_BUSCA_PRODUTOS = 50
+VENDAS_POR_PAGINA_BUSCA = 100
+
+def expressao_busca(texto):
+    # "arroz tio" -> '"arroz"* "tio"*': todas as palavras, cada uma como
+    # começo de palavra. As aspas deixam o texto livre de operadores do FTS5.
+    return " ".join('"' + palavra.replace('"', '""') + '"*' for palavra in texto.split())
+
+def buscar_produtos(texto, limite=LIMITE_BUSCA_PRODUTOS):
+    # [(id, nome, preco, estoque, codigo_barras)]
+    expressao = expressao_busca(texto)
+    if not expressao:
+        return []
+    return leitura().execute(SQL_BUSCAR_PRODUTOS, (expressao, limite)).fetchall()
+
+def _linha_item(linha):
+    return -linha[0]
+
+def vendas_com_produtos(produto_ids, apos_item=None, limite=VENDAS_POR_PAGINA_BUSCA):
+    # Vendas com algum dos produtos, da mais recente para a mais antiga:
+    # ([(venda_id, dia, total, caixa)], apos_item da próxima página ou None).
+    # Cada produto é lido pelo índice a partir do cursor (id do último item
+    # lido) e as listas são intercaladas por id; os itens de uma venda têm
+    # ids seguidos, então a página sempre termina no fim de uma venda.
+    # Percorre o banco principal e depois as partições, da mais nova à mais antiga.
+    linhas = []
+    vistas = set()
+    apos = sys.maxsize if apos_item is None else apos_item
+    fontes = [(None, None)] + [(mes, arquivo) for mes, arquivo, *_ in reversed(particoes_vendas())]
+    for mes, arquivo in fontes:
+        while True:
+            if mes is None:
+                listas = _itens_dos_produtos("main", produto_ids, apos, limite)
+            else:
+                with particao(mes, arquivo) as esquema:
+                    listas = _itens_dos_produtos(esquema, produto_ids, apos, limite)
+            # Uma lista que veio cheia pode ter mais itens depois do último
+            # lido: a intercalação só vale até ele, e a próxima volta continua dali
+            corte = max((lista[-1][0] for lista in listas if len(lista) > limite), default=0)
+            for item_id, venda_id, *venda in heapq.merge(*listas, key=_linha_item):
+                if item_id < corte:
+                    break
+                if venda_id not in vistas:
+                    if len(linhas) == limite:
+                        return linhas, apos
+                    vistas.add(venda_id)
+                    linhas.append((venda_id, *venda))
+                apos = item_id
+            if not corte:
+                break
+    return linhas, None
+
+def _itens_dos_produtos(esquema, produto_ids, apos, limite):
+    sql = SQL_ITENS_DO_PRODUTO.format(esquema=esquema)
+    conn = leitura()
+    return [conn.execute(sql, (prod_id, apos, limite + 1)).fetchall() for prod_id in produto_ids]
+
+# ---------------- Verificação dos planos de consulta ----------------
+# Consultas executadas pelo sistema no dia a dia. Nenhuma delas pode cair
+# em varredura completa de tabela ("SCAN tabela" sem índice).
+CONSULTAS_VERIFICADAS = {
+    "produto_por_codigo": (SQL_PRODUTO_POR_CODIGO, ("7890000000000",)),
+    "produto_por_nome": (SQL_PRODUTO_POR_NOME, ("Arroz",)),
+    "produto_por_id": (SQL_PRODUTO_POR_ID, (1,)),
+    "codigo_do_produto": (SQL_CODIGO_DO_PRODUTO, ("Arroz",)),
+    "pagina_estoque": (SQL_PAGINA_ESTOQUE, ("", 200)),
+    "pagina_estoque_anterior": (SQL_PAGINA_ESTOQUE_ANTERIOR, ("M", 200)),
+    "linhas_estoque": (SQL_LINHAS_ESTOQUE, ("[1, 2]",)),
+    "pagina_vendas": (SQL_PAGINA_VENDAS, (sys.maxsize, 200)),
+    "pagina_vendas_anterior": (SQL_PAGINA_VENDAS_ANTERIOR, (1000, 200)),
+    "linhas_vendas": (SQL_LINHAS_VENDAS, ("[1, 2]",)),
+    "total_ultimo_dia": (SQL_TOTAL_ULTIMO_DIA, ()),
+    "vendas_periodo": (SQL_VENDAS_PERIODO, ("2024-01-01", "2024-12-31")),
+    "itens_venda": (SQL_ITENS_VENDA.format(esquema="main"), (1,)),
+    "cupom": (SQL_CUPOM.format(esquema="main"), (1,)),
+    "cupons_intervalo": (SQL_CUPONS_INTERVALO.format(esquema="main"), (1, 100)),
+    "estoque_baixo": (SQL_ESTOQUE_BAIXO, ()),
+    "exportar_vendas": (SQL_EXPORTAR_VENDAS.format(esquema="main"), ("2024-01-01", "2024-12-31")),
+    "exportar_itens": (SQL_EXPORTAR_ITENS.format(esquema="main"), ("2024-01-01", "2024-12-31")),
+    "exportar_estoque": (SQL_EXPORTAR_ESTOQUE, ()),
+    "analise_itens": (SQL_ANALISE_ITENS.format(esquema="main"), ("2024-01-01", "2024-12-31")),
+    "particoes_periodo": (SQL_PARTICOES_PERIODO, ("2024-01-01", "2024-12-31")),
+    "primeiro_mes": (SQL_PRIMEIRO_MES, ()),
+    "contagem_aberta": (SQL_CONTAGEM_ABERTA, ()),
+    "gravar_contagem": (SQL_GRAVAR_CONTAGEM, (1, 1, 1)),
+    "resumo_contagem": (SQL_RESUMO_CONTAGEM, (1,)),
+    "quantidade_contada": (SQL_QUANTIDADE_CONTADA, (1, 1)),
+    "ajustes_aplicados": (SQL_AJUSTES_APLICADOS, (1,)),
+    "buscar_produtos": (SQL_BUSCAR_PRODUTOS, ('"arroz"*', 50)),
+    "itens_do_produto": (SQL_ITENS_DO_PRODUTO.format(esquema="main"), (1, sys.maxsize, 101)),
+    "contar_mes": (SQL_CONTAR_MES, {"inicio": "2024-01-01", "ultima": 1000}),
+    "apagar_itens_mes": (SQL_APAGAR_ITENS_MES, {"inicio": "2024-01-01", "ultima": 1000}),
+    "apagar_vendas_mes": (SQL_APAGAR_VENDAS_MES, {"inicio": "2024-01-01", "ultima": 1000}),
+    "ultima_venda": (SQL_ULTIMA_VENDA, ()),
+    "baixar_estoque": (SQL_BAIXAR_ESTOQUE, (1, 1, 1)),
+    "venda_da_chave": (SQL_VENDA_DA_CHAVE, ("x",)),
+    "limpar_chaves_vendas": (SQL_LIMPAR_CHAVES_VENDAS, ("-30 days",)),
+}
+
+# "SCAN x" (SQLite 3.36+) ou "SCAN TABLE x" (antes). Varredura só passa
+# se for por índice, de tabela virtual (json_each, busca de texto) ou de
+# linha constante / subconsulta
+_VARREDURA = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?(.*)$")
+_VARREDURA_ACEITA = re.compile(r"USING (?:COVERING )?INDEX |VIRTUAL TABLE INDEX ")
+_VARREDURA_SEM_TABELA = ("CONSTANT", "SUBQUERY")
+
+def verificar_planos(conn, consultas=CONSULTAS_VERIFICADAS):
+    falhas = []
+    for nome, (sql, parametros) in consultas.items():
+        for linha in conn.execute("EXPLAIN QUERY PLAN " + sql, parametros):
+            detalhe = linha[-1]
+            varredura = _VARREDURA.match(detalhe)
+            if (varredura and varredura.group(1) not in _VARREDURA_SEM_TABELA
+                    and not _VARREDURA_ACEITA.search(varredura.group(2))):
+                falhas.append((nome, detalhe))
+    return falhas
+
+if __name__ == "__main__":
+    if "--verificar-planos" in sys.argv:
+        # O plano depende só do esquema: verifica num banco em memória migrado do zero
+        conn = sqlite3.connect(":memory:")
+        migracoes.migrar(conn)
+        falhas = verificar_planos(conn)
+        for nome, detalhe in falhas:
+            print(f"FALHA {nome}: {detalhe}")
+        usam_indice = len(CONSULTAS_VERIFICADAS) - len({nome for nome, _ in falhas})
+        print(f"{usam_indice}/{len(CONSULTAS_VERIFICADAS)} consultas usam índice")
+        sys.exit(1 if falhas else 0)
@@ -0,0 +1,62 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import banco
+
+# ---------------- Benchmark da gravação de vendas ----------------
+# Mede vendas/segundo de banco.registrar_venda() (executemany + baixa
+# condicional) contra a gravação antiga, um INSERT e um UPDATE por item com
+# a mesma baixa condicional, para carrinhos de 1, 10 e 100 linhas.
+#
+#   python benchmarks/bench_venda.py [vendas_por_tamanho]
+
+TAMANHOS_CARRINHO = (1, 10, 100)
+PRODUTOS = 1000
+
+def registrar_venda_item_a_item(total_geral, itens):
+    # Caminho anterior, mantido aqui só como referência de comparação; com a
+    # baixa condicional, para os dois caminhos fazerem o mesmo trabalho
+    with banco.transacao() as cursor:
+        cursor.execute(banco.SQL_INSERIR_VENDA, (total_geral, 1))
+        venda_id = cursor.lastrowid
+        for produto_id, quantidade, preco_unitario, total_item in itens:
+            cursor.execute(banco.SQL_INSERIR_ITEM_VENDA, (venda_id, produto_id, quantidade, preco_unitario, total_item))
+            if not cursor.execute(banco.SQL_BAIXAR_ESTOQUE, (quantidade, produto_id, quantidade)).rowcount:
+                raise banco.EstoqueInsuficiente([])
+        return venda_id
+
+def montar_carrinho(linhas, deslocamento):
+    return [((deslocamento + i) % PRODUTOS + 1, 1, 2.5, 2.5) for i in range(linhas)]
+
+def medir(registrar, linhas, vendas):
+    inicio = time.perf_counter()
+    for n in range(vendas):
+        itens = montar_carrinho(linhas, n * linhas)
+        registrar(sum(item[3] for item in itens), itens)
+    return time.perf_counter() - inicio
+
+def preparar_banco(caminho):
+    banco.iniciar(caminho)
+    with banco.transacao() as cursor:
+        cursor.executemany(banco.SQL_INSERIR_PRODUTO,
+                           [(f"Produto {i}", 2.5, 10 ** 9, f"789{i:010d}", None) for i in range(PRODUTOS)])
+
+def main():
+    vendas = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    print(f"{'linhas':>6} {'caminho':>14} {'vendas/s':>10} {'ms/venda':>9}")
+    with tempfile.TemporaryDirectory() as pasta:
+        for linhas in TAMANHOS_CARRINHO:
+            for nome, registrar in (("item a item", registrar_venda_item_a_item),
+                                    ("em lote", banco.registrar_venda)):
+                # Banco novo a cada medição, para o tamanho das tabelas não favorecer ninguém
+                preparar_banco(os.path.join(pasta, f"bench_{linhas}_{len(nome)}.db"))
+                duracao = medir(registrar, linhas, vendas)
+                banco.fechar()
+                print(f"{linhas:>6} {nome:>14} {vendas / duracao:>10.0f} {duracao * 1000 / vendas:>9.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import banco
+import diario
+import servidor_vendas
+from carrinho import ItemCarrinho
+from gerar_dados import gerar
+
+# ---------------- Teste de carga com vários caixas ----------------
+# Sobe N processos de caixa gravando vendas ao mesmo tempo no mesmo banco,
+# direto (WAL + busy_timeout + novas tentativas) ou pelo servidor de
+# vendas, e mede vendas/segundo e a latência de gravação (p50/p99).
+# --durabilidade escolhe o synchronous e a gravação em grupo
+# (banco.definir_durabilidade; grupo só agrupa pelo servidor). Com --diario
+# cada caixa também anota os itens e a finalização no diário do caixa,
+# como a tela faz. --comparar roda todas as combinações.
+#
+#   python benchmarks/carga_caixas.py [caixas] [vendas_por_caixa] [--servidor]
+#       [--durabilidade normal|total|grupo] [--diario] [--comparar]
+
+PRODUTOS = 1000
+ITENS_POR_VENDA = 10
+PORTA_TESTE = 5399
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))] if ordenados else 0.0
+
+def caixa_de_carga(numero, caminho, vendas, endereco, largada, resultados, durabilidade, usar_diario):
+    banco.iniciar(caminho)
+    if endereco is not None:
+        registrar = servidor_vendas.ClienteVendas(*endereco).registrar_venda
+    else:
+        registrar = banco.definir_durabilidade(durabilidade)
+    diario_caixa = None
+    if usar_diario:
+        diario_caixa = diario.Diario(diario.caminho_diario(numero, os.path.dirname(caminho)),
+                                     sincronizar=durabilidade != "normal")
+        diario_caixa.recuperar()
+    sorteio = random.Random(numero)
+    latencias = []
+    erros = 0
+    largada.wait()
+    for _ in range(vendas):
+        itens = [(sorteio.randint(1, PRODUTOS), 1, 2.5, 2.5) for _ in range(ITENS_POR_VENDA)]
+        chave = None
+        if diario_caixa is not None:
+            # Os itens entram no diário durante a venda, fora da latência de gravação
+            for posicao, (produto_id, quantidade, preco, _) in enumerate(itens):
+                diario_caixa.adicionou(ItemCarrinho(produto_id, "produto", 250, quantidade, posicao), quantidade)
+        inicio = time.perf_counter()
+        try:
+            if diario_caixa is not None:
+                chave = diario_caixa.finalizando()
+            venda_id = registrar(sum(item[3] for item in itens), itens, numero, chave)
+            if diario_caixa is not None:
+                diario_caixa.gravada(chave, venda_id)
+        except Exception:
+            erros += 1
+            continue
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    if diario_caixa is not None:
+        diario_caixa.fechar()
+    banco.fechar()
+    resultados.put((latencias, erros))
+
+def preparar_banco(caminho):
+    gerar(caminho, PRODUTOS, 1000)
+    banco.iniciar(caminho)
+    with banco.transacao() as cursor:
+        cursor.execute("UPDATE produtos SET estoque = 1000000000")
+    banco.fechar()
+
+def executar(caixas, vendas, usar_servidor, durabilidade="normal", usar_diario=False):
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "carga.db")
+        preparar_banco(caminho)
+
+        servidor = None
+        endereco = None
+        if usar_servidor:
+            pronto = multiprocessing.Event()
+            servidor = multiprocessing.Process(target=servidor_vendas.servir,
+                                               args=(caminho, PORTA_TESTE, servidor_vendas.ENDERECO_PADRAO, pronto,
+                                                     durabilidade),
+                                               daemon=True)
+            servidor.start()
+            pronto.wait(30)
+            endereco = (servidor_vendas.ENDERECO_PADRAO, PORTA_TESTE)
+
+        largada = multiprocessing.Event()
+        resultados = multiprocessing.Queue()
+        processos = [multiprocessing.Process(target=caixa_de_carga,
+                                             args=(numero, caminho, vendas, endereco, largada, resultados,
+                                                   durabilidade, usar_diario))
+                     for numero in range(1, caixas + 1)]
+        for processo in processos:
+            processo.start()
+        # Dá tempo de todos abrirem o banco antes da largada
+        time.sleep(1)
+        inicio = time.perf_counter()
+        largada.set()
+        coletados = [resultados.get() for _ in processos]
+        duracao = time.perf_counter() - inicio
+        for processo in processos:
+            processo.join()
+        if servidor is not None:
+            servidor.terminate()
+            servidor.join()
+
+    latencias = [ms for lista, _ in coletados for ms in lista]
+    return {
+        "caixas": caixas,
+        "modo": "servidor de vendas" if usar_servidor else "banco direto",
+        "durabilidade": durabilidade,
+        "diario": usar_diario,
+        "vendas": len(latencias),
+        "erros": sum(erros for _, erros in coletados),
+        "vendas_por_segundo": len(latencias) / duracao,
+        "p50_ms": percentil(latencias, 50),
+        "p99_ms": percentil(latencias, 99),
+        "max_ms": max(latencias, default=0.0),
+    }
+
+def imprimir(r):
+    print(f"{r['caixas']} caixas ({r['modo']}, {r['durabilidade']}{', diário' if r['diario'] else ''}): "
+          f"{r['vendas']} vendas, {r['erros']} erros, {r['vendas_por_segundo']:.0f} vendas/s, "
+          f"p50 {r['p50_ms']:.2f} ms, p99 {r['p99_ms']:.2f} ms, máx {r['max_ms']:.2f} ms")
+
+# (servidor, durabilidade): a gravação em grupo só junta vendas no servidor
+COMBINACOES = [(False, "normal"), (False, "total"), (True, "normal"), (True, "total"), (True, "grupo")]
+
+if __name__ == "__main__":
+    durabilidade = "normal"
+    if "--durabilidade" in sys.argv[:-1]:
+        durabilidade = sys.argv[sys.argv.index("--durabilidade") + 1]
+    argumentos = [arg for arg in sys.argv[1:] if not arg.startswith("--") and arg != durabilidade]
+    caixas = int(argumentos[0]) if argumentos else 4
+    vendas = int(argumentos[1]) if len(argumentos) > 1 else 500
+    if "--comparar" in sys.argv:
+        for usar_diario in (False, True):
+            for usar_servidor, durabilidade in COMBINACOES:
+                imprimir(executar(caixas, vendas, usar_servidor, durabilidade, usar_diario))
+    else:
+        imprimir(executar(caixas, vendas, "--servidor" in sys.argv, durabilidade, "--diario" in sys.argv))
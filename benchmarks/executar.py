@@ -0,0 +1,229 @@
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import banco
+import nucleo
+from gerar_dados import ULTIMO_DIA, gerar
+from nucleo import Caixa, ErroCaixa
+
+# ---------------- Suíte de benchmarks ----------------
+# Mede os caminhos quentes do PDV pelo núcleo (sem interface) em bancos
+# sintéticos de vários tamanhos. Cada caso roda várias vezes e registra
+# mediana e p95 em milissegundos. O resultado vai para um JSON em
+# benchmarks/resultados/ e é comparado com benchmarks/baseline.json: casos
+# mais lentos que o limite são marcados como regressão (saída com código 1).
+# Sem baseline para algum caso a saída também é 1: o baseline é da máquina
+# em que foi salvo (grava máquina e versão do SQLite) e deve ser salvo nela
+# antes da primeira comparação.
+#
+#   python benchmarks/executar.py [pequeno medio grande] [--salvar-baseline]
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+PASTA_DADOS = os.path.join(PASTA, "dados")
+PASTA_RESULTADOS = os.path.join(PASTA, "resultados")
+ARQUIVO_BASELINE = os.path.join(PASTA, "baseline.json")
+
+# nome: (produtos, itens_venda)
+TAMANHOS = {
+    "pequeno": (1_000, 20_000),
+    "medio": (10_000, 500_000),
+    "grande": (100_000, 5_000_000),
+}
+TAMANHOS_PADRAO = ("pequeno", "medio")
+SEMENTE = 42
+
+LIMITE_REGRESSAO = 0.20     # 20% mais lento que o baseline
+FOLGA_REGRESSAO_MS = 0.05   # diferenças abaixo disso são ruído
+
+PAGINAS_ROLADAS = 5
+NOMES_DIGITADOS = 30
+VENDAS_MEDIDAS = 200
+ITENS_POR_VENDA = 10
+CUPONS_MEDIDOS = 200
+REPETICOES_RELATORIO = 5
+
+def banco_de_dados(nome):
+    # Os bancos gerados ficam guardados: a mesma semente gera o mesmo banco
+    produtos, itens = TAMANHOS[nome]
+    caminho = os.path.join(PASTA_DADOS, f"{nome}_{produtos}_{itens}_{SEMENTE}.db")
+    if not os.path.exists(caminho):
+        os.makedirs(PASTA_DADOS, exist_ok=True)
+        print(f"Gerando {caminho}...")
+        gerar(caminho + ".tmp", produtos, itens, SEMENTE)
+        os.replace(caminho + ".tmp", caminho)
+    return caminho
+
+def cronometrar(funcao, *args):
+    inicio = time.perf_counter()
+    funcao(*args)
+    return (time.perf_counter() - inicio) * 1000
+
+def resumir(tempos):
+    ordenados = sorted(tempos)
+    return {
+        "mediana_ms": ordenados[len(ordenados) // 2],
+        "p95_ms": ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.95))],
+        "amostras": len(ordenados),
+    }
+
+# ---------------- Casos ----------------
+def caso_carregar_catalogo(caixa, sorteio):
+    return [cronometrar(nucleo.montar_catalogo) for _ in range(3)]
+
+def caso_carregar_estoque(caixa, sorteio):
+    # Primeira página da aba Produtos e as seguintes, como na rolagem
+    def rolar():
+        ultima = None
+        for _ in range(PAGINAS_ROLADAS):
+            linhas = banco.pagina_estoque(ultima, 200)
+            if not linhas:
+                break
+            ultima = linhas[-1][1]
+    return [cronometrar(rolar) for _ in range(10)]
+
+def caso_update_sugestoes(caixa, sorteio):
+    # Uma busca por tecla, digitando nomes inteiros letra a letra
+    tempos = []
+    for nome in sorteio.sample(caixa.catalogo.nomes, min(NOMES_DIGITADOS, len(caixa.catalogo.nomes))):
+        for fim in range(1, len(nome) + 1):
+            tempos.append(cronometrar(caixa.sugestoes, nome[:fim]))
+    return tempos
+
+def caso_finalizar_venda(caixa, sorteio):
+    codigos = [codigo for codigo in caixa.catalogo.codigos if codigo]
+    tempos = []
+    for _ in range(VENDAS_MEDIDAS):
+        for _ in range(ITENS_POR_VENDA):
+            try:
+                caixa.adicionar_por_codigo(sorteio.choice(codigos))
+            except ErroCaixa:
+                pass
+        if caixa.carrinho:
+            tempos.append(cronometrar(caixa.finalizar_venda))
+    return tempos
+
+def caso_relatorio_mes(caixa, sorteio):
+    fim = ULTIMO_DIA.strftime("%Y-%m-%d")
+    inicio = ULTIMO_DIA.replace(day=1).strftime("%Y-%m-%d")
+    return [cronometrar(nucleo.relatorio_periodo, inicio, fim) for _ in range(REPETICOES_RELATORIO)]
+
+def caso_relatorio_ano(caixa, sorteio):
+    fim = ULTIMO_DIA.strftime("%Y-%m-%d")
+    inicio = ULTIMO_DIA.replace(month=1, day=1).strftime("%Y-%m-%d")
+    return [cronometrar(nucleo.relatorio_periodo, inicio, fim) for _ in range(REPETICOES_RELATORIO)]
+
+def caso_imprimir_cupom(caixa, sorteio):
+    # Só a montagem do cupom: a impressora não entra na medição
+    ultima = banco.pagina_vendas(None, 1)[0][0]
+    return [cronometrar(nucleo.texto_cupom, sorteio.randint(1, ultima)) for _ in range(CUPONS_MEDIDOS)]
+
+CASOS = [
+    ("carregar_catalogo", caso_carregar_catalogo),
+    ("carregar_estoque", caso_carregar_estoque),
+    ("update_sugestoes", caso_update_sugestoes),
+    ("relatorio_vendas_mes", caso_relatorio_mes),
+    ("relatorio_vendas_ano", caso_relatorio_ano),
+    ("imprimir_cupom", caso_imprimir_cupom),
+    # Por último: grava vendas na cópia do banco
+    ("finalizar_venda", caso_finalizar_venda),
+]
+
+def medir_tamanho(nome):
+    original = banco_de_dados(nome)
+    resultados = {}
+    with tempfile.TemporaryDirectory() as pasta:
+        copia = os.path.join(pasta, "bench.db")
+        shutil.copyfile(original, copia)
+        caixa = Caixa(copia)
+        try:
+            for caso, funcao in CASOS:
+                resultados[caso] = resumir(funcao(caixa, random.Random(SEMENTE)))
+                print(f"  {caso:<22} mediana {resultados[caso]['mediana_ms']:>9.3f} ms"
+                      f"   p95 {resultados[caso]['p95_ms']:>9.3f} ms")
+        finally:
+            banco.fechar()
+    return resultados
+
+def ambiente():
+    return {
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "maquina": platform.platform(),
+    }
+
+def comparar(resultados, baseline):
+    # ([(tamanho, caso, antes, agora)] regressões, [(tamanho, caso)] sem baseline)
+    regressoes = []
+    sem_baseline = []
+    for tamanho, casos in resultados.items():
+        for caso, medida in casos.items():
+            anterior = baseline.get(tamanho, {}).get(caso)
+            if anterior is None:
+                sem_baseline.append((tamanho, caso))
+                continue
+            limite = anterior["mediana_ms"] * (1 + LIMITE_REGRESSAO) + FOLGA_REGRESSAO_MS
+            if medida["mediana_ms"] > limite:
+                regressoes.append((tamanho, caso, anterior["mediana_ms"], medida["mediana_ms"]))
+    return regressoes, sem_baseline
+
+def main():
+    tamanhos = [arg for arg in sys.argv[1:] if not arg.startswith("--")] or list(TAMANHOS_PADRAO)
+    for tamanho in tamanhos:
+        if tamanho not in TAMANHOS:
+            print(f"Tamanho desconhecido: {tamanho} (use {', '.join(TAMANHOS)})")
+            return 2
+
+    resultados = {}
+    for tamanho in tamanhos:
+        print(f"{tamanho}: {TAMANHOS[tamanho][0]} produtos, {TAMANHOS[tamanho][1]} itens de venda")
+        resultados[tamanho] = medir_tamanho(tamanho)
+
+    relatorio = {"data": datetime.now().isoformat(timespec="seconds"), **ambiente(), "resultados": resultados}
+    os.makedirs(PASTA_RESULTADOS, exist_ok=True)
+    arquivo = os.path.join(PASTA_RESULTADOS, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(arquivo, "w", encoding="utf-8") as saida:
+        json.dump(relatorio, saida, indent=2)
+    print(f"Resultados em {arquivo}")
+
+    baseline = {"resultados": {}}
+    if os.path.exists(ARQUIVO_BASELINE):
+        with open(ARQUIVO_BASELINE, encoding="utf-8") as entrada:
+            baseline = json.load(entrada)
+
+    if "--salvar-baseline" in sys.argv:
+        if {chave: baseline.get(chave) for chave in ambiente()} != ambiente():
+            # Outra máquina ou versão: os tempos antigos não servem de comparação
+            baseline = {"resultados": {}}
+        baseline.update(relatorio, resultados={**baseline["resultados"], **resultados})
+        with open(ARQUIVO_BASELINE, "w", encoding="utf-8") as saida:
+            json.dump(baseline, saida, indent=2)
+        print(f"Baseline atualizado: {ARQUIVO_BASELINE}")
+        return 0
+
+    if not os.path.exists(ARQUIVO_BASELINE):
+        print("Sem baseline para comparar: rode com --salvar-baseline nesta máquina")
+        return 1
+    for chave, valor in ambiente().items():
+        if baseline.get(chave) != valor:
+            print(f"Aviso: baseline com {chave} {baseline.get(chave)}, agora {valor}")
+    regressoes, sem_baseline = comparar(resultados, baseline["resultados"])
+    for tamanho, caso, antes, agora in regressoes:
+        print(f"REGRESSÃO {tamanho}/{caso}: {antes:.3f} ms -> {agora:.3f} ms")
+    for tamanho, caso in sem_baseline:
+        print(f"SEM BASELINE {tamanho}/{caso} (rode com --salvar-baseline)")
+    if not regressoes and not sem_baseline:
+        print("Nenhuma regressão em relação ao baseline")
+    return 1 if regressoes or sem_baseline else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
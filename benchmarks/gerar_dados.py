@@ -0,0 +1,159 @@
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import banco
+
+# ---------------- Gerador de dados sintéticos ----------------
+# Monta um banco de supermercado para medir desempenho: nomes combinados de
+# categoria/marca/variante, preços log-normais por categoria, popularidade
+# dos produtos em lei de Zipf (poucos itens vendem muito), carrinhos com
+# tamanho geométrico e vendas concentradas nos horários de pico. A mesma
+# semente gera sempre o mesmo banco.
+#
+#   python benchmarks/gerar_dados.py destino.db [produtos] [itens_venda] [semente]
+
+CATEGORIAS = {
+    # categoria: preço mediano
+    "Arroz": 22.0, "Feijão": 8.5, "Açúcar": 4.9, "Café": 17.0, "Leite": 5.2,
+    "Óleo": 7.8, "Macarrão": 4.5, "Farinha": 5.5, "Biscoito": 3.9, "Refrigerante": 8.9,
+    "Suco": 6.5, "Cerveja": 4.2, "Água": 2.5, "Sabão": 12.0, "Detergente": 2.9,
+    "Shampoo": 15.0, "Sabonete": 2.2, "Papel Higiênico": 19.0, "Queijo": 9.0, "Presunto": 7.5,
+    "Iogurte": 3.5, "Manteiga": 11.0, "Chocolate": 6.0, "Molho": 3.2, "Sardinha": 5.8,
+    "Carne": 39.0, "Frango": 18.0, "Pão": 7.0, "Ovos": 13.0, "Banana": 5.0,
+}
+MARCAS = ["Bom Preço", "Qualitá", "Da Casa", "Sol Nascente", "Primor", "Vale Verde", "Serrana",
+          "Tio Zé", "Dona Benta", "Tradição", "Ouro Fino", "Nossa Terra", "Campestre", "Real",
+          "Estrela", "Santa Clara", "Mineirinho", "Litoral", "Imperial", "Sabor Nobre"]
+VARIANTES = ["Tradicional", "Integral", "Light", "Zero", "Premium", "Orgânico", "Extra",
+             "Especial", "Família", "Econômico"]
+TAMANHOS = ["200g", "500g", "1kg", "2kg", "5kg", "350ml", "1L", "2L"]
+
+EXPOENTE_ZIPF = 1.1
+MEDIA_ITENS_POR_VENDA = 8
+DIAS_DE_VENDAS = 365
+# Data fixa, para a mesma semente gerar o mesmo banco em qualquer dia
+ULTIMO_DIA = datetime(2024, 12, 31)
+# Peso de cada hora do dia (7h às 21h) na distribuição das vendas
+PESO_HORAS = {7: 2, 8: 4, 9: 6, 10: 9, 11: 10, 12: 8, 13: 6, 14: 5, 15: 5, 16: 6,
+              17: 9, 18: 10, 19: 8, 20: 5, 21: 2}
+TAMANHO_LOTE = 50000
+CAIXAS = 4
+
+def digito_ean13(doze):
+    soma = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(doze))
+    return str((10 - soma % 10) % 10)
+
+def gerar_produtos(quantidade, sorteio):
+    categorias = list(CATEGORIAS)
+    usados = set()
+    for i in range(quantidade):
+        categoria = sorteio.choice(categorias)
+        nome = f"{categoria} {sorteio.choice(MARCAS)} {sorteio.choice(VARIANTES)} {sorteio.choice(TAMANHOS)}"
+        if nome in usados:
+            nome = f"{nome} {i}"
+        usados.add(nome)
+        preco = round(CATEGORIAS[categoria] * sorteio.lognormvariate(0, 0.35), 2) or 0.01
+        estoque_minimo = sorteio.choice((5, 5, 10, 12, 20, 24))
+        # Cerca de 3% dos produtos abaixo do mínimo
+        if sorteio.random() < 0.03:
+            estoque = sorteio.randint(0, estoque_minimo)
+        else:
+            estoque = sorteio.randint(estoque_minimo + 1, 2000)
+        doze = f"789{i:09d}"
+        yield nome, preco, estoque, doze + digito_ean13(doze), estoque_minimo
+
+def gerar_vendas(precos, itens_venda, sorteio):
+    # Gera (venda, [itens]) em ordem cronológica até completar itens_venda linhas
+    pesos = list(accumulate(1 / (posto + 1) ** EXPOENTE_ZIPF for posto in range(len(precos))))
+    # O posto de popularidade não segue o id, senão os primeiros cadastrados seriam os campeões
+    ids = list(range(1, len(precos) + 1))
+    sorteio.shuffle(ids)
+    horas = list(PESO_HORAS)
+    pesos_horas = list(accumulate(PESO_HORAS.values()))
+
+    inicio = ULTIMO_DIA - timedelta(days=DIAS_DE_VENDAS - 1)
+    p_parar = 1 / MEDIA_ITENS_POR_VENDA
+
+    restantes = itens_venda
+    venda_id = 0
+    dia = 0
+    while restantes > 0:
+        # Meta do dia recalculada com o que falta e a média real de linhas
+        # por venda (repetidos se fundem), para terminar no último dia
+        dias_restantes = max(1, DIAS_DE_VENDAS - dia)
+        media = (itens_venda - restantes) / venda_id if venda_id else MEDIA_ITENS_POR_VENDA
+        por_dia = restantes / dias_restantes / media
+        data_dia = inicio + timedelta(days=min(dia, DIAS_DE_VENDAS - 1))
+        vendas_no_dia = sorted(
+            (sorteio.choices(horas, cum_weights=pesos_horas)[0], sorteio.randrange(3600))
+            for _ in range(max(1, int(sorteio.gauss(por_dia, por_dia * 0.15)))))
+        dia += 1
+        for hora, segundos in vendas_no_dia:
+            if restantes <= 0:
+                break
+            linhas = 1
+            while sorteio.random() > p_parar:
+                linhas += 1
+            venda_id += 1
+            data = (data_dia.replace(hour=hora, minute=0, second=0) + timedelta(seconds=segundos))
+            itens = {}
+            for pos in sorteio.choices(range(len(ids)), cum_weights=pesos, k=min(linhas, restantes)):
+                produto_id = ids[pos]
+                itens[produto_id] = itens.get(produto_id, 0) + (1 if sorteio.random() < 0.8 else sorteio.randint(2, 6))
+            # Produto repetido vira uma linha só, como no carrinho
+            restantes -= len(itens)
+            yield (venda_id, data.strftime("%Y-%m-%d %H:%M:%S"),
+                   [(produto_id, qtd, precos[produto_id - 1]) for produto_id, qtd in itens.items()])
+
+def gerar(destino, produtos=10000, itens_venda=500000, semente=42):
+    sorteio = random.Random(semente)
+    for sufixo in ("", "-wal", "-shm"):
+        if os.path.exists(destino + sufixo):
+            os.remove(destino + sufixo)
+    banco.iniciar(destino)
+    try:
+        lista_produtos = list(gerar_produtos(produtos, sorteio))
+        with banco.transacao() as cursor:
+            cursor.executemany(banco.SQL_INSERIR_PRODUTO, lista_produtos)
+        precos = [produto[1] for produto in lista_produtos]
+
+        gravados = 0
+        vendas, itens = [], []
+        for venda_id, data, linhas in gerar_vendas(precos, itens_venda, sorteio):
+            total = 0.0
+            for produto_id, qtd, preco in linhas:
+                total_item = round(qtd * preco, 2)
+                total += total_item
+                itens.append((venda_id, produto_id, qtd, preco, total_item))
+            vendas.append((venda_id, data, round(total, 2), sorteio.randint(1, CAIXAS)))
+            if len(itens) >= TAMANHO_LOTE:
+                gravados += _gravar(vendas, itens)
+                vendas, itens = [], []
+        gravados += _gravar(vendas, itens)
+    finally:
+        banco.fechar()
+    return gravados
+
+def _gravar(vendas, itens):
+    with banco.transacao() as cursor:
+        cursor.executemany("INSERT INTO vendas (id, data, total_geral, caixa) VALUES (?, ?, ?, ?)", vendas)
+        cursor.executemany("""INSERT INTO itens_venda (venda_id, produto_id, quantidade, preco_unitario, total_item)
+                              VALUES (?, ?, ?, ?, ?)""", itens)
+    return len(itens)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python benchmarks/gerar_dados.py destino.db [produtos] [itens_venda] [semente]")
+        sys.exit(2)
+    produtos = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    itens_venda = int(sys.argv[3]) if len(sys.argv) > 3 else 500000
+    semente = int(sys.argv[4]) if len(sys.argv) > 4 else 42
+    inicio = time.perf_counter()
+    gravados = gerar(sys.argv[1], produtos, itens_venda, semente)
+    print(f"{produtos} produtos e {gravados} itens de venda em {time.perf_counter() - inicio:.1f} s")
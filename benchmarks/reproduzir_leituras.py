@@ -0,0 +1,164 @@
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import banco
+import leitor
+from nucleo import Caixa, ErroCaixa
+
+# ---------------- Reprodução de leituras do leitor ----------------
+# Passa um fluxo de teclas pelo mesmo caminho da tela (leitor.DetectorRajada
+# e Caixa.ler_codigo), com os campos da aba Vendas simulados: uma gravação
+# feita com main.py --gravar-leituras, ou um fluxo gerado aqui com leituras
+# no ritmo de um leitor, quantidades digitadas à mão ("3*") e leituras
+# caídas no campo do nome. No fluxo gerado cada leitura esperada é
+# conferida com o que chegou ao carrinho: nenhuma pode se perder. Mede o
+# tempo de tratamento de cada leitura (p50/p99). O carrinho é limpo a cada
+# venda, sem gravar nada no banco.
+#
+#   python benchmarks/reproduzir_leituras.py pdv.db [gravacao.tsv]
+#   python benchmarks/reproduzir_leituras.py pdv.db --gerar [vendas] [itens_por_venda] [--salvar arquivo.tsv]
+
+# ms entre as teclas: leitor, pessoa, e entre um produto e o próximo
+TECLA_LEITOR = (2, 8)
+TECLA_PESSOA = (110, 260)
+ENTRE_PRODUTOS = (600, 1500)
+CHANCE_QUANTIDADE = 0.15
+CHANCE_CAMPO_NOME = 0.10
+CHANCE_REPETIR = 0.10
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))] if ordenados else 0.0
+
+def gerar(codigos, vendas, itens_por_venda, semente=None):
+    # (eventos, leituras esperadas [(quantidade, codigo)])
+    sorteio = random.Random(semente)
+    eventos = []
+    esperadas = []
+    instante = 0
+
+    def digitar(texto, campo, ritmo):
+        nonlocal instante
+        for caractere in texto:
+            instante += sorteio.randint(*ritmo)
+            eventos.append((instante, campo, caractere))
+
+    for _ in range(vendas):
+        codigo = None
+        for _ in range(itens_por_venda):
+            instante += sorteio.randint(*ENTRE_PRODUTOS)
+            if codigo is None or sorteio.random() >= CHANCE_REPETIR:
+                codigo = sorteio.choice(codigos)
+            quantidade = 1
+            campo = "codigo"
+            if sorteio.random() < CHANCE_CAMPO_NOME:
+                # Operador começou a digitar um nome e passou o produto no leitor
+                campo = "produto"
+                digitar("arr", campo, TECLA_PESSOA)
+            elif sorteio.random() < CHANCE_QUANTIDADE:
+                quantidade = sorteio.randint(2, 12)
+                digitar(f"{quantidade}*", campo, TECLA_PESSOA)
+            if campo != "codigo" or quantidade > 1:
+                # Pausa entre a última tecla digitada e o gatilho do leitor
+                instante += sorteio.randint(*TECLA_PESSOA)
+            digitar(codigo, campo, TECLA_LEITOR)
+            instante += sorteio.randint(*TECLA_LEITOR)
+            eventos.append((instante, campo, leitor.ENTER))
+            esperadas.append((quantidade, codigo))
+            if campo == "produto":
+                # Apaga o nome começado
+                for _ in range(3):
+                    instante += sorteio.randint(*TECLA_PESSOA)
+                    eventos.append((instante, campo, leitor.APAGAR))
+        instante += sorteio.randint(*ENTRE_PRODUTOS)
+        eventos.append((instante, "-", leitor.FINALIZAR))
+    return eventos, esperadas
+
+def reproduzir(caixa, eventos):
+    # Mesmas regras de main.ao_teclar: no campo do código o Enter lança o
+    # texto do campo; nos outros, só a rajada do leitor (tirada do campo)
+    detector = leitor.DetectorRajada()
+    campos = {"codigo": "", "produto": "", "qtd": ""}
+    lidas = []
+    erros = []
+    tempos = []
+    vendas = 0
+    for instante, campo, tecla in eventos:
+        if tecla == leitor.FINALIZAR:
+            if caixa.carrinho:
+                vendas += 1
+            caixa.carrinho.limpar()
+            continue
+        if tecla == leitor.APAGAR:
+            campos[campo] = campos[campo][:-1]
+            detector.apagar(campo)
+            continue
+        if tecla != leitor.ENTER:
+            campos[campo] += tecla
+            detector.tecla(tecla, instante, campo)
+            continue
+
+        inicio = time.perf_counter()
+        codigo = detector.enter(instante, campo)
+        if campo == "codigo":
+            texto, campos[campo] = campos[campo], ""
+        elif codigo is not None:
+            texto = codigo
+            campos[campo] = campos[campo][:-len(codigo)]
+        else:
+            continue
+        if not texto.strip():
+            continue
+        try:
+            lidas.append(leitor.interpretar(texto))
+            caixa.ler_codigo(texto)
+        except (ErroCaixa, leitor.ErroLeitura) as e:
+            erros.append(f"{texto}: {e}")
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return {"vendas": vendas, "lidas": lidas, "erros": erros, "tempos": tempos, "campos": campos}
+
+if __name__ == "__main__":
+    argumentos = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if not argumentos:
+        print("Uso: python benchmarks/reproduzir_leituras.py pdv.db [gravacao.tsv | --gerar [vendas] [itens]]")
+        sys.exit(2)
+    caixa = Caixa(argumentos[0])
+    esperadas = None
+    if "--gerar" in sys.argv:
+        salvar = None
+        if "--salvar" in sys.argv:
+            salvar = sys.argv[sys.argv.index("--salvar") + 1]
+            argumentos.remove(salvar)
+        vendas = int(argumentos[1]) if len(argumentos) > 1 else 200
+        itens = int(argumentos[2]) if len(argumentos) > 2 else 15
+        eventos, esperadas = gerar([codigo for codigo in caixa.catalogo.codigos if codigo], vendas, itens, semente=1)
+        if salvar:
+            with open(salvar, "w", encoding="utf-8") as arquivo:
+                arquivo.writelines(leitor.linha_gravacao(*evento) for evento in eventos)
+    elif len(argumentos) > 1:
+        eventos = list(leitor.ler_gravacao(argumentos[1]))
+    else:
+        print("Informe a gravação ou --gerar")
+        sys.exit(2)
+
+    r = reproduzir(caixa, eventos)
+    banco.fechar()
+    tempos = r["tempos"]
+    minutos = (eventos[-1][0] - eventos[0][0]) / 60000 if eventos else 0
+    print(f"{len(eventos)} teclas, {len(r['lidas'])} leituras em {r['vendas']} vendas, {len(r['erros'])} recusadas")
+    if minutos:
+        print(f"Ritmo da gravação: {len(r['lidas']) / minutos:.0f} leituras/min")
+    print(f"Tratamento por leitura: p50 {percentil(tempos, 50):.3f} ms, p99 {percentil(tempos, 99):.3f} ms, "
+          f"máx {max(tempos, default=0.0):.3f} ms")
+    for erro in r["erros"][:5]:
+        print(f"  recusada {erro}")
+    if esperadas is not None:
+        perdidas = len(esperadas) - sum(1 for a, b in zip(esperadas, r["lidas"]) if a == b)
+        sobras = "".join(r["campos"].values())
+        print(f"Leituras esperadas {len(esperadas)}, perdidas ou trocadas {perdidas}, "
+              f"texto sobrando nos campos: {sobras!r}")
+        sys.exit(1 if perdidas or sobras else 0)
@@ -0,0 +1,86 @@
+# ---------------- Carrinho de compras ----------------
+# Uma linha por produto: adicionar o mesmo produto soma na linha existente.
+# Valores em centavos inteiros, para o total não acumular erro de ponto
+# flutuante. Cada operação informa a posição da linha afetada, para a tela
+# atualizar só aquela linha da lista.
+
+def para_centavos(valor):
+    return int(round(valor * 100))
+
+def formatar_reais(centavos):
+    return f"{centavos // 100}.{centavos % 100:02d}" if centavos >= 0 else "-" + formatar_reais(-centavos)
+
+class ItemCarrinho:
+    __slots__ = ("produto_id", "nome", "preco_centavos", "quantidade", "posicao")
+
+    def __init__(self, produto_id, nome, preco_centavos, quantidade, posicao):
+        self.produto_id = produto_id
+        self.nome = nome
+        self.preco_centavos = preco_centavos
+        self.quantidade = quantidade
+        self.posicao = posicao
+
+    @property
+    def subtotal_centavos(self):
+        return self.preco_centavos * self.quantidade
+
+    def descricao(self):
+        return f"{self.nome} x{self.quantidade} - R$ {formatar_reais(self.subtotal_centavos)}"
+
+class Carrinho:
+    def __init__(self):
+        self.itens = {}
+        self.ordem = []
+        self.total_centavos = 0
+
+    def __len__(self):
+        return len(self.ordem)
+
+    def __iter__(self):
+        return iter(self.ordem)
+
+    @property
+    def total(self):
+        return self.total_centavos / 100
+
+    def quantidade_de(self, produto_id):
+        item = self.itens.get(produto_id)
+        return item.quantidade if item else 0
+
+    def adicionar(self, produto_id, nome, preco, quantidade):
+        # Retorna (item, nova_linha)
+        item = self.itens.get(produto_id)
+        if item is None:
+            item = ItemCarrinho(produto_id, nome, para_centavos(preco), quantidade, len(self.ordem))
+            self.itens[produto_id] = item
+            self.ordem.append(item)
+            self.total_centavos += item.subtotal_centavos
+            return item, True
+        item.quantidade += quantidade
+        self.total_centavos += item.preco_centavos * quantidade
+        return item, False
+
+    def alterar_quantidade(self, posicao, quantidade):
+        item = self.ordem[posicao]
+        self.total_centavos += item.preco_centavos * (quantidade - item.quantidade)
+        item.quantidade = quantidade
+        return item
+
+    def remover(self, posicao):
+        item = self.ordem.pop(posicao)
+        del self.itens[item.produto_id]
+        self.total_centavos -= item.subtotal_centavos
+        # As linhas abaixo sobem uma posição, como na Listbox
+        for seguinte in self.ordem[posicao:]:
+            seguinte.posicao -= 1
+        return item
+
+    def limpar(self):
+        self.itens.clear()
+        self.ordem.clear()
+        self.total_centavos = 0
+
+    def itens_para_venda(self):
+        # (produto_id, quantidade, preco_unitario, total_item) em reais
+        return [(item.produto_id, item.quantidade, item.preco_centavos / 100, item.subtotal_centavos / 100)
+                for item in self.ordem]
@@ -0,0 +1,199 @@
+import unicodedata
+from array import array
+from bisect import bisect_left, insort
+from heapq import nsmallest
+
+# ---------------- Validação ----------------
+# Regras de cadastro compartilhadas pelo formulário e pela importação.
+def validar_produto(nome, preco, estoque, codigo_barras=None, estoque_minimo=None):
+    # estoque_minimo em branco vira None: o banco usa o padrão (ou mantém o atual)
+    nome = (nome or "").strip().title()
+    codigo_barras = (codigo_barras or "").strip()
+    estoque_minimo = "" if estoque_minimo is None else str(estoque_minimo).strip()
+    
+    if not nome:
+        raise ValueError("Nome do produto é obrigatório!")
+    
+    try:
+        preco = float(preco)
+        estoque = int(estoque)
+    except (TypeError, ValueError):
+        raise ValueError("Preço e estoque devem ser numéricos")
+    if preco <= 0 or estoque < 0:
+        raise ValueError("Preço deve ser > 0 e Estoque >= 0!")
+    
+    if estoque_minimo:
+        try:
+            estoque_minimo = int(estoque_minimo)
+        except ValueError:
+            raise ValueError("Estoque mínimo deve ser numérico")
+        if estoque_minimo < 0:
+            raise ValueError("Estoque mínimo deve ser >= 0!")
+    else:
+        estoque_minimo = None
+    
+    return nome, preco, estoque, codigo_barras or None, estoque_minimo
+
+# ---------------- Cache do catálogo ----------------
+def normalizar_nome(nome):
+    return " ".join(nome.split()).casefold()
+
+# Também o DEFAULT da coluna produtos.estoque_minimo (migracoes._v4_estoque_minimo)
+ESTOQUE_MINIMO_PADRAO = 5
+
+class CatalogoProdutos:
+    # Cópia em memória da tabela produtos. Os campos ficam em colunas
+    # compactas (array/list) e os dicionários apontam para a posição do
+    # registro, permitindo busca O(1) por código de barras e por nome.
+    # O conjunto estoque_baixo (ids abaixo do mínimo) é mantido a cada
+    # mudança de estoque, sem percorrer o catálogo.
+    def __init__(self):
+        self.ids = array('q')
+        self.nomes = []
+        self.precos = array('d')
+        self.estoques = array('q')
+        self.minimos = array('q')
+        self.codigos = []
+        self.estoque_baixo = set()
+        self.por_id = {}
+        self.por_codigo = {}
+        self.por_nome = {}
+        self.acertos = 0
+        self.falhas = 0
+
+    def carregar(self, produtos):
+        self.__init__()
+        for produto in produtos:
+            self.adicionar(*produto)
+
+    def adicionar(self, prod_id, nome, preco, estoque, codigo_barras=None, estoque_minimo=ESTOQUE_MINIMO_PADRAO):
+        pos = len(self.ids)
+        self.ids.append(prod_id)
+        self.nomes.append(nome)
+        self.precos.append(preco)
+        self.estoques.append(estoque)
+        self.minimos.append(ESTOQUE_MINIMO_PADRAO if estoque_minimo is None else estoque_minimo)
+        self.codigos.append(codigo_barras)
+        self._conferir_minimo(pos)
+        self.por_id[prod_id] = pos
+        self.por_nome[normalizar_nome(nome)] = pos
+        if codigo_barras:
+            self.por_codigo[codigo_barras] = pos
+        return pos
+
+    def _registro(self, pos):
+        if pos is None:
+            self.falhas += 1
+            return None
+        self.acertos += 1
+        return self.ids[pos], self.nomes[pos], self.precos[pos], self.estoques[pos]
+
+    def buscar_por_codigo(self, codigo):
+        return self._registro(self.por_codigo.get(codigo))
+
+    def buscar_por_nome(self, nome):
+        return self._registro(self.por_nome.get(normalizar_nome(nome)))
+
+    def buscar_por_id(self, prod_id):
+        return self._registro(self.por_id.get(prod_id))
+
+    def baixar_estoque(self, prod_id, qtd):
+        pos = self.por_id.get(prod_id)
+        if pos is not None:
+            self.estoques[pos] -= qtd
+            self._conferir_minimo(pos)
+
+    def definir_estoque(self, prod_id, estoque):
+        pos = self.por_id.get(prod_id)
+        if pos is not None:
+            self.estoques[pos] = estoque
+            self._conferir_minimo(pos)
+
+    def _conferir_minimo(self, pos):
+        if self.estoques[pos] <= self.minimos[pos]:
+            self.estoque_baixo.add(self.ids[pos])
+        else:
+            self.estoque_baixo.discard(self.ids[pos])
+
+    def situacao_estoque(self, prod_id):
+        # (id, nome, estoque, estoque_minimo, codigo_barras), como banco.produtos_estoque_baixo()
+        pos = self.por_id.get(prod_id)
+        if pos is None:
+            return None
+        return self.ids[pos], self.nomes[pos], self.estoques[pos], self.minimos[pos], self.codigos[pos]
+
+# ---------------- Índice de busca por nome ----------------
+def chave_busca(texto):
+    # Remove acentos e normaliza caixa: "Pão Francês" -> "pao frances"
+    decomposto = unicodedata.normalize("NFKD", texto)
+    sem_acento = "".join(c for c in decomposto if not unicodedata.combining(c))
+    return " ".join(sem_acento.split()).casefold()
+
+class IndiceBusca:
+    # Índice de bigramas/trigramas sobre as chaves sem acento do catálogo.
+    # As posições são as mesmas do CatalogoProdutos. A busca usa a lista
+    # de postagens mais rara como candidatos e confirma por substring;
+    # quando o texto apenas cresce, refina os candidatos da busca anterior.
+    def __init__(self, catalogo):
+        self.catalogo = catalogo
+        self.chaves = []
+        self.ordenadas = []
+        self.gramas = {}
+        self.frequencia = {}
+        self._ultima = None
+
+    def carregar(self, frequencia_vendas):
+        self.__init__(self.catalogo)
+        for pos, nome in enumerate(self.catalogo.nomes):
+            self._indexar(pos, nome)
+        self.ordenadas.sort()
+        for prod_id, total in frequencia_vendas:
+            pos = self.catalogo.por_id.get(prod_id)
+            if pos is not None:
+                self.frequencia[pos] = total or 0
+
+    def _indexar(self, pos, nome):
+        chave = chave_busca(nome)
+        self.chaves.append(chave)
+        self.ordenadas.append((chave, pos))
+        for grama in {chave[i:i + n] for n in (2, 3) for i in range(len(chave) - n + 1)}:
+            self.gramas.setdefault(grama, array('l')).append(pos)
+
+    def adicionar(self, pos, nome):
+        self._indexar(pos, nome)
+        self.ordenadas.pop()
+        insort(self.ordenadas, (self.chaves[pos], pos))
+        self._ultima = None
+
+    def registrar_venda(self, prod_id, qtd):
+        pos = self.catalogo.por_id.get(prod_id)
+        if pos is not None:
+            self.frequencia[pos] = self.frequencia.get(pos, 0) + qtd
+
+    def _candidatos(self, chave):
+        # Retorna (candidatos, refinavel). Só conjuntos completos de
+        # substring podem ser refinados na próxima tecla.
+        if self._ultima and chave.startswith(self._ultima[0]):
+            return [p for p in self._ultima[1] if chave in self.chaves[p]], True
+        if len(chave) == 1:
+            # Uma letra só: prefixo pela lista ordenada
+            inicio = bisect_left(self.ordenadas, (chave,))
+            fim = bisect_left(self.ordenadas, (chave + "\uffff",))
+            return [pos for _, pos in self.ordenadas[inicio:fim]], False
+        n = 3 if len(chave) >= 3 else 2
+        postagens = [self.gramas.get(chave[i:i + n], ()) for i in range(len(chave) - n + 1)]
+        menor = min(postagens, key=len)
+        return [p for p in menor if chave in self.chaves[p]], True
+
+    def buscar(self, texto, limite=5):
+        chave = chave_busca(texto)
+        if not chave:
+            self._ultima = None
+            return []
+        candidatos, refinavel = self._candidatos(chave)
+        self._ultima = (chave, candidatos) if refinavel else None
+        chaves = self.chaves
+        frequencia = self.frequencia
+        melhores = nsmallest(limite, candidatos,
+                             key=lambda p: (not chaves[p].startswith(chave), -frequencia.get(p, 0), chaves[p]))
+        return [self.catalogo.nomes[p] for p in melhores]
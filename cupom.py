@@ -0,0 +1,364 @@
+import glob
+import os
+import queue
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from itertools import groupby
+
+import banco
+
+# ---------------- Cupom ----------------
+# O cupom é descrito por um modelo (lista de linhas com estilo e texto de
+# formatação), renderizado a partir dos dados da venda e então codificado
+# em texto simples ou em ESC/POS cru para impressoras térmicas.
+
+LARGURA = 40
+LOJA = "SUPERMERCADO PYTHON"
+
+# (estilo, texto). O estilo "itens" expande em duas linhas por item.
+MODELO_CUPOM = [
+    ("titulo", "{loja}"),
+    ("centro", "CUPOM FISCAL"),
+    ("texto", "Venda: #{venda_id} - {data}"),
+    ("separador", ""),
+    ("itens", ""),
+    ("separador", ""),
+    ("total", "TOTAL: R${total:.2f}"),
+    ("centro", "Obrigado pela preferência!"),
+]
+
+class DadosCupom:
+    def __init__(self, venda_id, data, total, itens):
+        self.venda_id = venda_id
+        self.data = data
+        self.total = total
+        # [(nome, quantidade, preco_unitario, total_item)]
+        self.itens = itens
+
+def _dados_das_linhas(linhas):
+    # linhas de banco.cupom_venda()/cupons_intervalo(), uma venda por vez
+    primeira = linhas[0]
+    return DadosCupom(primeira[0], primeira[1], primeira[2], [linha[3:] for linha in linhas])
+
+def dados_venda(venda_id):
+    linhas = banco.cupom_venda(venda_id)
+    return _dados_das_linhas(linhas) if linhas else None
+
+def dados_intervalo(primeiro_id, ultimo_id):
+    linhas = banco.cupons_intervalo(primeiro_id, ultimo_id)
+    return [_dados_das_linhas(list(grupo)) for _, grupo in groupby(linhas, key=lambda linha: linha[0])]
+
+def renderizar(dados, modelo=MODELO_CUPOM):
+    campos = {"loja": LOJA, "venda_id": dados.venda_id, "data": dados.data, "total": dados.total}
+    linhas = []
+    for estilo, texto in modelo:
+        if estilo == "itens":
+            for nome, quantidade, preco, total_item in dados.itens:
+                linhas.append(("texto", f"{nome[:20]:<20} {quantidade}x R${preco:.2f}"))
+                linhas.append(("texto", f"{'':<20} R${total_item:.2f}"))
+        elif estilo == "separador":
+            linhas.append(("texto", "-" * LARGURA))
+        else:
+            linhas.append((estilo, texto.format(**campos)))
+    return linhas
+
+def como_texto(linhas):
+    return "".join((texto.center(LARGURA).rstrip() if estilo in ("titulo", "centro") else texto) + "\n"
+                   for estilo, texto in linhas)
+
+# ---------------- ESC/POS ----------------
+ESC_INICIAR = b"\x1b@"
+ESC_PAGINA_PORTUGUES = b"\x1bt\x03"     # PC860
+ESC_ESQUERDA = b"\x1ba\x00"
+ESC_CENTRO = b"\x1ba\x01"
+ESC_NEGRITO = b"\x1bE\x01"
+ESC_SEM_NEGRITO = b"\x1bE\x00"
+GS_TAMANHO_DUPLO = b"\x1d!\x11"
+GS_TAMANHO_NORMAL = b"\x1d!\x00"
+GS_AVANCAR_CORTAR = b"\x1dVB\x03"       # avança 3 linhas e corta parcial
+CODIFICACAO = "cp860"
+
+_ESTILOS_ESCPOS = {
+    "titulo": (ESC_CENTRO + ESC_NEGRITO + GS_TAMANHO_DUPLO, GS_TAMANHO_NORMAL + ESC_SEM_NEGRITO + ESC_ESQUERDA),
+    "centro": (ESC_CENTRO, ESC_ESQUERDA),
+    "total": (ESC_NEGRITO, ESC_SEM_NEGRITO),
+    "texto": (b"", b""),
+}
+
+def como_escpos(linhas):
+    partes = [ESC_INICIAR, ESC_PAGINA_PORTUGUES]
+    for estilo, texto in linhas:
+        antes, depois = _ESTILOS_ESCPOS[estilo]
+        partes.append(antes + texto.encode(CODIFICACAO, errors="replace") + b"\n" + depois)
+    partes.append(GS_AVANCAR_CORTAR)
+    return b"".join(partes)
+
+# ---------------- Impressoras ----------------
+# Cada impressora codifica o cupom renderizado (ESC/POS ou texto) e envia
+# os bytes; falhas sobem como OSError para o spooler tentar de novo.
+class ImpressoraDispositivo:
+    # Porta da impressora aberta como arquivo: /dev/usb/lp0, /dev/ttyUSB0,
+    # LPT1 ou o compartilhamento \\computador\impressora no Windows
+    def __init__(self, caminho):
+        self.caminho = caminho
+
+    def codificar(self, linhas):
+        return como_escpos(linhas)
+
+    def enviar(self, dados, nome):
+        with open(self.caminho, "wb") as porta:
+            porta.write(dados)
+
+    def __str__(self):
+        return self.caminho
+
+class ImpressoraSistema:
+    # Impressora padrão do sistema, em texto simples: lp no Linux/Mac,
+    # notepad /p no Windows
+    def codificar(self, linhas):
+        return como_texto(linhas).encode("utf-8")
+
+    def enviar(self, dados, nome):
+        if os.name == "nt":
+            with tempfile.NamedTemporaryFile(delete=False, prefix=nome + "_", suffix=".txt") as arquivo:
+                arquivo.write(dados)
+            try:
+                resultado = subprocess.run(["notepad", "/p", arquivo.name], check=False)
+            finally:
+                os.remove(arquivo.name)
+        else:
+            resultado = subprocess.run(["lp", "-t", nome], input=dados, capture_output=True, check=False)
+        if resultado.returncode != 0:
+            raise OSError(f"impressão falhou (código {resultado.returncode})")
+
+    def __str__(self):
+        return "impressora do sistema"
+
+class ImpressoraArquivo:
+    # Impressora de mentira: grava o ESC/POS cru de cada trabalho na pasta
+    def __init__(self, diretorio="cupons"):
+        self.diretorio = diretorio
+
+    def codificar(self, linhas):
+        return como_escpos(linhas)
+
+    def enviar(self, dados, nome):
+        os.makedirs(self.diretorio, exist_ok=True)
+        with open(os.path.join(self.diretorio, nome + ".bin"), "wb") as saida:
+            saida.write(dados)
+
+    def __str__(self):
+        return f"arquivo ({self.diretorio})"
+
+def impressora_configurada():
+    # PDV_IMPRESSORA aponta a porta da impressora térmica ("arquivo" grava
+    # os cupons em cupons/); sem ela, a impressora padrão do sistema
+    caminho = os.environ.get("PDV_IMPRESSORA")
+    if not caminho:
+        return ImpressoraSistema()
+    return ImpressoraArquivo() if caminho == "arquivo" else ImpressoraDispositivo(caminho)
+
+# ---------------- Fila de impressão ----------------
+# Cada pedido vira um arquivo .pedido em spool/pendentes já na chamada de
+# enfileirar(), então nada se perde se o programa fechar ou a impressora
+# estiver desligada: os pendentes são retomados na próxima abertura. Uma
+# thread própria troca cada pedido pelo cupom pronto (.escpos, com o mesmo
+# nome), imprime em ordem e, se o disco, o banco ou a impressora falhar,
+# tenta de novo com espera crescente. Um pedido que não dá para ler ou
+# montar vai para spool/falhas sem travar a fila, e o operador pode
+# descartar o primeiro da fila (descartar_primeiro) se ele não sair. Trabalhos
+# impressos (e os cupons de ImpressoraArquivo) ficam alguns dias para
+# conferência e depois são apagados.
+
+DIRETORIO_SPOOL = "spool"
+ESPERA_INICIAL = 2
+ESPERA_MAXIMA = 60
+MANTER_IMPRESSOS_DIAS = 7
+
+class Spooler:
+    def __init__(self, impressora, diretorio=DIRETORIO_SPOOL):
+        self.impressora = impressora
+        self.pendentes = os.path.join(diretorio, "pendentes")
+        self.impressos = os.path.join(diretorio, "impressos")
+        self.falhas = os.path.join(diretorio, "falhas")
+        for pasta in (self.pendentes, self.impressos, self.falhas):
+            os.makedirs(pasta, exist_ok=True)
+        # Pedidos que não puderam ser gravados no disco na hora
+        self._novos = queue.SimpleQueue()
+        self._trava = threading.Lock()
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._thread = None
+        self._sequencia = 0
+        self.ultimo_erro = None
+        # Sobre um pedido já tratado (sem cupons, separado em falhas): fica
+        # até o próximo pedido
+        self.aviso = None
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._trabalhar, name="pdv-spooler", daemon=True)
+        self._thread.start()
+        return self
+
+    def encerrar(self):
+        self._parar.set()
+        self._acordar.set()
+
+    # Chamados pela tela: só gravam o pedido, nunca esperam a impressora
+    def enfileirar(self, venda_id):
+        self._pedir(f"venda_{venda_id}")
+
+    def reimprimir(self, primeiro_id, ultimo_id):
+        # Um trabalho só com todos os cupons do intervalo
+        self._pedir(f"vendas_{primeiro_id}_a_{ultimo_id}")
+
+    def _pedir(self, nome):
+        with self._trava:
+            self._sequencia += 1
+            arquivo = os.path.join(self.pendentes, f"{time.time_ns()}_{self._sequencia:04d}_{nome}.pedido")
+        try:
+            _gravar_arquivo(arquivo, nome.encode())
+        except OSError as e:
+            # A thread do spooler tenta gravar de novo
+            self.ultimo_erro = f"Erro ao gravar o pedido {nome}: {e}"
+            self._novos.put(arquivo)
+        self.aviso = None
+        self._acordar.set()
+
+    def descartar_primeiro(self):
+        # Tira da fila o trabalho que não sai (vai para spool/falhas)
+        pendentes = self._arquivos_pendentes()
+        if not pendentes:
+            return None
+        nome = self._separar(pendentes[0])
+        self._acordar.set()
+        return nome
+
+    def _separar(self, arquivo):
+        os.replace(arquivo, os.path.join(self.falhas, os.path.basename(arquivo)))
+        return os.path.basename(arquivo)
+
+    def aguardando(self):
+        return len(self._arquivos_pendentes()) + self._novos.qsize()
+
+    def _arquivos_pendentes(self):
+        # Pedidos e cupons prontos, na ordem de chegada
+        return sorted(glob.glob(os.path.join(self.pendentes, "*.pedido"))
+                      + glob.glob(os.path.join(self.pendentes, "*.escpos")))
+
+    # Thread do spooler
+    def _trabalhar(self):
+        try:
+            self.limpar()
+        except Exception as e:
+            self.ultimo_erro = f"Erro ao limpar o spool: {e}"
+        espera = ESPERA_INICIAL
+        while not self._parar.is_set():
+            atual = None
+            try:
+                self._gravar_novos()
+                pendentes = self._arquivos_pendentes()
+                if not pendentes:
+                    self._acordar.wait()
+                    self._acordar.clear()
+                    continue
+                atual = pendentes[0]
+                if atual.endswith(".pedido"):
+                    self._renderizar(atual)
+                else:
+                    self._imprimir(atual)
+            except (OSError, sqlite3.Error) as e:
+                self.ultimo_erro = f"{self.impressora}: {e}"
+                espera = self._esperar(espera)
+                continue
+            except Exception as e:
+                # Pedido que não dá para ler ou montar: tentar de novo não adianta
+                if atual is None:
+                    self.ultimo_erro = f"Erro no spooler: {e!r}"
+                    espera = self._esperar(espera)
+                    continue
+                try:
+                    nome = self._separar(atual)
+                except OSError as erro:
+                    self.ultimo_erro = f"{self.impressora}: {erro}"
+                    espera = self._esperar(espera)
+                    continue
+                self.aviso = f"Pedido {nome} com erro ({e!r}): movido para {self.falhas}"
+            self.ultimo_erro = None
+            espera = ESPERA_INICIAL
+
+    def _esperar(self, espera):
+        # Retorna a próxima espera
+        self._acordar.wait(espera)
+        self._acordar.clear()
+        return min(espera * 2, ESPERA_MAXIMA)
+
+    def _gravar_novos(self):
+        while True:
+            try:
+                arquivo = self._novos.get_nowait()
+            except queue.Empty:
+                return
+            nome = os.path.splitext(os.path.basename(arquivo))[0].split("_", 2)[2]
+            try:
+                _gravar_arquivo(arquivo, nome.encode())
+            except OSError:
+                self._novos.put(arquivo)
+                raise
+
+    def _renderizar(self, pedido):
+        base = os.path.splitext(pedido)[0]
+        nome = os.path.basename(base).split("_", 2)[2]
+        tipo, _, valor = nome.partition("_")
+        if tipo == "venda":
+            dados = dados_venda(int(valor))
+            cupons = [dados] if dados else []
+        else:
+            primeiro, _, ultimo = valor.partition("_a_")
+            cupons = dados_intervalo(int(primeiro), int(ultimo))
+        if cupons:
+            _gravar_arquivo(base + ".escpos",
+                            b"".join(self.impressora.codificar(renderizar(dados)) for dados in cupons))
+        else:
+            self.aviso = f"Nada para imprimir em {nome}"
+        os.remove(pedido)
+
+    def _imprimir(self, arquivo):
+        with open(arquivo, "rb") as entrada:
+            dados = entrada.read()
+        nome = os.path.splitext(os.path.basename(arquivo))[0]
+        self.impressora.enviar(dados, nome)
+        os.replace(arquivo, os.path.join(self.impressos, os.path.basename(arquivo)))
+
+    def limpar(self, dias=MANTER_IMPRESSOS_DIAS):
+        # Apaga impressos antigos e restos de gravações interrompidas
+        limite = time.time() - dias * 86400
+        removidos = 0
+        antigos = glob.glob(os.path.join(self.impressos, "*"))
+        if isinstance(self.impressora, ImpressoraArquivo):
+            antigos += glob.glob(os.path.join(self.impressora.diretorio, "*.bin"))
+        for arquivo in antigos:
+            if os.path.getmtime(arquivo) < limite:
+                os.remove(arquivo)
+                removidos += 1
+        for arquivo in glob.glob(os.path.join(self.pendentes, "*.tmp")):
+            os.remove(arquivo)
+            removidos += 1
+        return removidos
+
+def _gravar_arquivo(caminho, dados):
+    # Aparece inteiro ou não aparece
+    with open(caminho + ".tmp", "wb") as saida:
+        saida.write(dados)
+    os.replace(caminho + ".tmp", caminho)
+
+if __name__ == "__main__":
+    # Mostra o cupom de uma venda em texto: python cupom.py venda_id [pdv.db]
+    banco.iniciar(sys.argv[2] if len(sys.argv) > 2 else banco.CAMINHO_BANCO)
+    dados = dados_venda(int(sys.argv[1]))
+    print(como_texto(renderizar(dados)) if dados else "Venda não encontrada")
+    banco.fechar()
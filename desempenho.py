@@ -0,0 +1,277 @@
+import cProfile
+import logging
+import os
+import pstats
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+
+# ---------------- Medição de desempenho ----------------
+# Cronometra cada consulta SQL feita pelas conexões de banco.py (agrupadas
+# pelo texto normalizado do SQL), cada callback da tela marcado com
+# @medido e cada tarefa do pool. Cada operação guarda as últimas amostras
+# para os percentis p50/p95/p99. Operações acima do limite e erros vão
+# para o log de diagnóstico, se iniciado (iniciar_log). A aba oculta de
+# diagnóstico (Ctrl+Shift+D) mostra os números e pode capturar o perfil
+# (cProfile) de uma venda.
+# PDV_MEDIR=0 desliga a medição; PDV_LIMITE_LENTO_MS muda o limite.
+
+ATIVO = os.environ.get("PDV_MEDIR", "1") != "0"
+AMOSTRAS_POR_OPERACAO = 2000
+limite_lento_ms = float(os.environ.get("PDV_LIMITE_LENTO_MS", "100"))
+ARQUIVO_LOG = os.path.join("logs", "diagnostico.log")
+TAMANHO_LOG = 1_000_000
+LOGS_ANTIGOS = 3
+DIRETORIO_PERFIS = "perfis"
+LINHAS_PERFIL = 40
+
+class Operacao:
+    __slots__ = ("tipo", "nome", "chamadas", "erros", "total_ms", "maximo_ms", "amostras")
+
+    def __init__(self, tipo, nome):
+        self.tipo = tipo
+        self.nome = nome
+        self.chamadas = 0
+        self.erros = 0
+        self.total_ms = 0.0
+        self.maximo_ms = 0.0
+        # Janela móvel: só as últimas amostras entram nos percentis
+        self.amostras = deque(maxlen=AMOSTRAS_POR_OPERACAO)
+
+_operacoes = {}
+_trava = threading.Lock()
+_log = None
+
+def iniciar_log(arquivo=ARQUIVO_LOG):
+    # Sem log iniciado (scripts, benchmarks) as medidas ficam só na memória
+    global _log
+    with _trava:
+        if _log is None:
+            os.makedirs(os.path.dirname(arquivo) or ".", exist_ok=True)
+            manipulador = RotatingFileHandler(arquivo, maxBytes=TAMANHO_LOG, backupCount=LOGS_ANTIGOS,
+                                              encoding="utf-8", delay=True)
+            manipulador.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+            log = logging.getLogger("pdv.diagnostico")
+            log.addHandler(manipulador)
+            log.setLevel(logging.INFO)
+            log.propagate = False
+            _log = log
+        return _log
+
+def registrar(tipo, nome, ms, erro=False):
+    # Thread-safe
+    with _trava:
+        operacao = _operacoes.get((tipo, nome))
+        if operacao is None:
+            operacao = _operacoes[(tipo, nome)] = Operacao(tipo, nome)
+        operacao.chamadas += 1
+        operacao.total_ms += ms
+        operacao.amostras.append(ms)
+        if ms > operacao.maximo_ms:
+            operacao.maximo_ms = ms
+        if erro:
+            operacao.erros += 1
+    if ms >= limite_lento_ms and _log is not None:
+        _log.warning("lenta %s %.1f ms: %s", tipo, ms, nome)
+
+def registrar_erro(onde, erro):
+    if _log is not None:
+        _log.error("%s: %s", onde, erro, exc_info=(type(erro), erro, erro.__traceback__))
+
+def definir_limite_lento(ms):
+    global limite_lento_ms
+    limite_lento_ms = float(ms)
+
+def percentil(ordenadas, p):
+    return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * p / 100))] if ordenadas else 0.0
+
+def resumo():
+    # [(tipo, nome, chamadas, erros, p50, p95, p99, máximo, total)], do maior tempo total para o menor
+    with _trava:
+        copias = [(op.tipo, op.nome, op.chamadas, op.erros, op.maximo_ms, op.total_ms, sorted(op.amostras))
+                  for op in _operacoes.values()]
+    linhas = [(tipo, nome, chamadas, erros, percentil(amostras, 50), percentil(amostras, 95),
+               percentil(amostras, 99), maximo, total)
+              for tipo, nome, chamadas, erros, maximo, total, amostras in copias]
+    return sorted(linhas, key=lambda linha: linha[-1], reverse=True)
+
+def zerar():
+    with _trava:
+        _operacoes.clear()
+
+# ---------------- SQL ----------------
+# Literais viram "?" e espaços se juntam, para a mesma consulta cair na
+# mesma operação. Os textos normalizados ficam guardados por SQL.
+_LITERAIS = re.compile(r"'(?:[^']|'')*'|(?<![\w?])-?\d+(?:\.\d+)?")
+_ESPACOS = re.compile(r"\s+")
+_normalizados = {}
+MAXIMO_NORMALIZADOS = 1000
+
+def normalizar_sql(sql):
+    texto = _normalizados.get(sql)
+    if texto is None:
+        texto = _ESPACOS.sub(" ", _LITERAIS.sub("?", sql)).strip()
+        if len(_normalizados) >= MAXIMO_NORMALIZADOS:
+            _normalizados.clear()
+        _normalizados[sql] = texto
+    return texto
+
+class CursorMedido(sqlite3.Cursor):
+    # Uma amostra por consulta: o execute mais as leituras (fetch*) do
+    # resultado, registrada quando o resultado acaba ou o cursor é reusado
+    _medida = None
+
+    def _registrar_medida(self):
+        if self._medida is not None:
+            sql, segundos = self._medida
+            self._medida = None
+            registrar("sql", normalizar_sql(sql), segundos * 1000)
+
+    def _somar(self, inicio):
+        if self._medida is not None:
+            self._medida[1] += time.perf_counter() - inicio
+
+    def execute(self, sql, parametros=()):
+        self._registrar_medida()
+        inicio = time.perf_counter()
+        try:
+            super().execute(sql, parametros)
+        except Exception:
+            registrar("sql", normalizar_sql(sql), (time.perf_counter() - inicio) * 1000, erro=True)
+            raise
+        self._medida = [sql, time.perf_counter() - inicio]
+        if self.description is None:
+            self._registrar_medida()
+        return self
+
+    def executemany(self, sql, sequencia):
+        self._registrar_medida()
+        inicio = time.perf_counter()
+        erro = False
+        try:
+            return super().executemany(sql, sequencia)
+        except Exception:
+            erro = True
+            raise
+        finally:
+            registrar("sql", normalizar_sql(sql), (time.perf_counter() - inicio) * 1000, erro)
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        linha = super().fetchone()
+        self._somar(inicio)
+        self._registrar_medida()
+        return linha
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        linhas = super().fetchall()
+        self._somar(inicio)
+        self._registrar_medida()
+        return linhas
+
+    def fetchmany(self, tamanho=None):
+        inicio = time.perf_counter()
+        linhas = super().fetchmany(self.arraysize if tamanho is None else tamanho)
+        self._somar(inicio)
+        if not linhas:
+            self._registrar_medida()
+        return linhas
+
+    def close(self):
+        self._registrar_medida()
+        super().close()
+
+class ConexaoMedida(sqlite3.Connection):
+    # Connection.execute do sqlite3 não passa por cursor(): os dois são trocados
+    def cursor(self, factory=CursorMedido):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, sequencia):
+        return self.cursor().executemany(sql, sequencia)
+
+FABRICA_CONEXAO = ConexaoMedida if ATIVO else sqlite3.Connection
+
+# ---------------- Tela e tarefas ----------------
+def medir_chamada(tipo, funcao, *args):
+    # Para callbacks e tarefas que não são decorados (closures, lambdas)
+    if not ATIVO:
+        return funcao(*args)
+    inicio = time.perf_counter()
+    erro = False
+    try:
+        return funcao(*args)
+    except Exception:
+        erro = True
+        raise
+    finally:
+        registrar(tipo, getattr(funcao, "__qualname__", repr(funcao)), (time.perf_counter() - inicio) * 1000, erro)
+
+class CapturaPerfil:
+    # Perfil da próxima venda: do primeiro callback medido depois de armar
+    # até o fim do callback em que a venda for concluída. Só a thread do
+    # Tk mexe aqui.
+    def __init__(self):
+        self.armada = False
+        self.perfil = None
+        self.concluida = False
+        self.profundidade = 0
+        self.ultimo_arquivo = None
+
+    def armar(self):
+        self.armada = True
+
+    def venda_concluida(self):
+        if self.perfil is not None:
+            self.concluida = True
+
+    def salvar(self):
+        os.makedirs(DIRETORIO_PERFIS, exist_ok=True)
+        base = os.path.join(DIRETORIO_PERFIS, f"venda_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        self.perfil.dump_stats(base + ".prof")
+        with open(base + ".txt", "w", encoding="utf-8") as saida:
+            pstats.Stats(self.perfil, stream=saida).sort_stats("cumulative").print_stats(LINHAS_PERFIL)
+        self.ultimo_arquivo = base + ".prof"
+        self.armada = self.concluida = False
+        self.perfil = None
+
+captura = CapturaPerfil()
+
+def medido(funcao):
+    # Decorador dos callbacks da tela
+    if not ATIVO:
+        return funcao
+    nome = funcao.__name__
+
+    @wraps(funcao)
+    def medir(*args, **kwargs):
+        if captura.armada and captura.perfil is None:
+            captura.perfil = cProfile.Profile()
+        # Callbacks chamados dentro de outro (ou de um messagebox) já estão no perfil
+        perfil = captura.perfil if captura.profundidade == 0 else None
+        captura.profundidade += 1
+        inicio = time.perf_counter()
+        erro = False
+        try:
+            if perfil is not None:
+                perfil.enable()
+            return funcao(*args, **kwargs)
+        except Exception:
+            erro = True
+            raise
+        finally:
+            if perfil is not None:
+                perfil.disable()
+            captura.profundidade -= 1
+            registrar("tela", nome, (time.perf_counter() - inicio) * 1000, erro)
+            if perfil is not None and captura.concluida:
+                captura.salvar()
+    return medir
@@ -0,0 +1,166 @@
+import json
+import os
+import sys
+import uuid
+
+from carrinho import Carrinho, formatar_reais
+
+# ---------------- Diário do caixa ----------------
+# Arquivo só de acréscimo com uma linha JSON por evento do carrinho e da
+# finalização da venda, escrito antes de a tela mostrar o resultado. Se o
+# programa cair no meio de uma venda, recuperar() refaz o carrinho a partir
+# do diário. A venda que estava sendo finalizada leva uma chave, gravada
+# junto com ela (banco.registrar_venda): na recuperação a chave diz se ela
+# chegou ao banco, e finalizar de novo com a mesma chave não duplica.
+# Com sincronizar=True cada evento espera o disco (fsync) e sobrevive a
+# queda de energia; sem, sobrevive ao fechamento forçado do programa.
+# Com o carrinho vazio, o arquivo recomeça quando passa de TAMANHO_MAXIMO.
+#
+#   python diario.py [diario/caixa1.jsonl]    (mostra o que seria recuperado)
+
+DIRETORIO = "diario"
+TAMANHO_MAXIMO = 1_000_000
+
+# Eventos (campo "e")
+ADICIONAR = "adicionar"    # produto, nome, preco (centavos), qtd
+ALTERAR = "alterar"        # posicao, qtd
+REMOVER = "remover"        # posicao
+FINALIZAR = "finalizar"    # chave
+GRAVADA = "gravada"        # chave, venda
+CANCELAR = "cancelar"
+
+def caminho_diario(caixa, diretorio=DIRETORIO):
+    return os.path.join(diretorio, f"caixa{caixa}.jsonl")
+
+class Recuperacao:
+    def __init__(self):
+        self.carrinho = Carrinho()
+        # Finalização sem confirmação depois da última mudança no carrinho
+        self.chave = None
+        self.eventos = 0
+
+def _aplicar(recuperacao, evento):
+    tipo = evento["e"]
+    carrinho = recuperacao.carrinho
+    if tipo == FINALIZAR:
+        recuperacao.chave = evento["chave"]
+        return
+    if tipo in (GRAVADA, CANCELAR):
+        carrinho.limpar()
+    elif tipo == ADICIONAR:
+        carrinho.adicionar(evento["produto"], evento["nome"], evento["preco"] / 100, evento["qtd"])
+    elif tipo == ALTERAR:
+        carrinho.alterar_quantidade(evento["posicao"], evento["qtd"])
+    elif tipo == REMOVER:
+        carrinho.remover(evento["posicao"])
+    recuperacao.chave = None
+
+def ler(caminho):
+    recuperacao = Recuperacao()
+    try:
+        arquivo = open(caminho, "rb")
+    except FileNotFoundError:
+        return recuperacao
+    with arquivo:
+        for linha in arquivo:
+            try:
+                evento = json.loads(linha)
+            except ValueError:
+                # Linha cortada pela queda: o evento não chegou a valer
+                break
+            _aplicar(recuperacao, evento)
+            recuperacao.eventos += 1
+    return recuperacao
+
+def _linha(evento):
+    return json.dumps(evento, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+def _evento_item(item):
+    return {"e": ADICIONAR, "produto": item.produto_id, "nome": item.nome, "preco": item.preco_centavos,
+            "qtd": item.quantidade}
+
+class Diario:
+    # Só a thread do caixa escreve
+    def __init__(self, caminho, sincronizar=False):
+        self.caminho = caminho
+        self.sincronizar = sincronizar
+        # Chave da finalização pendente: reaproveitada se o carrinho não mudar
+        self.chave = None
+        self._fd = None
+
+    def recuperar(self):
+        # Lê o diário e recomeça o arquivo só com o que foi recuperado (sem
+        # o histórico e sem uma última linha cortada)
+        recuperacao = ler(self.caminho)
+        self.fechar()
+        os.makedirs(os.path.dirname(self.caminho) or ".", exist_ok=True)
+        temporario = self.caminho + ".tmp"
+        with open(temporario, "wb") as arquivo:
+            for item in recuperacao.carrinho:
+                arquivo.write(_linha(_evento_item(item)))
+            if recuperacao.chave is not None:
+                arquivo.write(_linha({"e": FINALIZAR, "chave": recuperacao.chave}))
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, self.caminho)
+        self._fd = os.open(self.caminho, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0))
+        self.chave = recuperacao.chave
+        return recuperacao
+
+    def _escrever(self, evento):
+        if self._fd is None:
+            # Recuperar aqui esconderia do caixa o carrinho que ficou no arquivo
+            raise RuntimeError(f"Diário {self.caminho} não aberto: chamar recuperar() antes")
+        # Uma chamada de write por evento: nada fica no buffer do Python
+        os.write(self._fd, _linha(evento))
+        if self.sincronizar:
+            os.fsync(self._fd)
+
+    def adicionou(self, item, quantidade):
+        self.chave = None
+        self._escrever({"e": ADICIONAR, "produto": item.produto_id, "nome": item.nome,
+                        "preco": item.preco_centavos, "qtd": quantidade})
+
+    def alterou(self, posicao, quantidade):
+        self.chave = None
+        self._escrever({"e": ALTERAR, "posicao": posicao, "qtd": quantidade})
+
+    def removeu(self, posicao):
+        self.chave = None
+        self._escrever({"e": REMOVER, "posicao": posicao})
+
+    def finalizando(self):
+        # Chave para registrar_venda
+        if self.chave is None:
+            self.chave = uuid.uuid4().hex
+        self._escrever({"e": FINALIZAR, "chave": self.chave})
+        return self.chave
+
+    def gravada(self, chave, venda_id):
+        self._escrever({"e": GRAVADA, "chave": chave, "venda": venda_id})
+        self._encerrar_carrinho()
+
+    def cancelou(self):
+        self._escrever({"e": CANCELAR})
+        self._encerrar_carrinho()
+
+    def _encerrar_carrinho(self):
+        self.chave = None
+        if os.fstat(self._fd).st_size > TAMANHO_MAXIMO:
+            # Carrinho vazio: nada no arquivo precisa ser guardado
+            os.ftruncate(self._fd, 0)
+
+    def fechar(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+if __name__ == "__main__":
+    caminho = sys.argv[1] if len(sys.argv) > 1 else caminho_diario(1)
+    recuperacao = ler(caminho)
+    print(f"{caminho}: {recuperacao.eventos} eventos")
+    for item in recuperacao.carrinho:
+        print(f"  {item.descricao()}")
+    print(f"Carrinho em aberto: {len(recuperacao.carrinho)} itens, R$ {formatar_reais(recuperacao.carrinho.total_centavos)}")
+    if recuperacao.chave is not None:
+        print(f"Finalização sem confirmação: chave {recuperacao.chave} (conferir em diario_vendas)")
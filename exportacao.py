@@ -0,0 +1,145 @@
+import csv
+import os
+import sys
+from datetime import date
+
+import banco
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# ---------------- Exportação de relatórios ----------------
+# Vendas do período, itens vendidos e retrato do estoque, gravados em CSV
+# ou em arquivos colunares (Parquet, Arrow). O banco é lido em blocos
+# (banco.em_blocos) e cada bloco é gravado antes de ler o próximo, então a
+# memória usada é a mesma para um dia ou para cinco anos de vendas.
+# Parquet e Arrow precisam do pacote opcional pyarrow.
+#
+#   python exportacao.py vendas|itens saida.csv inicio fim [pdv.db]
+#   python exportacao.py estoque saida.parquet [pdv.db]
+
+class ErroExportacao(Exception):
+    pass
+
+# (coluna, tipo): o tipo define a coluna nos formatos colunares
+COLUNAS_VENDAS = [("venda_id", "inteiro"), ("data", "texto"), ("caixa", "inteiro"), ("total", "decimal")]
+
+COLUNAS_ITENS = [
+    ("venda_id", "inteiro"), ("data", "texto"), ("caixa", "inteiro"), ("produto_id", "inteiro"),
+    ("codigo_barras", "texto"), ("produto", "texto"), ("quantidade", "inteiro"),
+    ("preco_unitario", "decimal"), ("total_item", "decimal"),
+]
+
+COLUNAS_ESTOQUE = [
+    ("produto_id", "inteiro"), ("codigo_barras", "texto"), ("nome", "texto"), ("preco", "decimal"),
+    ("estoque", "inteiro"), ("estoque_minimo", "inteiro"),
+]
+
+# nome: (título, colunas, consulta em blocos, usa período)
+RELATORIOS = {
+    "vendas": ("Vendas do período", COLUNAS_VENDAS, banco.blocos_vendas, True),
+    "itens": ("Itens vendidos no período", COLUNAS_ITENS, banco.blocos_itens_vendidos, True),
+    "estoque": ("Estoque atual", COLUNAS_ESTOQUE, banco.blocos_estoque, False),
+}
+
+# ---------------- Formatos ----------------
+def _gravar_csv(arquivo, colunas, blocos):
+    with open(arquivo, "w", newline="", encoding="utf-8") as saida:
+        escritor = csv.writer(saida, delimiter=";")
+        escritor.writerow([nome for nome, _ in colunas])
+        for bloco in blocos:
+            escritor.writerows(bloco)
+            yield len(bloco)
+
+def _esquema_arrow(colunas):
+    tipos = {"inteiro": pyarrow.int64(), "texto": pyarrow.string(), "decimal": pyarrow.float64()}
+    return pyarrow.schema([(nome, tipos[tipo]) for nome, tipo in colunas])
+
+def _lote_arrow(bloco, esquema):
+    # Linhas do cursor -> colunas
+    return pyarrow.RecordBatch.from_arrays(
+        [pyarrow.array(valores, type=campo.type) for valores, campo in zip(zip(*bloco), esquema)],
+        schema=esquema)
+
+def _gravar_parquet(arquivo, colunas, blocos):
+    # Cada bloco vira um row group
+    esquema = _esquema_arrow(colunas)
+    with pyarrow.parquet.ParquetWriter(arquivo, esquema, compression="zstd") as escritor:
+        for bloco in blocos:
+            escritor.write_batch(_lote_arrow(bloco, esquema))
+            yield len(bloco)
+
+def _gravar_arrow(arquivo, colunas, blocos):
+    esquema = _esquema_arrow(colunas)
+    with pyarrow.ipc.new_file(arquivo, esquema) as escritor:
+        for bloco in blocos:
+            escritor.write_batch(_lote_arrow(bloco, esquema))
+            yield len(bloco)
+
+# extensão: (descrição, gravador, precisa de pyarrow)
+FORMATOS = {
+    ".csv": ("Planilha CSV", _gravar_csv, False),
+    ".parquet": ("Parquet", _gravar_parquet, True),
+    ".arrow": ("Arrow", _gravar_arrow, True),
+}
+
+def formatos_disponiveis():
+    return {extensao: formato for extensao, formato in FORMATOS.items() if pyarrow is not None or not formato[2]}
+
+def _data(texto):
+    try:
+        return date.fromisoformat(texto).isoformat()
+    except (TypeError, ValueError):
+        raise ErroExportacao(f"Data inválida: {texto} (use AAAA-MM-DD)")
+
+def exportar(relatorio, caminho, inicio=None, fim=None, ao_progresso=None):
+    # Thread-safe. ao_progresso(linhas) é chamado a cada bloco gravado.
+    # Grava num .tmp e só troca pelo destino no fim. Retorna as linhas gravadas.
+    if relatorio not in RELATORIOS:
+        raise ErroExportacao(f"Relatório desconhecido: {relatorio} (use {', '.join(RELATORIOS)})")
+    _, colunas, consulta, usa_periodo = RELATORIOS[relatorio]
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao not in FORMATOS:
+        raise ErroExportacao(f"Formato desconhecido: {extensao or caminho} (use {', '.join(FORMATOS)})")
+    _, gravador, precisa_pyarrow = FORMATOS[extensao]
+    if precisa_pyarrow and pyarrow is None:
+        raise ErroExportacao(f"Exportar em {extensao} requer o pacote pyarrow (pip install pyarrow)")
+
+    blocos = consulta(_data(inicio), _data(fim)) if usa_periodo else consulta()
+    temporario = caminho + ".tmp"
+    linhas = 0
+    try:
+        for gravadas in gravador(temporario, colunas, blocos):
+            linhas += gravadas
+            if ao_progresso is not None:
+                ao_progresso(linhas)
+        os.replace(temporario, caminho)
+    finally:
+        blocos.close()
+        if os.path.exists(temporario):
+            os.remove(temporario)
+    return linhas
+
+if __name__ == "__main__":
+    argumentos = sys.argv[1:]
+    if len(argumentos) < 2 or argumentos[0] not in RELATORIOS:
+        print(f"Uso: python exportacao.py {'|'.join(RELATORIOS)} arquivo{'|'.join(FORMATOS)} "
+              f"[inicio fim] [pdv.db]")
+        sys.exit(2)
+    relatorio, caminho = argumentos[:2]
+    periodo = argumentos[2:4] if RELATORIOS[relatorio][3] else [None, None]
+    resto = argumentos[4:] if RELATORIOS[relatorio][3] else argumentos[2:]
+    banco.iniciar(resto[0] if resto else banco.CAMINHO_BANCO)
+    try:
+        total = exportar(relatorio, caminho, *periodo,
+                         ao_progresso=lambda linhas: print(f"\r{linhas} linhas", end=""))
+        print(f"\r{total} linhas exportadas para {caminho}")
+    except ErroExportacao as e:
+        print(e)
+        sys.exit(1)
+    finally:
+        banco.fechar()
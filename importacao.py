@@ -0,0 +1,111 @@
+import csv
+import sys
+from itertools import islice
+
+import banco
+from catalogo import chave_busca, validar_produto
+
+# ---------------- Importação de produtos por CSV ----------------
+# O arquivo é lido em fluxo (gerador), validado com as mesmas regras do
+# formulário de cadastro e gravado em lotes com executemany, tudo numa
+# única transação. Produtos existentes (mesmo código de barras ou nome)
+# têm preço e estoque atualizados (e o estoque mínimo, se a coluna existir).
+
+TAMANHO_LOTE = 1000
+
+# Cabeçalhos aceitos, já sem acento e em minúsculas
+COLUNAS = {
+    "nome": "nome",
+    "produto": "nome",
+    "preco": "preco",
+    "estoque": "estoque",
+    "quantidade": "estoque",
+    "codigo_barras": "codigo_barras",
+    "codigo_de_barras": "codigo_barras",
+    "codigo": "codigo_barras",
+    "ean": "codigo_barras",
+    "estoque_minimo": "estoque_minimo",
+    "minimo": "estoque_minimo",
+    "ponto_de_reposicao": "estoque_minimo",
+}
+
+class ResultadoImportacao:
+    def __init__(self):
+        self.lidas = 0
+        self.gravadas = 0
+        self.rejeitadas = []
+
+def _coluna(cabecalho):
+    return COLUNAS.get(chave_busca(cabecalho or "").replace(" ", "_"))
+
+def ler_linhas(arquivo):
+    # Gera (número da linha, {coluna: valor}) sem carregar o arquivo todo
+    amostra = arquivo.read(4096)
+    arquivo.seek(0)
+    try:
+        dialeto = csv.Sniffer().sniff(amostra, delimiters=",;\t")
+    except csv.Error:
+        dialeto = csv.excel
+    leitor = csv.reader(arquivo, dialeto)
+    colunas = [_coluna(c) for c in next(leitor, [])]
+    if "nome" not in colunas:
+        raise ValueError("O arquivo precisa de uma coluna 'nome'")
+    for campos in leitor:
+        if not any(campo.strip() for campo in campos):
+            continue
+        yield leitor.line_num, {c: v for c, v in zip(colunas, campos) if c}
+
+def _numero(valor):
+    # Aceita vírgula decimal ("10,50"), comum em planilhas brasileiras
+    valor = (valor or "").strip()
+    if "," in valor and "." not in valor:
+        valor = valor.replace(",", ".")
+    return valor
+
+def validar_linhas(linhas, resultado):
+    for numero, campos in linhas:
+        resultado.lidas += 1
+        try:
+            produto = validar_produto(campos.get("nome"), _numero(campos.get("preco")),
+                                      _numero(campos.get("estoque")), campos.get("codigo_barras"),
+                                      campos.get("estoque_minimo"))
+        except ValueError as e:
+            resultado.rejeitadas.append((numero, str(e)))
+            continue
+        yield (numero,) + produto
+
+def em_lotes(registros, tamanho):
+    registros = iter(registros)
+    while True:
+        lote = list(islice(registros, tamanho))
+        if not lote:
+            return
+        yield lote
+
+def importar_csv(caminho, tamanho_lote=TAMANHO_LOTE):
+    resultado = ResultadoImportacao()
+    with open(caminho, newline="", encoding="utf-8-sig") as arquivo:
+        registros = validar_linhas(ler_linhas(arquivo), resultado)
+        gravadas, rejeitadas = banco.upsert_produtos(em_lotes(registros, tamanho_lote))
+    resultado.gravadas = gravadas
+    resultado.rejeitadas.extend(rejeitadas)
+    resultado.rejeitadas.sort()
+    return resultado
+
+def salvar_rejeitadas(resultado, destino):
+    with open(destino, "w", newline="", encoding="utf-8") as arquivo:
+        escritor = csv.writer(arquivo, delimiter=";")
+        escritor.writerow(["linha", "motivo"])
+        escritor.writerows(resultado.rejeitadas)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python importacao.py produtos.csv [pdv.db]")
+        sys.exit(2)
+    banco.iniciar(sys.argv[2] if len(sys.argv) > 2 else banco.CAMINHO_BANCO)
+    resultado = importar_csv(sys.argv[1])
+    print(f"{resultado.lidas} linhas lidas, {resultado.gravadas} gravadas, "
+          f"{len(resultado.rejeitadas)} rejeitadas")
+    for numero, motivo in resultado.rejeitadas[:20]:
+        print(f"  linha {numero}: {motivo}")
+    banco.fechar()
@@ -0,0 +1,151 @@
+import csv
+import sys
+import time
+
+import banco
+import leitor
+
+# ---------------- Contagem de estoque (inventário) ----------------
+# Uma sessão de contagem soma as leituras ("codigo" ou "qtd*codigo", como
+# no caixa) num dicionário em memória e grava em lote na tabela
+# contagem_itens, então a contagem sobrevive a um fechamento do programa e
+# é retomada (retomar). As diferenças contra o estoque saem de uma
+# consulta só, e aplicar() grava todos os ajustes numa transação, com cada
+# um registrado em movimentos_estoque. A diferença é medida contra o
+# estoque da hora em que o produto foi contado: vendas feitas durante a
+# contagem não são desfeitas pelo ajuste.
+#
+#   python inventario.py contagem.csv [--zerar] [--aplicar] [pdv.db]
+#
+# contagem.csv: colunas codigo e quantidade (o mesmo código pode repetir).
+
+LEITURAS_POR_GRAVACAO = 500
+
+class ErroInventario(Exception):
+    pass
+
+class SessaoContagem:
+    # Só uma thread por sessão. buscar_por_codigo(codigo) -> (id, nome,
+    # preco, estoque) ou None: o catálogo do caixa ou banco.produto_por_codigo.
+    def __init__(self, contagem_id, buscar_por_codigo=banco.produto_por_codigo):
+        self.id = contagem_id
+        self.buscar_por_codigo = buscar_por_codigo
+        self.pendentes = {}
+        self.leituras = 0
+
+    def registrar(self, texto):
+        # Retorna ((id, nome, preco, estoque), quantidade)
+        try:
+            quantidade, codigo = leitor.interpretar(texto)
+        except leitor.ErroLeitura as e:
+            raise ErroInventario(str(e))
+        produto = self.buscar_por_codigo(codigo)
+        if produto is None:
+            raise ErroInventario(f"Código {codigo} não cadastrado!")
+        self._somar(produto[0], quantidade)
+        return produto, quantidade
+
+    def desfazer(self, produto_id, quantidade):
+        # Tira uma leitura registrada por engano; não deixa a contagem negativa
+        contado = self.pendentes.get(produto_id, 0) + banco.quantidade_contada(self.id, produto_id)
+        if quantidade > contado:
+            raise ErroInventario(f"Só {contado} unidades contadas deste produto")
+        self._somar(produto_id, -quantidade)
+
+    def _somar(self, produto_id, quantidade):
+        self.pendentes[produto_id] = self.pendentes.get(produto_id, 0) + quantidade
+        self.leituras += 1
+        if len(self.pendentes) >= LEITURAS_POR_GRAVACAO:
+            self.gravar()
+
+    def gravar(self):
+        if self.pendentes:
+            banco.gravar_contagem(self.id, list(self.pendentes.items()))
+            self.pendentes.clear()
+
+    def resumo(self):
+        # (produtos contados, unidades contadas)
+        self.gravar()
+        return banco.resumo_contagem(self.id)
+
+    def diferencas(self, zerar_nao_contados=False):
+        self.gravar()
+        return banco.diferencas_contagem(self.id, zerar_nao_contados)
+
+    def aplicar(self, zerar_nao_contados=False):
+        # [(produto_id, estoque novo)] dos produtos ajustados
+        self.gravar()
+        try:
+            return banco.aplicar_contagem(self.id, zerar_nao_contados)
+        except banco.ContagemEncerrada:
+            raise ErroInventario(f"A contagem {self.id} já foi encerrada")
+
+    def cancelar(self):
+        self.pendentes.clear()
+        banco.cancelar_contagem(self.id)
+
+def abrir(descricao=None, caixa=1, buscar_por_codigo=banco.produto_por_codigo):
+    return SessaoContagem(banco.abrir_contagem(descricao, caixa), buscar_por_codigo)
+
+def retomar(buscar_por_codigo=banco.produto_por_codigo):
+    # A contagem que ficou aberta, ou None
+    aberta = banco.contagem_aberta()
+    return SessaoContagem(aberta[0], buscar_por_codigo) if aberta else None
+
+def importar_csv(sessao, caminho):
+    # Contagem feita num coletor: (linhas lidas, [(linha, motivo)] rejeitadas)
+    lidas = 0
+    rejeitadas = []
+    with open(caminho, newline="", encoding="utf-8-sig") as arquivo:
+        amostra = arquivo.read(4096)
+        arquivo.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=",;\t")
+        except csv.Error:
+            dialeto = csv.excel
+        linhas = csv.reader(arquivo, dialeto)
+        cabecalho = [coluna.strip().lower() for coluna in next(linhas, [])]
+        if "codigo" not in cabecalho or "quantidade" not in cabecalho:
+            raise ErroInventario("O arquivo precisa das colunas 'codigo' e 'quantidade'")
+        posicao_codigo = cabecalho.index("codigo")
+        posicao_quantidade = cabecalho.index("quantidade")
+        for campos in linhas:
+            if not any(campo.strip() for campo in campos):
+                continue
+            lidas += 1
+            try:
+                sessao.registrar(f"{campos[posicao_quantidade]}{leitor.SEPARADOR_QUANTIDADE}{campos[posicao_codigo]}")
+            except (ErroInventario, IndexError) as e:
+                rejeitadas.append((linhas.line_num, str(e) or "Colunas faltando"))
+    sessao.gravar()
+    return lidas, rejeitadas
+
+if __name__ == "__main__":
+    argumentos = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if not argumentos:
+        print("Uso: python inventario.py contagem.csv [--zerar] [--aplicar] [pdv.db]")
+        sys.exit(2)
+    banco.iniciar(argumentos[1] if len(argumentos) > 1 else banco.CAMINHO_BANCO)
+    zerar = "--zerar" in sys.argv
+    try:
+        inicio = time.perf_counter()
+        sessao = abrir(f"Importada de {argumentos[0]}")
+        lidas, rejeitadas = importar_csv(sessao, argumentos[0])
+        for linha, motivo in rejeitadas[:10]:
+            print(f"  linha {linha}: {motivo}")
+        diferencas = sessao.diferencas(zerar)
+        print(f"{lidas} linhas lidas, {len(rejeitadas)} rejeitadas, {len(diferencas)} produtos com diferença")
+        for _, nome, codigo_barras, sistema, contado, diferenca in diferencas[:20]:
+            print(f"  {nome[:40]:<40} {codigo_barras or '':>14} sistema {sistema:>6} contado {contado:>6} ({diferenca:+d})")
+        if "--aplicar" in sys.argv:
+            ajustes = sessao.aplicar(zerar)
+            print(f"{len(ajustes)} estoques ajustados (contagem {sessao.id})")
+        else:
+            sessao.cancelar()
+            print("Nada aplicado (use --aplicar)")
+        print(f"{time.perf_counter() - inicio:.2f} s")
+    except ErroInventario as e:
+        print(e)
+        sys.exit(1)
+    finally:
+        banco.fechar()
@@ -0,0 +1,99 @@
+# ---------------- Leitor de código de barras ----------------
+# O leitor USB funciona como um teclado: digita o código muito rápido e
+# termina com Enter. A rajada é reconhecida pelo tempo entre as teclas
+# (leitores mandam uma tecla a cada poucos milissegundos, pessoas levam
+# bem mais de 50 ms), então uma leitura que cai no campo errado ainda é
+# separada do que foi digitado à mão. A tela e o reprodutor de leituras
+# (benchmarks/reproduzir_leituras.py) usam o mesmo detector.
+#
+# "3*7891234567890" lança 3 unidades; o "3*" pode ser digitado à mão
+# antes de passar o produto no leitor.
+
+INTERVALO_RAJADA_MS = 35
+TAMANHO_MINIMO_RAJADA = 6
+SEPARADOR_QUANTIDADE = "*"
+QUANTIDADE_MAXIMA = 9999
+
+class ErroLeitura(Exception):
+    pass
+
+def interpretar(texto):
+    # "codigo" ou "qtd*codigo" -> (quantidade, codigo)
+    texto = texto.strip()
+    quantidade, separador, codigo = texto.rpartition(SEPARADOR_QUANTIDADE)
+    if not separador:
+        quantidade, codigo = "1", texto
+    codigo = codigo.strip()
+    if not codigo:
+        raise ErroLeitura("Leitura sem código de barras")
+    try:
+        quantidade = int(quantidade)
+    except ValueError:
+        raise ErroLeitura(f"Quantidade inválida: {quantidade.strip()}{SEPARADOR_QUANTIDADE}")
+    if not 0 < quantidade <= QUANTIDADE_MAXIMA:
+        raise ErroLeitura(f"Quantidade deve ficar entre 1 e {QUANTIDADE_MAXIMA}")
+    return quantidade, codigo
+
+class DetectorRajada:
+    # Recebe as teclas de um campo (tecla, apagar, enter) com o instante em
+    # ms (event.time do Tk ou o instante gravado). Trocar de campo recomeça.
+    def __init__(self, intervalo_ms=INTERVALO_RAJADA_MS, tamanho_minimo=TAMANHO_MINIMO_RAJADA):
+        self.intervalo_ms = intervalo_ms
+        self.tamanho_minimo = tamanho_minimo
+        self.leituras = 0
+        self.limpar()
+
+    def limpar(self):
+        self.campo = None
+        self.caracteres = []
+        self.inicio_rajada = 0
+        self.ultima_tecla = None
+
+    def _no_campo(self, campo):
+        if campo != self.campo:
+            self.limpar()
+            self.campo = campo
+
+    def tecla(self, caractere, instante_ms, campo=None):
+        self._no_campo(campo)
+        if self.ultima_tecla is None or instante_ms - self.ultima_tecla > self.intervalo_ms:
+            self.inicio_rajada = len(self.caracteres)
+        self.caracteres.append(caractere)
+        self.ultima_tecla = instante_ms
+
+    def apagar(self, campo=None):
+        # Backspace: ninguém apaga no meio de uma rajada
+        self._no_campo(campo)
+        if self.caracteres:
+            self.caracteres.pop()
+        self.inicio_rajada = len(self.caracteres)
+        self.ultima_tecla = None
+
+    def enter(self, instante_ms, campo=None):
+        # Código lido pelo leitor, ou None se o Enter encerrou texto digitado à mão
+        self._no_campo(campo)
+        rajada = "".join(self.caracteres[self.inicio_rajada:])
+        lida = (self.ultima_tecla is not None and instante_ms - self.ultima_tecla <= self.intervalo_ms
+                and len(rajada) >= self.tamanho_minimo)
+        self.limpar()
+        if lida:
+            self.leituras += 1
+            return rajada
+        return None
+
+# ---------------- Gravação das teclas ----------------
+# Uma linha por evento: "instante_ms<TAB>campo<TAB>tecla". A tecla é o
+# caractere digitado, ENTER, APAGAR ou FINALIZAR (venda concluída).
+ENTER = "Return"
+APAGAR = "BackSpace"
+FINALIZAR = "Finalizar"
+
+def linha_gravacao(instante_ms, campo, tecla):
+    return f"{instante_ms}\t{campo}\t{tecla}\n"
+
+def ler_gravacao(caminho):
+    # Gerador de (instante_ms, campo, tecla)
+    with open(caminho, encoding="utf-8") as arquivo:
+        for linha in arquivo:
+            instante, campo, tecla = linha.rstrip("\n").split("\t", 2)
+            yield int(instante), campo, tecla
@@ -1,126 +1,181 @@
-import sqlite3
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog, simpledialog
 from datetime import datetime, date
-from shutil import copy2
-import subprocess
-import tempfile
 import os
+import sys
+import time
+from bisect import bisect_left
+from collections import deque
+
+import analise
+import backup
+import banco
+import cupom
+import desempenho
+import diario
+import exportacao
+import importacao
+import leitor
+import nucleo
+from carrinho import formatar_reais
+from nucleo import Caixa, ErroCaixa, SemEstoque
+from servidor_vendas import ClienteVendas, ler_endereco
+from tarefas import FilaTarefas
+
+# Tela Tk do PDV: só lê os campos, chama o núcleo (nucleo.py) e mostra o
+# resultado. As regras de negócio ficam no núcleo.
+
+# ---------------- Rastreio da inicialização ----------------
+# A aba Vendas fica utilizável primeiro; o catálogo carrega no pool e as
+# outras abas só consultam o banco quando abertas. Com --medir-inicio o
+# programa imprime o tempo de cada etapa e o tempo até a primeira leitura
+# de código de barras, e fecha.
+inicio_processo = time.perf_counter()
+etapas_inicio = []
+MEDIR_INICIO = "--medir-inicio" in sys.argv
+# Código inexistente: a medição cobre só o caminho da busca
+CODIGO_TESTE_INICIO = "0000000000000"
+
+def marcar_inicio(etapa):
+    etapas_inicio.append((etapa, (time.perf_counter() - inicio_processo) * 1000))
 
 # ---------------- Conexão com banco ----------------
-conn = sqlite3.connect("pdv.db", check_same_thread=False)
-cursor = conn.cursor()
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS produtos (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    nome TEXT NOT NULL UNIQUE,
-    preco REAL NOT NULL,
-    estoque INTEGER NOT NULL,
-    codigo_barras TEXT UNIQUE
-)
-""")
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS vendas (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    data TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    total_geral REAL
-)
-""")
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS itens_venda (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    venda_id INTEGER,
-    produto_id INTEGER,
-    quantidade INTEGER,
-    preco_unitario REAL,
-    total_item REAL,
-    FOREIGN KEY (venda_id) REFERENCES vendas (id),
-    FOREIGN KEY (produto_id) REFERENCES produtos (id)
-)
-""")
-conn.commit()
+# Vários caixas podem abrir o mesmo banco: cada um com --caixa N (ou
+# PDV_CAIXA). Com --servidor endereco:porta as vendas são gravadas pelo
+# servidor_vendas.py em vez de cada caixa escrever no banco.
+# --durabilidade normal|total|grupo (ou PDV_DURABILIDADE): ver
+# banco.definir_durabilidade; com total ou grupo o diário do caixa também
+# espera o disco a cada evento.
+def argumento(nome, padrao=None):
+    if nome in sys.argv[:-1]:
+        return sys.argv[sys.argv.index(nome) + 1]
+    return padrao
+
+NUMERO_CAIXA = int(argumento("--caixa", os.environ.get("PDV_CAIXA", "1")))
+SERVIDOR_VENDAS = argumento("--servidor", os.environ.get("PDV_SERVIDOR"))
+DURABILIDADE = argumento("--durabilidade", os.environ.get("PDV_DURABILIDADE", "normal"))
+
+banco.iniciar("pdv.db")
+desempenho.iniciar_log()
+marcar_inicio("banco aberto e migrado")
+
+if "--reconstruir-vendas-diarias" in sys.argv:
+    print(f"Resumo diário reconstruído: {banco.reconstruir_vendas_diarias()} dias")
+    sys.exit(0)
+
+# ---------------- Núcleo do caixa ----------------
+if SERVIDOR_VENDAS:
+    registrar_venda = ClienteVendas(*ler_endereco(SERVIDOR_VENDAS)).registrar_venda
+else:
+    registrar_venda = banco.definir_durabilidade(DURABILIDADE)
+# O carrinho é anotado no diário: uma queda do programa não perde a venda em andamento
+diario_caixa = diario.Diario(diario.caminho_diario(NUMERO_CAIXA), sincronizar=DURABILIDADE != "normal")
+caixa = Caixa(carregar_catalogo=False, numero=NUMERO_CAIXA, registrar_venda=registrar_venda, diario=diario_caixa)
+venda_recuperada = caixa.recuperar_diario()
+carrinho = caixa.carrinho
+
+def catalogo_carregado(catalogo_e_indice):
+    caixa.trocar_catalogo(*catalogo_e_indice)
+    marcar_inicio("catálogo em memória")
+    atualizar_label_cache()
+    recarregar_estoque_baixo()
+    verificar_fim_medicao()
+
+def atualizar_label_cache():
+    label_cache.config(text=f"Cache: {caixa.catalogo.acertos} acertos / {caixa.catalogo.falhas} falhas")
 
 # ---------------- Funções Produtos ----------------
+@desempenho.medido
 def cadastrar_produto():
-    nome = entry_nome.get().strip().title()
-    codigo_barras = entry_codigo_barras.get().strip()
-    
-    if not nome:
-        messagebox.showerror("Erro", "Nome do produto é obrigatório!")
-        return
-        
     try:
-        preco = float(entry_preco.get())
-        estoque = int(entry_estoque.get())
-        if preco <= 0 or estoque < 0:
-            messagebox.showerror("Erro", "Preço deve ser > 0 e Estoque >= 0!")
-            return
-    except ValueError:
-        messagebox.showerror("Erro", "Preço e estoque devem ser numéricos")
+        prod_id = caixa.cadastrar_produto(entry_nome.get(), entry_preco.get(), entry_estoque.get(),
+                                          entry_codigo_barras.get(), entry_estoque_minimo.get())
+    except ErroCaixa as e:
+        messagebox.showerror("Erro", str(e))
         return
 
-    try:
-        if codigo_barras:
-            cursor.execute("INSERT INTO produtos (nome, preco, estoque, codigo_barras) VALUES (?, ?, ?, ?)",
-                           (nome, preco, estoque, codigo_barras))
-        else:
-            cursor.execute("INSERT INTO produtos (nome, preco, estoque) VALUES (?, ?, ?)",
-                           (nome, preco, estoque))
-        
-        conn.commit()
-        messagebox.showinfo("Sucesso", "Produto cadastrado!")
-        limpar_campos_produto()
+    messagebox.showinfo("Sucesso", "Produto cadastrado!")
+    limpar_campos_produto()
+    estoque_paginado.atualizar_linhas([prod_id])
+    atualizar_estoque_baixo([prod_id])
+
+@desempenho.medido
+def importar_produtos():
+    caminho = filedialog.askopenfilename(title="Importar produtos",
+                                         filetypes=[("Planilha CSV", "*.csv"), ("Todos os arquivos", "*.*")])
+    if not caminho:
+        return
+    
+    btn_importar.config(state=tk.DISABLED)
+    
+    def concluido(resultado_importacao):
+        resultado, catalogo, indice_busca = resultado_importacao
+        caixa.trocar_catalogo(catalogo, indice_busca)
+        btn_importar.config(state=tk.NORMAL)
         carregar_estoque()
-        carregar_lista_produtos()
-        
-    except sqlite3.IntegrityError as e:
-        if "nome" in str(e):
-            messagebox.showerror("Erro", "Já existe um produto com este nome!")
-        else:
-            messagebox.showerror("Erro", "Já existe um produto com este código de barras!")
+        recarregar_estoque_baixo()
+        mensagem = (f"{resultado.lidas} linhas lidas\n{resultado.gravadas} produtos gravados\n"
+                    f"{len(resultado.rejeitadas)} linhas rejeitadas")
+        if resultado.rejeitadas:
+            arquivo_rejeitadas = os.path.splitext(caminho)[0] + "_rejeitadas.csv"
+            importacao.salvar_rejeitadas(resultado, arquivo_rejeitadas)
+            mensagem += f"\n\nDetalhes em: {arquivo_rejeitadas}"
+        messagebox.showinfo("Importação", mensagem)
+    
+    def falhou(erro):
+        btn_importar.config(state=tk.NORMAL)
+        messagebox.showerror("Erro", f"Erro na importação: {erro}")
+    
+    fila_tarefas.submeter(caixa.preparar_importacao, caminho, ao_concluir=concluido, ao_falhar=falhou)
 
 def limpar_campos_produto():
     entry_nome.delete(0, tk.END)
     entry_preco.delete(0, tk.END)
     entry_estoque.delete(0, tk.END)
     entry_codigo_barras.delete(0, tk.END)
+    entry_estoque_minimo.delete(0, tk.END)
 
+@desempenho.medido
 def carregar_estoque():
-    for row in tree_estoque.get_children():
-        tree_estoque.delete(row)
-    cursor.execute("SELECT id, nome, preco, estoque, codigo_barras FROM produtos ORDER BY nome")
-    for produto in cursor.fetchall():
-        tree_estoque.insert("", tk.END, values=produto)
+    estoque_paginado.recarregar()
 
 # ---------------- Funções Vendas ----------------
-carrinho = []
-total_venda = 0
-
-def carregar_lista_produtos():
-    cursor.execute("SELECT nome FROM produtos ORDER BY nome")
-    return [produto[0] for produto in cursor.fetchall()]
+ATRASO_SUGESTOES_MS = 120
+sugestoes_agendadas = None
 
+@desempenho.medido
 def update_sugestoes(event):
-    typed = entry_produto.get().lower()
-    if typed == '':
-        frame_sugestoes.grid_remove()
-    else:
-        suggestions = [p for p in lista_produtos if typed in p.lower()]
-        lista_sugestoes.delete(0, tk.END)
-        for product in suggestions[:5]:
+    # Agrupa rajadas de teclas: só consulta o índice quando a digitação pausa
+    global sugestoes_agendadas
+    if sugestoes_agendadas is not None:
+        root.after_cancel(sugestoes_agendadas)
+    sugestoes_agendadas = root.after(ATRASO_SUGESTOES_MS, aplicar_sugestoes)
+
+@desempenho.medido
+def aplicar_sugestoes():
+    global sugestoes_agendadas
+    sugestoes_agendadas = None
+    suggestions = caixa.sugestoes(entry_produto.get())
+    # Atualiza apenas as linhas que mudaram
+    atuais = lista_sugestoes.get(0, tk.END)
+    for i, product in enumerate(suggestions):
+        if i >= len(atuais):
             lista_sugestoes.insert(tk.END, product)
-        
-        if suggestions:
-            frame_sugestoes.grid()
-        else:
-            frame_sugestoes.grid_remove()
+        elif atuais[i] != product:
+            lista_sugestoes.delete(i)
+            lista_sugestoes.insert(i, product)
+    if len(atuais) > len(suggestions):
+        lista_sugestoes.delete(len(suggestions), tk.END)
+    
+    if suggestions:
+        frame_sugestoes.grid()
+    else:
+        frame_sugestoes.grid_remove()
 
 def hide_sugestoes(event):
     frame_sugestoes.grid_remove()
 
+@desempenho.medido
 def on_produto_selected(event):
     if lista_sugestoes.curselection():
         index = lista_sugestoes.curselection()[0]
@@ -129,163 +184,253 @@ def on_produto_selected(event):
         frame_sugestoes.grid_remove()
         entry_qtd.focus()
 
+@desempenho.medido
 def buscar_por_codigo():
     codigo = entry_codigo.get().strip()
     if codigo:
-        cursor.execute("SELECT nome FROM produtos WHERE codigo_barras = ?", (codigo,))
-        produto = cursor.fetchone()
+        produto = caixa.buscar_por_codigo(codigo)
+        atualizar_label_cache()
         if produto:
             entry_produto.delete(0, tk.END)
-            entry_produto.insert(0, produto[0])
+            entry_produto.insert(0, produto[1])
             entry_qtd.focus()
         else:
             messagebox.showwarning("Não encontrado", "Código de barras não cadastrado!")
 
-def adicionar_item():
-    global total_venda
-    produto_nome = entry_produto.get().strip()
-    
-    if not produto_nome:
-        messagebox.showerror("Erro", "Digite o nome do produto!")
+# ---------------- Leitor de código de barras ----------------
+# No modo leitor o Enter no campo do código lança o produto direto no
+# carrinho ("3*codigo" para 3 unidades; ler de novo soma na linha) e o foco
+# fica no código, pronto para a próxima leitura. Uma rajada do leitor que
+# cair no nome ou na quantidade é tirada do campo e lançada do mesmo jeito.
+# Erros aparecem em label_leitura, sem messagebox: uma janela modal
+# roubaria o foco e as teclas da leitura seguinte. Com --gravar-leituras
+# arquivo.tsv as teclas da aba Vendas são gravadas para
+# benchmarks/reproduzir_leituras.py.
+AVISO_LEITURA_MS = 4000
+detector_leitor = leitor.DetectorRajada()
+aviso_leitura_agendado = None
+ultimo_instante_tecla = 0
+CAMINHO_GRAVACAO_LEITURAS = argumento("--gravar-leituras")
+# Uma linha por evento, já no disco: a gravação sobrevive a um travamento
+gravacao_leituras = (open(CAMINHO_GRAVACAO_LEITURAS, "a", encoding="utf-8", buffering=1)
+                     if CAMINHO_GRAVACAO_LEITURAS else None)
+
+def gravar_tecla(instante, campo, tecla):
+    global ultimo_instante_tecla
+    ultimo_instante_tecla = instante
+    if gravacao_leituras is not None:
+        gravacao_leituras.write(leitor.linha_gravacao(instante, campo, tecla))
+
+def campo_do_leitor(widget):
+    if widget is entry_codigo:
+        return "codigo"
+    if widget is entry_produto:
+        return "produto"
+    if widget is entry_qtd:
+        return "qtd"
+    return None
+
+def ao_teclar(event):
+    # bind_all: roda depois do Entry já ter inserido o caractere
+    campo = campo_do_leitor(event.widget)
+    if campo is None or not var_modo_leitor.get():
         return
-        
+    if event.keysym in ("Return", "KP_Enter"):
+        gravar_tecla(event.time, campo, leitor.ENTER)
+        codigo = detector_leitor.enter(event.time, campo)
+        if campo == "codigo":
+            texto = entry_codigo.get()
+            entry_codigo.delete(0, tk.END)
+            if texto.strip():
+                lancar_leitura(texto)
+        elif codigo is not None:
+            fim = event.widget.index(tk.INSERT)
+            event.widget.delete(max(0, fim - len(codigo)), fim)
+            lancar_leitura(codigo)
+            entry_codigo.focus()
+    elif event.keysym == "BackSpace":
+        gravar_tecla(event.time, campo, leitor.APAGAR)
+        detector_leitor.apagar(campo)
+    elif len(event.char) == 1 and event.char.isprintable():
+        gravar_tecla(event.time, campo, event.char)
+        detector_leitor.tecla(event.char, event.time, campo)
+
+def ao_enter_codigo(event=None):
+    # No modo leitor quem trata o Enter é ao_teclar
+    if not var_modo_leitor.get():
+        buscar_por_codigo()
+
+@desempenho.medido
+def lancar_leitura(texto):
     try:
-        qtd = int(entry_qtd.get())
-        if qtd <= 0:
-            messagebox.showerror("Erro", "Quantidade deve ser maior que zero!")
-            return
-    except ValueError:
-        messagebox.showerror("Erro", "Quantidade inválida!")
+        item, nova_linha = caixa.ler_codigo(texto)
+    except ErroCaixa as e:
+        avisar_leitura(f"{texto.strip()}: {e}", erro=True)
         return
-
-    cursor.execute("SELECT id, nome, preco, estoque FROM produtos WHERE nome = ?", (produto_nome,))
-    resultado = cursor.fetchone()
-
-    if resultado:
-        prod_id, nome, preco, estoque = resultado
-        if estoque >= qtd:
-            subtotal = preco * qtd
-            total_venda += subtotal
-            
-            item = {
-                'id': prod_id,
-                'nome': nome,
-                'preco': preco,
-                'quantidade': qtd,
-                'subtotal': subtotal
-            }
-            carrinho.append(item)
-            
-            atualizar_lista_carrinho()
-            label_total.config(text=f"Total: R$ {total_venda:.2f}")
-            
-            entry_produto.delete(0, tk.END)
-            entry_qtd.delete(0, tk.END)
-            entry_produto.focus()
-            
-        else:
-            messagebox.showwarning("Estoque", f"Estoque insuficiente! Disponível: {estoque}")
+    finally:
+        atualizar_label_cache()
+    atualizar_linha_carrinho(item, nova_linha)
+    avisar_leitura(item.descricao())
+
+def avisar_leitura(texto, erro=False):
+    global aviso_leitura_agendado
+    label_leitura.config(text=texto, foreground="red" if erro else "")
+    if erro:
+        root.bell()
+    if aviso_leitura_agendado is not None:
+        root.after_cancel(aviso_leitura_agendado)
+    aviso_leitura_agendado = root.after(AVISO_LEITURA_MS, limpar_aviso_leitura)
+
+def limpar_aviso_leitura():
+    global aviso_leitura_agendado
+    aviso_leitura_agendado = None
+    label_leitura.config(text="")
+
+@desempenho.medido
+def adicionar_item():
+    try:
+        item, nova_linha = caixa.adicionar_por_nome(entry_produto.get(), nucleo.validar_quantidade(entry_qtd.get()))
+    except SemEstoque as e:
+        messagebox.showwarning("Estoque", str(e))
+        return
+    except ErroCaixa as e:
+        messagebox.showerror("Erro", str(e))
+        return
+    finally:
+        atualizar_label_cache()
+
+    atualizar_linha_carrinho(item, nova_linha)
+    entry_produto.delete(0, tk.END)
+    entry_qtd.delete(0, tk.END)
+    entry_produto.focus()
+
+def atualizar_linha_carrinho(item, nova_linha=False):
+    # Reescreve só a linha do item na Listbox
+    if nova_linha:
+        lista.insert(tk.END, item.descricao())
+        lista.see(tk.END)
     else:
-        messagebox.showerror("Erro", "Produto não encontrado!")
+        lista.delete(item.posicao)
+        lista.insert(item.posicao, item.descricao())
+    atualizar_total_carrinho()
 
-def atualizar_lista_carrinho():
-    lista.delete(0, tk.END)
-    for item in carrinho:
-        lista.insert(tk.END, f"{item['nome']} x{item['quantidade']} - R$ {item['subtotal']:.2f}")
+def atualizar_total_carrinho():
+    label_total.config(text=f"Total: R$ {formatar_reais(carrinho.total_centavos)}")
 
+@desempenho.medido
 def remover_item():
-    global total_venda
     if not lista.curselection():
         messagebox.showwarning("Atenção", "Selecione um item para remover!")
         return
         
     index = lista.curselection()[0]
-    item_removido = carrinho.pop(index)
-    total_venda -= item_removido['subtotal']
-    
-    atualizar_lista_carrinho()
-    label_total.config(text=f"Total: R$ {total_venda:.2f}")
+    caixa.remover_item(index)
+    lista.delete(index)
+    atualizar_total_carrinho()
 
-def finalizar_venda():
-    global total_venda, carrinho
+@desempenho.medido
+def alterar_quantidade(event=None):
+    if not lista.curselection():
+        return
     
-    if not carrinho:
-        messagebox.showwarning("Atenção", "Nenhum item no carrinho!")
+    index = lista.curselection()[0]
+    item = carrinho.ordem[index]
+    qtd = simpledialog.askinteger("Quantidade", f"Nova quantidade de {item.nome}:",
+                                  initialvalue=item.quantidade, minvalue=1, parent=root)
+    if qtd is None:
         return
+    
+    try:
+        caixa.alterar_quantidade(index, qtd)
+    except SemEstoque as e:
+        messagebox.showwarning("Estoque", str(e))
+        return
+    atualizar_linha_carrinho(item)
+    lista.selection_set(index)
 
+@desempenho.medido
+def finalizar_venda():
     try:
-        conn.execute("BEGIN TRANSACTION")
-        
-        cursor.execute("INSERT INTO vendas (total_geral) VALUES (?)", (total_venda,))
-        venda_id = cursor.lastrowid
-        
-        for item in carrinho:
-            cursor.execute("""INSERT INTO itens_venda 
-                           (venda_id, produto_id, quantidade, preco_unitario, total_item) 
-                           VALUES (?, ?, ?, ?, ?)""",
-                           (venda_id, item['id'], item['quantidade'], item['preco'], item['subtotal']))
-            
-            cursor.execute("UPDATE produtos SET estoque = estoque - ? WHERE id = ?",
-                           (item['quantidade'], item['id']))
-        
-        conn.commit()
-        
-        messagebox.showinfo("Sucesso", f"Venda finalizada! Total: R$ {total_venda:.2f}")
-        
-        # Oferece para imprimir cupom
-        if messagebox.askyesno("Imprimir", "Deseja imprimir o cupom fiscal?"):
-            imprimir_cupom(venda_id)
-        
-        carrinho = []
-        total_venda = 0
-        lista.delete(0, tk.END)
-        label_total.config(text="Total: R$ 0.00")
-        
-        carregar_estoque()
-        carregar_relatorios()
-        
+        venda = caixa.finalizar_venda()
+    except banco.EstoqueInsuficiente as e:
+        # Outro caixa vendeu antes: o núcleo já corrigiu o cache
+        mensagem = "Estoque insuficiente para:\n\n"
+        for prod_id, disponivel, pedido in e.faltas:
+            mensagem += f"• {caixa.nome_no_carrinho(prod_id)} - pedido {pedido}, disponível {disponivel}\n"
+        atualizar_estoque_baixo([prod_id for prod_id, _, _ in e.faltas])
+        messagebox.showwarning("Estoque", mensagem)
+        return
+    except ErroCaixa as e:
+        messagebox.showwarning("Atenção", str(e))
+        return
     except Exception as e:
-        conn.rollback()
         messagebox.showerror("Erro", f"Erro ao finalizar venda: {str(e)}")
+        return
+    
+    desempenho.captura.venda_concluida()
+    gravar_tecla(ultimo_instante_tecla, "-", leitor.FINALIZAR)
+    venda_id = venda.venda_id
+    ids_vendidos = venda.ids_produtos
+    lista.delete(0, tk.END)
+    atualizar_total_carrinho()
+    entry_codigo.focus()
+    atualizar_estoque_baixo(ids_vendidos)
+    
+    # Caixa liberado: impressão e atualização das tabelas seguem no pool
+    latencias_pronto.append((time.perf_counter() - venda.inicio_pronto) * 1000)
+    label_status.config(text=f"Venda #{venda_id} finalizada! Total: R$ {formatar_reais(venda.total_centavos)}  |  "
+                             f"pronto em {latencias_pronto[-1]:.1f} ms "
+                             f"(média {sum(latencias_pronto) / len(latencias_pronto):.1f} ms)")
+    
+    if var_imprimir.get():
+        imprimir_cupom(venda_id, avisar=False)
+    em_segundo_plano(banco.linhas_estoque, (ids_vendidos,),
+                     lambda linhas: estoque_paginado.aplicar_linhas(ids_vendidos, linhas))
+    em_segundo_plano(banco.linhas_vendas, ([venda_id],),
+                     lambda linhas: vendas_paginadas.aplicar_linhas([venda_id], linhas))
+    em_segundo_plano(banco.total_ultimo_dia, (), mostrar_total_dia)
 
 # ---------------- Funções Relatórios ----------------
+@desempenho.medido
 def carregar_relatorios():
     try:
-        for row in tree_vendas.get_children():
-            tree_vendas.delete(row)
-
-        cursor.execute("""
-        SELECT id, DATE(data), total_geral
-        FROM vendas
-        ORDER BY data DESC
-        """)
-        vendas = cursor.fetchall()
-        
-        for venda in vendas:
-            tree_vendas.insert("", tk.END, values=venda)
-
-        if vendas:
-            data_mais_recente = vendas[0][1]
-            total_data_recente = 0
-            for venda in vendas:
-                if venda[1] == data_mais_recente:
-                    total_data_recente += venda[2]
-            
-            label_total_dia.config(text=f"Total de {data_mais_recente}: R$ {total_data_recente:.2f}")
-        else:
-            label_total_dia.config(text="Total: R$ 0.00")
-        
+        vendas_paginadas.recarregar()
+        atualizar_total_dia()
     except Exception as e:
         messagebox.showerror("Erro", f"Erro ao carregar relatórios: {str(e)}")
 
+def atualizar_total_dia():
+    mostrar_total_dia(banco.total_ultimo_dia())
+
+def mostrar_total_dia(resumo):
+    if resumo:
+        data_mais_recente, total_data_recente = resumo
+        label_total_dia.config(text=f"Total de {data_mais_recente}: R$ {total_data_recente:.2f}")
+    else:
+        label_total_dia.config(text="Total: R$ 0.00")
+
+def pagina_vendas(apos_chave, limite):
+    # A chave das vendas é -id: a lista mostra as mais recentes primeiro
+    return banco.pagina_vendas(None if apos_chave is None else -apos_chave, limite)
+
+def pagina_vendas_anterior(antes_chave, limite):
+    return banco.pagina_vendas_anterior(-antes_chave, limite)
+
+def em_segundo_plano(funcao, args, ao_concluir):
+    # Roda no pool de tarefas e entrega o resultado na thread do Tk
+    fila_tarefas.submeter(funcao, *args, ao_concluir=ao_concluir,
+                          ao_falhar=lambda e: messagebox.showerror("Erro", f"Erro ao consultar o banco: {e}"))
+
+@desempenho.medido
 def ver_detalhes_venda():
     selection = tree_vendas.selection()
     if not selection:
         messagebox.showwarning("Atenção", "Selecione uma venda para ver detalhes!")
         return
         
-    venda_id = tree_vendas.item(selection[0])['values'][0]
-    
+    mostrar_detalhes_venda(tree_vendas.item(selection[0])['values'][0])
+
+def mostrar_detalhes_venda(venda_id):
     detalhes_window = tk.Toplevel(root)
     detalhes_window.title(f"Detalhes da Venda #{venda_id}")
     detalhes_window.geometry("600x400")
@@ -299,61 +444,70 @@ def ver_detalhes_venda():
     
     tree_detalhes.pack(expand=True, fill=tk.BOTH, padx=10, pady=10)
     
-    cursor.execute("""
-    SELECT p.nome, i.quantidade, i.preco_unitario, i.total_item
-    FROM itens_venda i
-    JOIN produtos p ON i.produto_id = p.id
-    WHERE i.venda_id = ?
-    """, (venda_id,))
+    def preencher(itens):
+        if tree_detalhes.winfo_exists():
+            for item in itens:
+                tree_detalhes.insert("", tk.END, values=item)
     
-    for item in cursor.fetchall():
-        tree_detalhes.insert("", tk.END, values=item)
+    em_segundo_plano(banco.itens_venda, (venda_id,), preencher)
     
     btn_imprimir = ttk.Button(detalhes_window, text="Imprimir Cupom", 
                              command=lambda: imprimir_cupom(venda_id))
     btn_imprimir.pack(pady=5)
 
-def imprimir_cupom(venda_id):
-    cursor.execute("""
-    SELECT v.id, v.data, v.total_geral, p.nome, i.quantidade, i.preco_unitario, i.total_item
-    FROM vendas v
-    JOIN itens_venda i ON v.id = i.venda_id
-    JOIN produtos p ON i.produto_id = p.id
-    WHERE v.id = ?
-    """, (venda_id,))
-    
-    itens = cursor.fetchall()
-    
-    if not itens:
-        messagebox.showerror("Erro", "Venda não encontrada!")
+def imprimir_cupom(venda_id, avisar=True):
+    # Só coloca na fila: a thread do spooler renderiza e imprime
+    spooler.enfileirar(venda_id)
+    if avisar:
+        messagebox.showinfo("Cupom", f"Cupom #{venda_id} enviado para a fila de impressão.")
+    else:
+        label_status.config(text=label_status.cget("text") + "  |  cupom na fila")
+
+@desempenho.medido
+def reimprimir_intervalo():
+    primeiro = simpledialog.askinteger("Reimprimir Cupons", "Da venda nº:", minvalue=1, parent=root)
+    if primeiro is None:
+        return
+    ultimo = simpledialog.askinteger("Reimprimir Cupons", "Até a venda nº:", minvalue=primeiro,
+                                     initialvalue=primeiro, parent=root)
+    if ultimo is None:
+        return
+    spooler.reimprimir(primeiro, ultimo)
+    messagebox.showinfo("Cupom", f"Cupons #{primeiro} a #{ultimo} enviados para a fila de impressão.")
+
+def acompanhar_impressao():
+    aguardando = spooler.aguardando()
+    if spooler.ultimo_erro:
+        descartar = " (clique para descartar o primeiro)" if aguardando else ""
+        label_impressora.config(text=f"Impressora: {aguardando} na fila - {spooler.ultimo_erro}{descartar}",
+                                foreground="#c62828")
+    elif aguardando:
+        label_impressora.config(text=f"Impressora: imprimindo ({aguardando} na fila)", foreground="black")
+    elif spooler.aviso:
+        label_impressora.config(text=f"Impressora: {spooler.aviso}", foreground="#c62828")
+    elif isinstance(spooler.impressora, cupom.ImpressoraArquivo):
+        label_impressora.config(text=f"Impressora não configurada: cupons em {spooler.impressora.diretorio}/",
+                                foreground="#c62828")
+    else:
+        label_impressora.config(text="", foreground="black")
+    root.after(1000, acompanhar_impressao)
+
+def descartar_impressao(event=None):
+    # O trabalho que não sai da impressora trava os seguintes
+    if not spooler.ultimo_erro or not spooler.aguardando():
+        return
+    if not messagebox.askyesno("Impressora", "Descartar o primeiro trabalho da fila de impressão?\n"
+                               f"Ele fica guardado em {spooler.falhas}/."):
         return
-    
-    conteudo = "SUPERMERCADO PYTHON\n"
-    conteudo += "CUPOM FISCAL\n"
-    conteudo += f"Venda: #{venda_id} - {itens[0][1]}\n"
-    conteudo += "-" * 40 + "\n"
-    
-    for item in itens:
-        conteudo += f"{item[3][:20]:<20} {item[4]}x R${item[5]:.2f}\n"
-        conteudo += f"{'':<20} R${item[6]:.2f}\n"
-    
-    conteudo += "-" * 40 + "\n"
-    conteudo += f"TOTAL: R${itens[0][2]:.2f}\n"
-    conteudo += "Obrigado pela preferência!\n"
-    
-    with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.txt', encoding='utf-8') as f:
-        f.write(conteudo)
-        temp_file = f.name
-    
     try:
-        if os.name == 'nt':  # Windows
-            subprocess.run(['notepad', '/p', temp_file], check=False)
-        else:  # Linux/Mac
-            subprocess.run(['lp', temp_file], check=False)
-        messagebox.showinfo("Sucesso", "Cupom enviado para impressão!")
-    except:
-        messagebox.showinfo("Cupom Gerado", f"Cupom salvo em: {temp_file}")
+        nome = spooler.descartar_primeiro()
+    except OSError as e:
+        messagebox.showerror("Impressora", f"Não foi possível descartar: {e}")
+        return
+    if nome:
+        label_status.config(text=f"Trabalho {nome} descartado da fila de impressão")
 
+@desempenho.medido
 def relatorio_vendas_periodo():
     periodo_window = tk.Toplevel(root)
     periodo_window.title("Relatório por Período")
@@ -373,17 +527,11 @@ def relatorio_vendas_periodo():
         inicio = entry_inicio.get()
         fim = entry_fim.get()
         
+        em_segundo_plano(nucleo.relatorio_periodo, (inicio, fim), mostrar_resultado)
+    
+    def mostrar_resultado(relatorio):
+        resultado, total_periodo = relatorio
         try:
-            cursor.execute("""
-            SELECT DATE(data), SUM(total_geral), COUNT(*)
-            FROM vendas 
-            WHERE DATE(data) BETWEEN ? AND ?
-            GROUP BY DATE(data)
-            ORDER BY DATE(data)
-            """, (inicio, fim))
-            
-            resultado = cursor.fetchall()
-            
             result_window = tk.Toplevel(periodo_window)
             result_window.title("Resultado do Relatório")
             result_window.geometry("500x300")
@@ -401,8 +549,6 @@ def relatorio_vendas_periodo():
             
             tree.pack(expand=True, fill=tk.BOTH, padx=10, pady=10)
             
-            # Calcula o total do período
-            total_periodo = sum(row[1] for row in resultado)
             label_total_periodo = ttk.Label(result_window, text=f"Total do Período: R$ {total_periodo:.2f}", 
                                            font=("Arial", 12, "bold"))
             label_total_periodo.pack(pady=5)
@@ -412,28 +558,607 @@ def relatorio_vendas_periodo():
     
     ttk.Button(periodo_window, text="Gerar Relatório", command=gerar_relatorio).pack(pady=10)
 
-def verificar_estoque_baixo():
-    cursor.execute("SELECT nome, estoque FROM produtos WHERE estoque <= 5 ORDER BY estoque ASC")
-    produtos_baixo = cursor.fetchall()
+@desempenho.medido
+def exportar_relatorio():
+    # A gravação roda no pool, em blocos; a janela só acompanha as linhas gravadas
+    exportar_window = tk.Toplevel(root)
+    exportar_window.title("Exportar Relatório")
+    exportar_window.geometry("320x260")
+
+    titulos = {titulo: nome for nome, (titulo, _, _, _) in exportacao.RELATORIOS.items()}
+    ttk.Label(exportar_window, text="Relatório:").pack(pady=5)
+    combo_relatorio = ttk.Combobox(exportar_window, values=list(titulos), state="readonly", width=30)
+    combo_relatorio.pack(pady=5)
+    combo_relatorio.current(0)
+
+    ttk.Label(exportar_window, text="Período (YYYY-MM-DD):").pack(pady=5)
+    periodo_frame = ttk.Frame(exportar_window)
+    periodo_frame.pack(pady=5)
+    entry_inicio = ttk.Entry(periodo_frame, width=12)
+    entry_inicio.pack(side=tk.LEFT, padx=5)
+    entry_inicio.insert(0, date.today().replace(day=1).strftime("%Y-%m-%d"))
+    entry_fim = ttk.Entry(periodo_frame, width=12)
+    entry_fim.pack(side=tk.LEFT, padx=5)
+    entry_fim.insert(0, date.today().strftime("%Y-%m-%d"))
+
+    label_progresso = ttk.Label(exportar_window, text="")
+    progresso = [0, False]   # linhas gravadas, em andamento
+
+    def ao_trocar_relatorio(event=None):
+        usa_periodo = exportacao.RELATORIOS[titulos[combo_relatorio.get()]][3]
+        for entry in (entry_inicio, entry_fim):
+            entry.config(state=tk.NORMAL if usa_periodo else tk.DISABLED)
+
+    def acompanhar():
+        if progresso[1] and exportar_window.winfo_exists():
+            label_progresso.config(text=f"Exportando: {progresso[0]} linhas...")
+            exportar_window.after(200, acompanhar)
+
+    def finalizar(mensagem, erro=False):
+        progresso[1] = False
+        if exportar_window.winfo_exists():
+            btn_exportar.config(state=tk.NORMAL)
+            label_progresso.config(text="")
+        if erro:
+            messagebox.showerror("Erro", mensagem, parent=exportar_window if exportar_window.winfo_exists() else root)
+        else:
+            messagebox.showinfo("Exportar Relatório", mensagem,
+                                parent=exportar_window if exportar_window.winfo_exists() else root)
+
+    def exportar():
+        relatorio = titulos[combo_relatorio.get()]
+        formatos = exportacao.formatos_disponiveis()
+        caminho = filedialog.asksaveasfilename(
+            title="Exportar relatório", defaultextension=".csv",
+            initialfile=f"{relatorio}_{date.today().strftime('%Y%m%d')}.csv",
+            filetypes=[(descricao, "*" + extensao) for extensao, (descricao, _, _) in formatos.items()],
+            parent=exportar_window)
+        if not caminho:
+            return
+        progresso[:] = [0, True]
+        btn_exportar.config(state=tk.DISABLED)
+
+        def ao_progresso(linhas):
+            # Chamado na thread do pool: só guarda o número
+            progresso[0] = linhas
+
+        fila_tarefas.submeter(nucleo.exportar_relatorio, relatorio, caminho, entry_inicio.get(), entry_fim.get(),
+                              ao_progresso,
+                              ao_concluir=lambda linhas: finalizar(f"{linhas} linhas exportadas para:\n{caminho}"),
+                              ao_falhar=lambda e: finalizar(f"Erro ao exportar: {e}", erro=True))
+        acompanhar()
+
+    combo_relatorio.bind("<<ComboboxSelected>>", ao_trocar_relatorio)
+    btn_exportar = ttk.Button(exportar_window, text="Exportar...", command=exportar)
+    btn_exportar.pack(pady=10)
+    label_progresso.pack(pady=5)
+
+def tabela_analise(pai, colunas, linhas):
+    tree = ttk.Treeview(pai, columns=colunas, show="headings", height=12)
+    for col in colunas:
+        tree.heading(col, text=col)
+        tree.column(col, width=260 if col == "Produto" else 100)
+    for linha in linhas:
+        tree.insert("", tk.END, values=linha)
+    tree.pack(expand=True, fill=tk.BOTH, padx=5, pady=5)
+    return tree
+
+def desenhar_mapa_horario(canvas, mapa):
+    # Uma célula por dia da semana x hora, mais escura quanto mais vendas
+    canvas.delete("all")
+    horas = [hora for hora in range(analise.HORAS) if mapa[:, hora].any()] or list(range(analise.HORAS))
+    maior = mapa.max() or 1
+    largura, altura, margem = 34, 26, 40
+    for coluna, hora in enumerate(horas):
+        canvas.create_text(margem + coluna * largura + largura / 2, 10, text=f"{hora:02d}h")
+    for dia, nome_dia in enumerate(analise.DIAS_SEMANA):
+        y = 20 + dia * altura
+        canvas.create_text(margem / 2, y + altura / 2, text=nome_dia)
+        for coluna, hora in enumerate(horas):
+            valor = mapa[dia, hora]
+            tom = 255 - int(200 * valor / maior)
+            x = margem + coluna * largura
+            canvas.create_rectangle(x, y, x + largura, y + altura, fill=f"#{tom:02x}{tom:02x}ff", outline="white")
+            canvas.create_text(x + largura / 2, y + altura / 2, text=int(valor), font=("Arial", 7))
+
+@desempenho.medido
+def analisar_vendas():
+    analise_window = tk.Toplevel(root)
+    analise_window.title("Análise de Vendas")
+    analise_window.geometry("900x560")
+
+    periodo_frame = ttk.Frame(analise_window, padding=5)
+    periodo_frame.pack(fill=tk.X)
+    ttk.Label(periodo_frame, text="De (YYYY-MM-DD):").pack(side=tk.LEFT, padx=5)
+    entry_inicio = ttk.Entry(periodo_frame, width=12)
+    entry_inicio.pack(side=tk.LEFT)
+    entry_inicio.insert(0, date.today().replace(day=1).strftime("%Y-%m-%d"))
+    ttk.Label(periodo_frame, text="Até:").pack(side=tk.LEFT, padx=5)
+    entry_fim = ttk.Entry(periodo_frame, width=12)
+    entry_fim.pack(side=tk.LEFT)
+    entry_fim.insert(0, date.today().strftime("%Y-%m-%d"))
+    label_resumo = ttk.Label(periodo_frame, text="")
+
+    abas = ttk.Notebook(analise_window)
+    abas.pack(expand=True, fill=tk.BOTH, padx=5, pady=5)
+    quadros = {nome: ttk.Frame(abas) for nome in ("Por receita", "Por quantidade", "Curva ABC",
+                                                  "Vendas por hora", "Acabam primeiro", "Parados")}
+    for nome, quadro in quadros.items():
+        abas.add(quadro, text=nome)
+    canvas_mapa = tk.Canvas(quadros["Vendas por hora"], background="white")
+    canvas_mapa.pack(expand=True, fill=tk.BOTH)
+
+    def mostrar(resultado):
+        if not analise_window.winfo_exists():
+            return
+        btn_analisar.config(state=tk.NORMAL)
+        resumo = resultado.resumo
+        label_resumo.config(text=f"{resumo.vendas} vendas, {resumo.linhas} itens, "
+                                 f"R$ {resumo.receita.sum():.2f}")
+        for nome in quadros:
+            if nome != "Vendas por hora":
+                for filho in quadros[nome].winfo_children():
+                    filho.destroy()
+        for nome, linhas in (("Por receita", resultado.por_receita), ("Por quantidade", resultado.por_quantidade)):
+            tabela_analise(quadros[nome], ("Produto", "Quantidade", "Receita R$"),
+                           [(produto, quantidade, f"{receita:.2f}") for _, produto, quantidade, receita in linhas])
+        tabela_analise(quadros["Curva ABC"], ("Classe", "Produtos", "Receita R$", "% da Receita"),
+                       [(classe, produtos, f"{receita:.2f}", f"{fatia:.1%}")
+                        for classe, produtos, receita, fatia in resultado.abc])
+        for nome, linhas in (("Acabam primeiro", resultado.acabando), ("Parados", resultado.parados)):
+            tabela_analise(quadros[nome], ("Produto", "Estoque", "Média/dia", "Dias de estoque"),
+                           [(produto, estoque, f"{media:.2f}", "sem venda" if dias == float("inf") else f"{dias:.1f}")
+                            for _, produto, estoque, media, dias in linhas])
+        desenhar_mapa_horario(canvas_mapa, resumo.mapa_vendas)
+
+    def falhou(erro):
+        if analise_window.winfo_exists():
+            btn_analisar.config(state=tk.NORMAL)
+            messagebox.showerror("Erro", f"Erro na análise: {erro}", parent=analise_window)
+
+    def analisar():
+        btn_analisar.config(state=tk.DISABLED)
+        label_resumo.config(text="Analisando...")
+        fila_tarefas.submeter(nucleo.analisar_vendas, entry_inicio.get(), entry_fim.get(),
+                              ao_concluir=mostrar, ao_falhar=falhou)
+
+    btn_analisar = ttk.Button(periodo_frame, text="Analisar", command=analisar)
+    btn_analisar.pack(side=tk.LEFT, padx=10)
+    label_resumo.pack(side=tk.LEFT, padx=5)
+
+# ---------------- Busca de vendas por produto ----------------
+# Produtos pelo índice de texto (palavras do nome, começo do código) e as
+# vendas que tiveram os produtos selecionados, das mais recentes para as
+# mais antigas, uma página por vez ("Carregar mais").
+@desempenho.medido
+def buscar_vendas_produto():
+    busca_window = tk.Toplevel(root)
+    busca_window.title("Buscar Vendas por Produto")
+    busca_window.geometry("760x560")
+
+    busca_frame = ttk.Frame(busca_window, padding=5)
+    busca_frame.pack(fill=tk.X)
+    ttk.Label(busca_frame, text="Produto (nome ou código):").pack(side=tk.LEFT, padx=5)
+    entry_busca = ttk.Entry(busca_frame, width=30)
+    entry_busca.pack(side=tk.LEFT)
+    entry_busca.focus()
+
+    produtos_frame = ttk.LabelFrame(busca_window, text="Produtos encontrados (selecione um ou mais)", padding=5)
+    produtos_frame.pack(fill=tk.BOTH, padx=5, pady=5)
+    tree_produtos = ttk.Treeview(produtos_frame, columns=("ID", "Nome", "Código", "Estoque"),
+                                 show="headings", height=6, selectmode="extended")
+    for coluna, largura in (("ID", 60), ("Nome", 360), ("Código", 140), ("Estoque", 80)):
+        tree_produtos.heading(coluna, text=coluna)
+        tree_produtos.column(coluna, width=largura)
+    tree_produtos.pack(fill=tk.BOTH)
+
+    vendas_frame = ttk.LabelFrame(busca_window, text="Vendas com os produtos", padding=5)
+    vendas_frame.pack(expand=True, fill=tk.BOTH, padx=5, pady=5)
+    tree_resultado = ttk.Treeview(vendas_frame, columns=columns_vendas, show="headings", height=10)
+    for coluna in columns_vendas:
+        tree_resultado.heading(coluna, text=coluna)
+        tree_resultado.column(coluna, width=140)
+    scrollbar_resultado = ttk.Scrollbar(vendas_frame, orient=tk.VERTICAL, command=tree_resultado.yview)
+    tree_resultado.configure(yscrollcommand=scrollbar_resultado.set)
+    tree_resultado.pack(side=tk.LEFT, expand=True, fill=tk.BOTH)
+    scrollbar_resultado.pack(side=tk.RIGHT, fill=tk.Y)
+
+    rodape = ttk.Frame(busca_window, padding=5)
+    rodape.pack(fill=tk.X)
+    label_busca = ttk.Label(rodape, text="")
+    label_busca.pack(side=tk.LEFT, padx=5)
+    # Cursor da próxima página e ids dos produtos da busca atual
+    estado = {"apos": None, "produtos": []}
+
+    def falhou(erro):
+        if busca_window.winfo_exists():
+            label_busca.config(text="")
+            messagebox.showerror("Erro", str(erro), parent=busca_window)
+
+    def mostrar_produtos(produtos):
+        if not busca_window.winfo_exists():
+            return
+        tree_produtos.delete(*tree_produtos.get_children())
+        for prod_id, nome, _, estoque, codigo_barras in produtos:
+            tree_produtos.insert("", tk.END, iid=str(prod_id), values=(prod_id, nome, codigo_barras or "", estoque))
+        if produtos:
+            # Sem escolha do operador, busca as vendas de todos os encontrados
+            tree_produtos.selection_set(tree_produtos.get_children())
+        else:
+            tree_resultado.delete(*tree_resultado.get_children())
+            btn_mais.config(state=tk.DISABLED)
+            label_busca.config(text="Nenhum produto encontrado")
+
+    def buscar(event=None):
+        label_busca.config(text="Buscando...")
+        fila_tarefas.submeter(nucleo.buscar_produtos, entry_busca.get(), ao_concluir=mostrar_produtos,
+                              ao_falhar=falhou)
+
+    def mostrar_vendas(resultado, produtos):
+        linhas, apos = resultado
+        if not busca_window.winfo_exists() or produtos != estado["produtos"]:
+            return
+        for linha in linhas:
+            tree_resultado.insert("", tk.END, values=linha)
+        estado["apos"] = apos
+        btn_mais.config(state=tk.NORMAL if apos is not None else tk.DISABLED)
+        label_busca.config(text=f"{len(tree_resultado.get_children())} vendas"
+                                + (" (há mais)" if apos is not None else ""))
+
+    def carregar_vendas(apos=None):
+        produtos = estado["produtos"]
+        btn_mais.config(state=tk.DISABLED)
+        fila_tarefas.submeter(nucleo.vendas_do_produto, produtos, apos,
+                              ao_concluir=lambda resultado: mostrar_vendas(resultado, produtos), ao_falhar=falhou)
+
+    def ao_selecionar_produtos(event=None):
+        estado["produtos"] = [int(iid) for iid in tree_produtos.selection()]
+        tree_resultado.delete(*tree_resultado.get_children())
+        if estado["produtos"]:
+            label_busca.config(text="Buscando vendas...")
+            carregar_vendas()
+
+    def ver_venda(event=None):
+        selecao = tree_resultado.selection()
+        if selecao:
+            mostrar_detalhes_venda(tree_resultado.item(selecao[0])["values"][0])
+
+    entry_busca.bind("<Return>", buscar)
+    tree_produtos.bind("<<TreeviewSelect>>", ao_selecionar_produtos)
+    tree_resultado.bind("<Double-Button-1>", ver_venda)
+    ttk.Button(busca_frame, text="Buscar", command=buscar).pack(side=tk.LEFT, padx=10)
+    btn_mais = ttk.Button(rodape, text="Carregar mais", state=tk.DISABLED,
+                          command=lambda: carregar_vendas(estado["apos"]))
+    btn_mais.pack(side=tk.RIGHT, padx=5)
+    ttk.Button(rodape, text="Ver Detalhes", command=ver_venda).pack(side=tk.RIGHT, padx=5)
+
+@desempenho.medido
+def reconstruir_resumo():
+    if not messagebox.askyesno("Resumo Diário", "Recalcular o resumo diário a partir de todas as vendas?"):
+        return
+    try:
+        dias = banco.reconstruir_vendas_diarias()
+        atualizar_total_dia()
+        messagebox.showinfo("Resumo Diário", f"Resumo reconstruído: {dias} dias.")
+    except Exception as e:
+        messagebox.showerror("Erro", f"Erro ao reconstruir resumo: {str(e)}")
+
+# ---------------- Estoque baixo ----------------
+# O catálogo mantém o conjunto de produtos abaixo do mínimo a cada baixa;
+# a tela só atualiza as linhas dos produtos alterados. A janela do painel
+# não é modal e continua sendo atualizada enquanto aberta.
+janela_estoque_baixo = None
+tree_estoque_baixo = None
+
+def sinalizar_estoque_baixo(quantidade):
+    if quantidade:
+        label_estoque_baixo.config(text=f"⚠ {quantidade} produto(s) com estoque baixo", foreground="#c62828")
+    else:
+        label_estoque_baixo.config(text="")
+
+@desempenho.medido
+def abrir_estoque_baixo():
+    global janela_estoque_baixo, tree_estoque_baixo
+    if janela_estoque_baixo is not None and janela_estoque_baixo.winfo_exists():
+        janela_estoque_baixo.lift()
+        return
     
-    if produtos_baixo:
-        mensagem = "Produtos com estoque baixo:\n\n"
-        for produto in produtos_baixo:
-            mensagem += f"• {produto[0]} - {produto[1]} unidades\n"
-        
-        messagebox.showwarning("Alerta de Estoque", mensagem)
+    janela_estoque_baixo = tk.Toplevel(root)
+    janela_estoque_baixo.title("Estoque Baixo")
+    janela_estoque_baixo.geometry("600x400")
+    
+    columns = ("Produto", "Estoque", "Mínimo", "Sugestão de Compra")
+    tree_estoque_baixo = ttk.Treeview(janela_estoque_baixo, columns=columns, show="headings", height=15)
+    for col in columns:
+        tree_estoque_baixo.heading(col, text=col)
+        tree_estoque_baixo.column(col, width=100)
+    tree_estoque_baixo.column("Produto", width=250)
+    tree_estoque_baixo.pack(expand=True, fill=tk.BOTH, padx=10, pady=10)
+    
+    ttk.Button(janela_estoque_baixo, text="Exportar Pedido de Compra...",
+               command=exportar_pedido_compra).pack(pady=5)
+    recarregar_estoque_baixo()
+
+def painel_aberto():
+    return janela_estoque_baixo is not None and janela_estoque_baixo.winfo_exists()
+
+def recarregar_estoque_baixo():
+    # Conjunto inteiro: abertura do painel, catálogo novo ou importação
+    if not caixa.catalogo_pronto:
+        em_segundo_plano(nucleo.estoque_baixo, (), preencher_estoque_baixo)
+        return
+    preencher_estoque_baixo([caixa.catalogo.situacao_estoque(prod_id) for prod_id in caixa.catalogo.estoque_baixo])
+
+def preencher_estoque_baixo(produtos_baixo):
+    sinalizar_estoque_baixo(len(produtos_baixo))
+    if not painel_aberto():
+        return
+    tree_estoque_baixo.delete(*tree_estoque_baixo.get_children())
+    for produto in sorted(produtos_baixo, key=lambda linha: linha[2]):
+        mostrar_linha_estoque_baixo(produto)
+
+def mostrar_linha_estoque_baixo(produto):
+    prod_id, nome, estoque, estoque_minimo, _ = produto
+    valores = (nome, estoque, estoque_minimo, nucleo.quantidade_sugerida(estoque, estoque_minimo))
+    if tree_estoque_baixo.exists(str(prod_id)):
+        tree_estoque_baixo.item(str(prod_id), values=valores)
     else:
-        messagebox.showinfo("Estoque", "Todos os produtos têm estoque suficiente!")
+        tree_estoque_baixo.insert("", tk.END, iid=str(prod_id), values=valores)
 
-def backup_dados():
-    data_atual = datetime.now().strftime("%Y%m%d_%H%M%S")
-    arquivo_backup = f"backup_pdv_{data_atual}.db"
+@desempenho.medido
+def atualizar_estoque_baixo(ids):
+    # Só os produtos alterados: custo proporcional a len(ids), não ao catálogo
+    if not caixa.catalogo_pronto:
+        return
+    sinalizar_estoque_baixo(len(caixa.catalogo.estoque_baixo))
+    if not painel_aberto():
+        return
+    for prod_id in ids:
+        if prod_id in caixa.catalogo.estoque_baixo:
+            mostrar_linha_estoque_baixo(caixa.catalogo.situacao_estoque(prod_id))
+        elif tree_estoque_baixo.exists(str(prod_id)):
+            tree_estoque_baixo.delete(str(prod_id))
+
+@desempenho.medido
+def exportar_pedido_compra():
+    caminho = filedialog.asksaveasfilename(title="Exportar pedido de compra", defaultextension=".csv",
+                                           initialfile=f"pedido_compra_{date.today().strftime('%Y%m%d')}.csv",
+                                           filetypes=[("Planilha CSV", "*.csv")], parent=janela_estoque_baixo)
+    if not caminho:
+        return
+    em_segundo_plano(nucleo.exportar_pedido_compra, (caminho,),
+                     lambda quantidade: messagebox.showinfo("Pedido de Compra",
+                                                            f"{quantidade} produtos exportados para:\n{caminho}",
+                                                            parent=janela_estoque_baixo))
+
+# ---------------- Contagem de estoque (inventário) ----------------
+# Cada leitura ("codigo" ou "qtd*codigo", do leitor ou digitada) soma na
+# sessão de contagem, que grava em lote no banco: fechar a janela ou o
+# programa não perde a contagem, retomada na próxima abertura. Erros de
+# leitura aparecem na própria janela, sem messagebox, como no modo leitor.
+# Diferenças, importação e aplicação rodam no pool; enquanto isso a
+# leitura fica bloqueada, porque a sessão não é thread-safe.
+janela_inventario = None
+ULTIMAS_LEITURAS = 8
+
+@desempenho.medido
+def abrir_inventario():
+    global janela_inventario
+    if janela_inventario is not None and janela_inventario.winfo_exists():
+        janela_inventario.lift()
+        return
+    sessao = caixa.sessao_contagem(f"Contagem de {datetime.now().strftime('%d/%m/%Y %H:%M')}")
+    janela_inventario = janela = tk.Toplevel(root)
+    janela.title(f"Contagem de Estoque #{sessao.id}")
+    janela.geometry("760x600")
+    # Leituras desta janela, para desfazer: (produto_id, quantidade, nome)
+    leituras = []
+
+    leitura_frame = ttk.LabelFrame(janela, text="Leitura (código ou qtd*código)", padding=5)
+    leitura_frame.pack(fill=tk.X, padx=5, pady=5)
+    entry_contagem = ttk.Entry(leitura_frame, width=30)
+    entry_contagem.grid(row=0, column=0, padx=5, pady=2, sticky=tk.W)
+    entry_contagem.focus()
+    label_aviso = ttk.Label(leitura_frame, text="")
+    label_aviso.grid(row=0, column=1, padx=5, sticky=tk.W)
+    lista_leituras = tk.Listbox(leitura_frame, height=4)
+    lista_leituras.grid(row=1, column=0, columnspan=2, sticky="ew", padx=5, pady=2)
+    leitura_frame.columnconfigure(1, weight=1)
+
+    diferencas_frame = ttk.LabelFrame(janela, text="Diferenças (contado - sistema)", padding=5)
+    diferencas_frame.pack(expand=True, fill=tk.BOTH, padx=5, pady=5)
+    colunas = ("Produto", "Código", "Sistema", "Contado", "Diferença")
+    tree_diferencas = ttk.Treeview(diferencas_frame, columns=colunas, show="headings", height=12)
+    for coluna, largura in zip(colunas, (300, 130, 80, 80, 80)):
+        tree_diferencas.heading(coluna, text=coluna)
+        tree_diferencas.column(coluna, width=largura)
+    scrollbar_diferencas = ttk.Scrollbar(diferencas_frame, orient=tk.VERTICAL, command=tree_diferencas.yview)
+    tree_diferencas.configure(yscrollcommand=scrollbar_diferencas.set)
+    tree_diferencas.pack(side=tk.LEFT, expand=True, fill=tk.BOTH)
+    scrollbar_diferencas.pack(side=tk.RIGHT, fill=tk.Y)
+
+    rodape = ttk.Frame(janela, padding=5)
+    rodape.pack(fill=tk.X)
+    var_zerar = tk.BooleanVar(value=False)
+    ttk.Checkbutton(rodape, text="Zerar produtos não contados", variable=var_zerar).pack(side=tk.LEFT, padx=5)
+    label_situacao = ttk.Label(rodape, text="")
+    label_situacao.pack(side=tk.LEFT, padx=5)
+
+    def avisar(texto, erro=False):
+        label_aviso.config(text=texto, foreground="#c62828" if erro else "#2e7d32")
+
+    def ocupar(ocupada, texto=""):
+        estado = tk.DISABLED if ocupada else tk.NORMAL
+        entry_contagem.config(state=estado)
+        for botao in botoes:
+            botao.config(state=estado)
+        label_situacao.config(text=texto)
+        if not ocupada:
+            entry_contagem.focus()
+
+    def mostrar_leitura(prod_id, quantidade, nome):
+        lista_leituras.insert(0, f"{quantidade:+d}  {nome}")
+        if lista_leituras.size() > ULTIMAS_LEITURAS:
+            lista_leituras.delete(ULTIMAS_LEITURAS, tk.END)
+
+    @desempenho.medido
+    def ler(event=None):
+        texto = entry_contagem.get()
+        entry_contagem.delete(0, tk.END)
+        if not texto.strip():
+            return
+        try:
+            produto, quantidade = caixa.contar(sessao, texto)
+        except ErroCaixa as e:
+            janela.bell()
+            avisar(str(e), erro=True)
+            return
+        leituras.append((produto[0], quantidade, produto[1]))
+        mostrar_leitura(produto[0], quantidade, produto[1])
+        avisar(f"+{quantidade} {produto[1]}")
+
+    def desfazer():
+        if not leituras:
+            return
+        prod_id, quantidade, nome = leituras[-1]
+        try:
+            caixa.desfazer_contagem(sessao, prod_id, quantidade)
+        except ErroCaixa as e:
+            janela.bell()
+            avisar(str(e), erro=True)
+            return
+        leituras.pop()
+        mostrar_leitura(prod_id, -quantidade, nome)
+        avisar(f"Desfeito: -{quantidade} {nome}")
+        entry_contagem.focus()
+
+    def falhou(erro):
+        if janela.winfo_exists():
+            ocupar(False)
+            messagebox.showerror("Erro", str(erro), parent=janela)
+
+    def mostrar_diferencas(diferencas):
+        if not janela.winfo_exists():
+            return
+        ocupar(False, f"{len(diferencas)} produto(s) com diferença")
+        tree_diferencas.delete(*tree_diferencas.get_children())
+        for prod_id, nome, codigo_barras, sistema, contado, diferenca in diferencas:
+            tree_diferencas.insert("", tk.END, iid=str(prod_id),
+                                   values=(nome, codigo_barras or "", sistema, contado, f"{diferenca:+d}"))
+
+    def ver_diferencas():
+        ocupar(True, "Calculando diferenças...")
+        fila_tarefas.submeter(nucleo.diferencas_contagem, sessao, var_zerar.get(),
+                              ao_concluir=mostrar_diferencas, ao_falhar=falhou)
+
+    def importar():
+        caminho = filedialog.askopenfilename(title="Importar contagem", parent=janela,
+                                             filetypes=[("Planilha CSV", "*.csv"), ("Todos os arquivos", "*.*")])
+        if not caminho:
+            return
+
+        def concluido(resultado):
+            lidas, rejeitadas = resultado
+            mensagem = f"{lidas} linhas lidas\n{len(rejeitadas)} linhas rejeitadas"
+            for linha, motivo in rejeitadas[:10]:
+                mensagem += f"\n  linha {linha}: {motivo}"
+            messagebox.showinfo("Importar Contagem", mensagem, parent=janela)
+            ver_diferencas()
+
+        ocupar(True, "Importando contagem...")
+        fila_tarefas.submeter(nucleo.importar_contagem, sessao, caminho, ao_concluir=concluido, ao_falhar=falhou)
+
+    def aplicar():
+        zerar = var_zerar.get()
+        aviso = "\n\nProdutos não contados ficarão com estoque zero!" if zerar else ""
+        if not messagebox.askyesno("Aplicar Contagem",
+                                   f"Ajustar o estoque de todos os produtos com diferença?{aviso}", parent=janela):
+            return
+
+        def concluido(ajustes):
+            caixa.aplicar_estoques(ajustes)
+            carregar_estoque()
+            recarregar_estoque_baixo()
+            if janela.winfo_exists():
+                janela.destroy()
+            messagebox.showinfo("Contagem de Estoque", f"{len(ajustes)} estoques ajustados.")
+
+        ocupar(True, "Aplicando ajustes...")
+        fila_tarefas.submeter(nucleo.aplicar_contagem, sessao, zerar, ao_concluir=concluido, ao_falhar=falhou)
+
+    def cancelar():
+        if messagebox.askyesno("Cancelar Contagem", "Descartar toda a contagem? O estoque não será alterado.",
+                               parent=janela):
+            sessao.cancelar()
+            janela.destroy()
+
+    def fechar():
+        # A contagem continua aberta no banco
+        sessao.gravar()
+        janela.destroy()
+
+    entry_contagem.bind("<Return>", ler)
+    entry_contagem.bind("<KP_Enter>", ler)
+    janela.protocol("WM_DELETE_WINDOW", fechar)
+    botoes = [ttk.Button(rodape, text=texto, command=comando)
+              for texto, comando in (("Cancelar Contagem", cancelar), ("Aplicar Ajustes", aplicar),
+                                     ("Ver Diferenças", ver_diferencas), ("Importar...", importar),
+                                     ("Desfazer Última", desfazer))]
+    for botao in botoes:
+        botao.pack(side=tk.RIGHT, padx=5)
+    if sessao.resumo()[0]:
+        avisar("Contagem retomada")
+        ver_diferencas()
+
+backup_em_andamento = False
+progresso_backup = [0, 0]
+
+@desempenho.medido
+def backup_dados(avisar=True):
+    global backup_em_andamento
+    if backup_em_andamento:
+        if avisar:
+            messagebox.showinfo("Backup", "Já existe um backup em andamento.")
+        return
+    backup_em_andamento = True
+    progresso_backup[:] = [0, 0]
+    btn_backup.config(state=tk.DISABLED)
     
-    try:
-        copy2("pdv.db", arquivo_backup)
-        messagebox.showinfo("Backup", f"Backup criado com sucesso!\nArquivo: {arquivo_backup}")
-    except Exception as e:
-        messagebox.showerror("Erro", f"Erro no backup: {str(e)}")
+    def ao_progresso(feitas, total):
+        # Chamado na thread do backup: só guarda os números
+        progresso_backup[:] = [feitas, total]
+    
+    def acompanhar():
+        if backup_em_andamento:
+            feitas, total = progresso_backup
+            if total:
+                label_backup.config(text=f"Backup: {feitas * 100 // total}%")
+            root.after(200, acompanhar)
+    
+    def finalizar(mensagem):
+        global backup_em_andamento
+        backup_em_andamento = False
+        btn_backup.config(state=tk.NORMAL)
+        label_backup.config(text=mensagem)
+    
+    def concluido(arquivo):
+        finalizar(f"Último backup: {datetime.now().strftime('%d/%m %H:%M')}")
+        if avisar:
+            messagebox.showinfo("Backup", f"Backup criado e verificado com sucesso!\nArquivo: {arquivo}")
+    
+    def falhou(erro):
+        finalizar("Backup falhou!")
+        messagebox.showerror("Erro", f"Erro no backup: {str(erro)}")
+    
+    fila_tarefas.submeter(nucleo.fazer_backup, ao_progresso, ao_concluir=concluido, ao_falhar=falhou)
+    acompanhar()
+
+def agendar_backup():
+    root.after(backup.INTERVALO_AGENDADO_HORAS * 3600 * 1000, backup_agendado)
+
+def backup_agendado():
+    backup_dados(avisar=False)
+    agendar_backup()
 
 def criar_tooltip(widget, texto):
     def on_enter(event):
@@ -451,10 +1176,265 @@ def criar_tooltip(widget, texto):
     widget.bind("<Enter>", on_enter)
     widget.bind("<Leave>", on_leave)
 
+# ---------------- Diagnóstico ----------------
+# Aba oculta (Ctrl+Shift+D ou --diagnostico) com os tempos medidos pelo
+# desempenho.py. Só é montada quando aberta e só se atualiza visível.
+frame_diagnostico = None
+tree_diagnostico = None
+label_perfil = None
+diagnostico_agendado = None
+ATUALIZAR_DIAGNOSTICO_MS = 1000
+
+def erro_em_callback(tipo, erro, rastro):
+    # Exceções não tratadas nos callbacks do Tk: vão para o log, além do aviso
+    desempenho.registrar_erro("tela", erro)
+    messagebox.showerror("Erro", f"Erro inesperado: {erro}")
+
+def alternar_diagnostico(event=None):
+    if frame_diagnostico is None:
+        montar_diagnostico()
+    elif notebook.tab(frame_diagnostico, "state") != "hidden":
+        notebook.hide(frame_diagnostico)
+        return
+    notebook.add(frame_diagnostico, text="🩺 Diagnóstico")
+    notebook.select(frame_diagnostico)
+
+def montar_diagnostico():
+    global frame_diagnostico, tree_diagnostico, label_perfil
+    frame_diagnostico = ttk.Frame(notebook, padding=10)
+
+    controles = ttk.Frame(frame_diagnostico)
+    controles.pack(fill=tk.X)
+    ttk.Label(controles, text="Limite de lentidão (ms):").pack(side=tk.LEFT)
+    var_limite = tk.StringVar(value=f"{desempenho.limite_lento_ms:g}")
+    spin_limite = ttk.Spinbox(controles, from_=1, to=10000, increment=10, width=7, textvariable=var_limite)
+    spin_limite.pack(side=tk.LEFT, padx=5)
+
+    def aplicar_limite(event=None):
+        try:
+            desempenho.definir_limite_lento(float(var_limite.get()))
+        except ValueError:
+            var_limite.set(f"{desempenho.limite_lento_ms:g}")
+
+    spin_limite.bind("<Return>", aplicar_limite)
+    spin_limite.bind("<FocusOut>", aplicar_limite)
+    ttk.Button(controles, text="Perfilar próxima venda", command=armar_perfil).pack(side=tk.LEFT, padx=5)
+    ttk.Button(controles, text="Zerar", command=desempenho.zerar).pack(side=tk.LEFT, padx=5)
+    label_perfil = ttk.Label(controles, text=f"Log: {desempenho.ARQUIVO_LOG}")
+    label_perfil.pack(side=tk.LEFT, padx=10)
+
+    colunas = ("Tipo", "Operação", "Chamadas", "Erros", "p50 ms", "p95 ms", "p99 ms", "Máx ms")
+    tree_diagnostico = ttk.Treeview(frame_diagnostico, columns=colunas, show="headings", height=20)
+    for col in colunas:
+        tree_diagnostico.heading(col, text=col)
+        tree_diagnostico.column(col, width=380 if col == "Operação" else 65,
+                                anchor=tk.W if col in ("Tipo", "Operação") else tk.E)
+    scroll = ttk.Scrollbar(frame_diagnostico, orient=tk.VERTICAL, command=tree_diagnostico.yview)
+    tree_diagnostico.configure(yscrollcommand=scroll.set)
+    tree_diagnostico.pack(side=tk.LEFT, expand=True, fill=tk.BOTH, pady=5)
+    scroll.pack(side=tk.RIGHT, fill=tk.Y)
+
+def armar_perfil():
+    desempenho.captura.armar()
+    label_perfil.config(text="Perfil: aguardando a próxima venda...")
+
+def atualizar_diagnostico():
+    global diagnostico_agendado
+    diagnostico_agendado = None
+    if frame_diagnostico is None or notebook.select() != str(frame_diagnostico):
+        return
+    tree_diagnostico.delete(*tree_diagnostico.get_children())
+    for tipo, nome, chamadas, erros, p50, p95, p99, maximo, _ in desempenho.resumo():
+        tree_diagnostico.insert("", tk.END, values=(tipo, nome, chamadas, erros, f"{p50:.2f}", f"{p95:.2f}",
+                                                    f"{p99:.2f}", f"{maximo:.2f}"))
+    captura = desempenho.captura
+    if captura.ultimo_arquivo and not captura.armada:
+        label_perfil.config(text=f"Perfil salvo: {captura.ultimo_arquivo}")
+    diagnostico_agendado = root.after(ATUALIZAR_DIAGNOSTICO_MS, atualizar_diagnostico)
+
+# ---------------- Abas sob demanda ----------------
+abas_carregadas = set()
+
+@desempenho.medido
+def ao_trocar_aba(event=None):
+    # Os dados de cada aba são consultados na primeira vez que ela é aberta
+    aba = notebook.select()
+    if frame_diagnostico is not None and aba == str(frame_diagnostico):
+        if diagnostico_agendado is None:
+            atualizar_diagnostico()
+        return
+    if aba in abas_carregadas:
+        return
+    abas_carregadas.add(aba)
+    if aba == str(frame_produtos):
+        carregar_estoque()
+    elif aba == str(frame_relatorios):
+        carregar_relatorios()
+
+# ---------------- Medição da inicialização ----------------
+def primeira_leitura():
+    # Primeiro ciclo ocioso do mainloop: janela desenhada e caixa pronto para bipar
+    root.update_idletasks()
+    marcar_inicio("janela desenhada")
+    caixa.buscar_por_codigo(CODIGO_TESTE_INICIO)
+    marcar_inicio("primeira leitura de código")
+    label_status.config(text=f"Caixa pronto em {etapas_inicio[-1][1]:.0f} ms")
+    verificar_fim_medicao()
+
+def verificar_fim_medicao():
+    # Com --medir-inicio: fecha quando a leitura e o catálogo estiverem prontos
+    etapas = dict(etapas_inicio)
+    if not MEDIR_INICIO or "primeira leitura de código" not in etapas or "catálogo em memória" not in etapas:
+        return
+    print("Inicialização (ms desde o início do main.py):")
+    for etapa, ms in etapas_inicio:
+        print(f"  {ms:>8.1f}  {etapa}")
+    print(f"Tempo até a primeira leitura: {etapas['primeira leitura de código']:.1f} ms")
+    fila_tarefas.encerrar()
+    root.destroy()
+
+# ---------------- Tabelas paginadas ----------------
+TAMANHO_PAGINA = 200
+PAGINAS_NA_TELA = 5
+
+class TreeviewPaginada:
+    # Mantém no Treeview só uma janela de até PAGINAS_NA_TELA páginas. As
+    # páginas são buscadas no pool por keyset: rolar até perto do fim traz
+    # a página seguinte à última chave carregada e descarta a do topo;
+    # rolar de volta até perto do começo busca de novo a página anterior à
+    # primeira chave e descarta a do fim. Alterações pontuais atualizam
+    # apenas as linhas afetadas que estão na janela.
+    def __init__(self, tree, scrollbar, buscar_pagina, buscar_anterior, buscar_linhas, chave):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.buscar_pagina = buscar_pagina
+        self.buscar_anterior = buscar_anterior
+        self.buscar_linhas = buscar_linhas
+        self.chave = chave
+        self.chaves = []
+        # A janela começa no começo da lista / chega ao fim dela
+        self.inicio = True
+        self.fim = False
+        self.carregando = False
+        # Respostas de antes de recarregar() são descartadas
+        self.geracao = 0
+        tree.configure(yscrollcommand=self._ao_rolar)
+
+    def recarregar(self):
+        self.geracao += 1
+        self.tree.delete(*self.tree.get_children())
+        self.chaves = []
+        self.inicio = True
+        self.fim = False
+        self.carregando = False
+        self.carregar_mais()
+
+    def carregar_mais(self):
+        if not self.fim and not self.carregando:
+            self._buscar(self.buscar_pagina, self.chaves[-1] if self.chaves else None, self._acrescentar)
+
+    def carregar_anteriores(self):
+        if not self.inicio and not self.carregando and self.chaves:
+            self._buscar(self.buscar_anterior, self.chaves[0], self._antepor)
+
+    def _buscar(self, buscar, chave, aplicar):
+        self.carregando = True
+        geracao = self.geracao
+
+        def concluido(linhas):
+            if geracao == self.geracao:
+                self.carregando = False
+                aplicar(linhas)
+
+        def falhou(erro):
+            if geracao == self.geracao:
+                self.carregando = False
+                messagebox.showerror("Erro", f"Erro ao consultar o banco: {erro}")
+
+        fila_tarefas.submeter(buscar, chave, TAMANHO_PAGINA, ao_concluir=concluido, ao_falhar=falhou)
+
+    @desempenho.medido
+    def _acrescentar(self, linhas):
+        for linha in linhas:
+            self.tree.insert("", tk.END, iid=str(linha[0]), values=linha)
+            self.chaves.append(self.chave(linha))
+        if len(linhas) < TAMANHO_PAGINA:
+            self.fim = True
+        excesso = len(self.chaves) - TAMANHO_PAGINA * PAGINAS_NA_TELA
+        if excesso > 0:
+            self.tree.delete(*self.tree.get_children()[:excesso])
+            del self.chaves[:excesso]
+            self.inicio = False
+            # As linhas visíveis continuam no mesmo lugar da tela
+            self.tree.yview_scroll(-excesso, "units")
+
+    @desempenho.medido
+    def _antepor(self, linhas):
+        # linhas vêm da mais próxima da janela para a mais distante
+        linhas = linhas[::-1]
+        for posicao, linha in enumerate(linhas):
+            self.tree.insert("", posicao, iid=str(linha[0]), values=linha)
+        self.chaves[:0] = [self.chave(linha) for linha in linhas]
+        if len(linhas) < TAMANHO_PAGINA:
+            self.inicio = True
+        self.tree.yview_scroll(len(linhas), "units")
+        excesso = len(self.chaves) - TAMANHO_PAGINA * PAGINAS_NA_TELA
+        if excesso > 0:
+            self.tree.delete(*self.tree.get_children()[-excesso:])
+            del self.chaves[-excesso:]
+            self.fim = False
+
+    def _ao_rolar(self, primeiro, ultimo):
+        self.scrollbar.set(primeiro, ultimo)
+        # Adia para não inserir linhas dentro do próprio callback de rolagem
+        if float(ultimo) > 0.9 and not self.fim:
+            self.tree.after_idle(self.carregar_mais)
+        elif float(primeiro) < 0.1 and not self.inicio:
+            self.tree.after_idle(self.carregar_anteriores)
+
+    def atualizar_linhas(self, ids):
+        self.aplicar_linhas(ids, self.buscar_linhas(ids))
+
+    def aplicar_linhas(self, ids, linhas):
+        # linhas: resultado de buscar_linhas(ids), possivelmente obtido fora da thread do Tk
+        encontrados = set()
+        for linha in linhas:
+            encontrados.add(linha[0])
+            self._aplicar_linha(linha)
+        for linha_id in ids:
+            iid = str(linha_id)
+            if linha_id not in encontrados and self.tree.exists(iid):
+                pos = self.tree.index(iid)
+                self.tree.delete(iid)
+                del self.chaves[pos]
+
+    def _aplicar_linha(self, linha):
+        iid = str(linha[0])
+        chave = self.chave(linha)
+        if self.tree.exists(iid):
+            pos = self.tree.index(iid)
+            if self.chaves[pos] == chave:
+                self.tree.item(iid, values=linha)
+                return
+            self.tree.delete(iid)
+            del self.chaves[pos]
+        # Linhas fora da janela carregada chegam pela rolagem
+        if not self.fim and (not self.chaves or chave > self.chaves[-1]):
+            return
+        if not self.inicio and self.chaves and chave < self.chaves[0]:
+            return
+        pos = bisect_left(self.chaves, chave)
+        self.tree.insert("", pos, iid=iid, values=linha)
+        self.chaves.insert(pos, chave)
+
 # ---------------- Interface ----------------
 root = tk.Tk()
-root.title("Sistema PDV - Supermercado")
+root.title(f"Sistema PDV - Supermercado (Caixa {NUMERO_CAIXA})")
 root.geometry("900x700")
+root.report_callback_exception = erro_em_callback
+
+fila_tarefas = FilaTarefas(root)
+spooler = cupom.Spooler(cupom.impressora_configurada()).iniciar()
 
 # Configuração de estilo
 style = ttk.Style()
@@ -492,14 +1472,21 @@ ttk.Label(form_frame, text="Estoque:*").grid(row=1, column=2, sticky=tk.W, pady=
 entry_estoque = ttk.Entry(form_frame, width=10)
 entry_estoque.grid(row=1, column=3, sticky=tk.W, padx=5, pady=2)
 
+ttk.Label(form_frame, text="Estoque Mínimo:").grid(row=2, column=0, sticky=tk.W, pady=2)
+entry_estoque_minimo = ttk.Entry(form_frame, width=10)
+entry_estoque_minimo.grid(row=2, column=1, sticky=tk.W, padx=5, pady=2)
+
 btn_cadastrar = ttk.Button(form_frame, text="Cadastrar Produto", command=cadastrar_produto)
-btn_cadastrar.grid(row=2, column=0, columnspan=4, pady=10)
+btn_cadastrar.grid(row=3, column=0, columnspan=2, pady=10)
+
+btn_importar = ttk.Button(form_frame, text="Importar CSV...", command=importar_produtos)
+btn_importar.grid(row=3, column=2, columnspan=2, pady=10)
 
 # Lista de produtos
 list_frame = ttk.LabelFrame(frame_produtos, text="Estoque de Produtos", padding=10)
 list_frame.pack(expand=True, fill=tk.BOTH, pady=5)
 
-columns = ("ID", "Nome", "Preço", "Estoque", "Código Barras")
+columns = ("ID", "Nome", "Preço", "Estoque", "Código Barras", "Mínimo")
 tree_estoque = ttk.Treeview(list_frame, columns=columns, show="headings", height=12)
 
 for col in columns:
@@ -507,7 +1494,8 @@ for col in columns:
     tree_estoque.column(col, width=100)
 
 scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=tree_estoque.yview)
-tree_estoque.configure(yscrollcommand=scrollbar.set)
+estoque_paginado = TreeviewPaginada(tree_estoque, scrollbar, banco.pagina_estoque, banco.pagina_estoque_anterior,
+                                    banco.linhas_estoque, chave=lambda linha: linha[1])
 
 tree_estoque.pack(side=tk.LEFT, expand=True, fill=tk.BOTH)
 scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
@@ -523,7 +1511,11 @@ add_frame.pack(fill=tk.X, pady=5)
 ttk.Label(add_frame, text="Código de Barras:").grid(row=0, column=0, sticky=tk.W, pady=2)
 entry_codigo = ttk.Entry(add_frame, width=15)
 entry_codigo.grid(row=0, column=1, padx=5, pady=2)
-entry_codigo.bind('<Return>', lambda e: buscar_por_codigo())
+entry_codigo.bind('<Return>', ao_enter_codigo)
+
+var_modo_leitor = tk.BooleanVar(value=True)
+chk_modo_leitor = ttk.Checkbutton(add_frame, text="Modo leitor", variable=var_modo_leitor)
+chk_modo_leitor.grid(row=0, column=2, sticky=tk.W, padx=5, pady=2)
 
 ttk.Label(add_frame, text="Ou digite o nome:").grid(row=1, column=0, sticky=tk.W, pady=2)
 entry_produto = ttk.Entry(add_frame, width=30)
@@ -553,9 +1545,16 @@ btn_adicionar.pack(side=tk.LEFT, padx=5)
 btn_remover = ttk.Button(button_frame, text="Remover Selecionado", command=remover_item)
 btn_remover.pack(side=tk.LEFT, padx=5)
 
+label_leitura = ttk.Label(add_frame, text="")
+label_leitura.grid(row=4, column=0, columnspan=3, sticky=tk.W)
+
 btn_finalizar = ttk.Button(button_frame, text="Finalizar Venda", command=finalizar_venda)
 btn_finalizar.pack(side=tk.LEFT, padx=5)
 
+var_imprimir = tk.BooleanVar(value=True)
+chk_imprimir = ttk.Checkbutton(button_frame, text="Imprimir cupom", variable=var_imprimir)
+chk_imprimir.pack(side=tk.LEFT, padx=5)
+
 # Carrinho de compras
 cart_frame = ttk.LabelFrame(frame_vendas, text="Carrinho de Compras", padding=10)
 cart_frame.pack(expand=True, fill=tk.BOTH, pady=5)
@@ -565,11 +1564,16 @@ lista.pack(side=tk.LEFT, expand=True, fill=tk.BOTH)
 
 scrollbar_cart = ttk.Scrollbar(cart_frame, orient=tk.VERTICAL, command=lista.yview)
 lista.configure(yscrollcommand=scrollbar_cart.set)
+lista.bind('<Double-Button-1>', alterar_quantidade)
 scrollbar_cart.pack(side=tk.RIGHT, fill=tk.Y)
 
 label_total = ttk.Label(frame_vendas, text="Total: R$ 0.00", font=("Arial", 16, "bold"))
 label_total.pack(pady=10)
 
+label_status = ttk.Label(frame_vendas, text="")
+label_status.pack()
+latencias_pronto = deque(maxlen=100)
+
 # --- Aba Relatórios ---
 frame_relatorios = ttk.Frame(notebook, padding=10)
 notebook.add(frame_relatorios, text="📊 Relatórios")
@@ -578,7 +1582,7 @@ notebook.add(frame_relatorios, text="📊 Relatórios")
 report_frame = ttk.LabelFrame(frame_relatorios, text="Vendas Realizadas", padding=10)
 report_frame.pack(expand=True, fill=tk.BOTH, pady=5)
 
-columns_vendas = ("ID", "Data", "Total R$")
+columns_vendas = ("ID", "Data", "Total R$", "Caixa")
 tree_vendas = ttk.Treeview(report_frame, columns=columns_vendas, show="headings", height=12)
 
 for col in columns_vendas:
@@ -586,7 +1590,8 @@ for col in columns_vendas:
     tree_vendas.column(col, width=100)
 
 scrollbar_vendas = ttk.Scrollbar(report_frame, orient=tk.VERTICAL, command=tree_vendas.yview)
-tree_vendas.configure(yscrollcommand=scrollbar_vendas.set)
+vendas_paginadas = TreeviewPaginada(tree_vendas, scrollbar_vendas, pagina_vendas, pagina_vendas_anterior,
+                                    banco.linhas_vendas, chave=lambda linha: -linha[0])
 
 tree_vendas.pack(side=tk.LEFT, expand=True, fill=tk.BOTH)
 scrollbar_vendas.pack(side=tk.RIGHT, fill=tk.Y)
@@ -607,30 +1612,89 @@ btn_detalhes.pack(side=tk.RIGHT, padx=5)
 btn_relatorio = ttk.Button(bottom_frame, text="Relatório por Período", command=relatorio_vendas_periodo)
 btn_relatorio.pack(side=tk.RIGHT, padx=5)
 
+btn_resumo = ttk.Button(bottom_frame, text="Reconstruir Resumo", command=reconstruir_resumo)
+btn_resumo.pack(side=tk.RIGHT, padx=5)
+
+btn_reimprimir = ttk.Button(bottom_frame, text="Reimprimir Cupons", command=reimprimir_intervalo)
+btn_reimprimir.pack(side=tk.RIGHT, padx=5)
+
+btn_exportar_relatorio = ttk.Button(bottom_frame, text="Exportar...", command=exportar_relatorio)
+btn_exportar_relatorio.pack(side=tk.RIGHT, padx=5)
+
+btn_analise = ttk.Button(bottom_frame, text="Análise de Vendas", command=analisar_vendas)
+btn_analise.pack(side=tk.RIGHT, padx=5)
+
+btn_buscar_vendas = ttk.Button(bottom_frame, text="Buscar por Produto", command=buscar_vendas_produto)
+btn_buscar_vendas.pack(side=tk.RIGHT, padx=5)
+
 # --- Menu de Utilidades ---
 menu_frame = ttk.Frame(root)
 menu_frame.pack(fill=tk.X, padx=10, pady=5)
 
-btn_estoque = ttk.Button(menu_frame, text="Verificar Estoque Baixo", command=verificar_estoque_baixo)
+btn_estoque = ttk.Button(menu_frame, text="Estoque Baixo", command=abrir_estoque_baixo)
 btn_estoque.pack(side=tk.LEFT, padx=5)
 
+btn_inventario = ttk.Button(menu_frame, text="Contagem de Estoque", command=abrir_inventario)
+btn_inventario.pack(side=tk.LEFT, padx=5)
+
 btn_backup = ttk.Button(menu_frame, text="Fazer Backup", command=backup_dados)
 btn_backup.pack(side=tk.LEFT, padx=5)
 
+label_backup = ttk.Label(menu_frame, text="")
+label_backup.pack(side=tk.LEFT, padx=5)
+
+label_cache = ttk.Label(menu_frame, text="Cache: carregando...")
+label_cache.pack(side=tk.RIGHT, padx=5)
+
+label_estoque_baixo = ttk.Label(menu_frame, text="")
+label_estoque_baixo.pack(side=tk.LEFT, padx=5)
+
+label_impressora = ttk.Label(menu_frame, text="")
+label_impressora.pack(side=tk.LEFT, padx=5)
+label_impressora.bind("<Button-1>", descartar_impressao)
+
 # Adicionar tooltips
+criar_tooltip(btn_importar, "Cadastrar ou atualizar produtos a partir de um arquivo CSV")
 criar_tooltip(btn_adicionar, "Adicionar produto ao carrinho")
 criar_tooltip(btn_remover, "Remover produto selecionado do carrinho")
 criar_tooltip(btn_finalizar, "Finalizar venda atual")
-criar_tooltip(btn_estoque, "Verificar produtos com estoque baixo")
-criar_tooltip(btn_backup, "Criar backup do banco de dados")
+criar_tooltip(chk_modo_leitor, "Enter no código lança o produto direto no carrinho (3*código para 3 unidades)")
+criar_tooltip(btn_estoque, "Painel de produtos abaixo do estoque mínimo, com pedido de compra")
+criar_tooltip(btn_inventario, "Contar o estoque com o leitor (qtd*código) e ajustar as diferenças de uma vez")
+criar_tooltip(btn_backup, "Criar backup verificado e compactado do banco de dados")
 criar_tooltip(btn_relatorio, "Gerar relatório de vendas por período")
+criar_tooltip(btn_resumo, "Recalcular o resumo diário de vendas")
+criar_tooltip(btn_reimprimir, "Reimprimir os cupons de um intervalo de vendas")
+criar_tooltip(btn_analise, "Mais vendidos, curva ABC, vendas por hora e giro de estoque")
+criar_tooltip(btn_buscar_vendas, "Encontrar produtos por parte do nome ou do código e as vendas que os tiveram")
+criar_tooltip(btn_exportar_relatorio, "Exportar vendas, itens vendidos ou estoque para CSV, Parquet ou Arrow")
 
 # ---------------- Inicialização ----------------
-lista_produtos = carregar_lista_produtos()
-carregar_estoque()
-carregar_relatorios()
-verificar_estoque_baixo()
-
-entry_produto.focus()
+marcar_inicio("interface montada")
+notebook.bind("<<NotebookTabChanged>>", ao_trocar_aba)
+notebook.select(frame_vendas)
+entry_codigo.focus()
+root.bind_all("<Control-Shift-D>", alternar_diagnostico)
+root.bind_all("<Key>", ao_teclar, add="+")
+if "--diagnostico" in sys.argv:
+    root.after_idle(alternar_diagnostico)
+
+# Venda que estava em andamento quando o programa fechou (diário do caixa)
+if carrinho:
+    for item in carrinho:
+        lista.insert(tk.END, item.descricao())
+    atualizar_total_carrinho()
+    label_status.config(text=f"Venda em andamento recuperada: {len(carrinho)} item(ns). Confira e finalize.")
+elif venda_recuperada is not None:
+    label_status.config(text=f"Venda #{venda_recuperada} foi gravada antes de o programa fechar.")
+
+# Aquecimento em segundo plano: catálogo e índice de busca, alerta de estoque
+fila_tarefas.submeter(nucleo.montar_catalogo, ao_concluir=catalogo_carregado,
+                      ao_falhar=lambda e: messagebox.showerror("Erro", f"Erro ao carregar o catálogo: {e}"))
+recarregar_estoque_baixo()
+root.after_idle(primeira_leitura)
+acompanhar_impressao()
+
+agendar_backup()
 
 root.mainloop()
\ No newline at end of file
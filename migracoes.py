@@ -0,0 +1,269 @@
+import sqlite3
+import sys
+
+# ---------------- Migrações do esquema ----------------
+# Cada migração é aplicada uma única vez, em ordem, e a versão do esquema
+# fica gravada em PRAGMA user_version. Bancos antigos (versão 0, criados
+# pelos CREATE TABLE IF NOT EXISTS originais) são atualizados no lugar.
+
+def _v1_tabelas_iniciais(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS produtos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nome TEXT NOT NULL UNIQUE,
+        preco REAL NOT NULL,
+        estoque INTEGER NOT NULL,
+        codigo_barras TEXT UNIQUE
+    )
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS vendas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        data TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        total_geral REAL
+    )
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS itens_venda (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        venda_id INTEGER,
+        produto_id INTEGER,
+        quantidade INTEGER,
+        preco_unitario REAL,
+        total_item REAL,
+        FOREIGN KEY (venda_id) REFERENCES vendas (id),
+        FOREIGN KEY (produto_id) REFERENCES produtos (id)
+    )
+    """)
+
+def _v2_vendas_diarias(cursor):
+    # Resumo diário das vendas, mantido pelo gatilho a cada venda gravada
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS vendas_diarias (
+        dia TEXT PRIMARY KEY,
+        total REAL NOT NULL DEFAULT 0,
+        quantidade INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_vendas_diarias AFTER INSERT ON vendas
+    BEGIN
+        INSERT INTO vendas_diarias (dia, total, quantidade)
+        VALUES (DATE(NEW.data), COALESCE(NEW.total_geral, 0), 1)
+        ON CONFLICT(dia) DO UPDATE SET total = total + excluded.total,
+                                       quantidade = quantidade + 1;
+    END
+    """)
+    _preencher_vendas_diarias(cursor)
+
+def _v3_indices(cursor):
+    # Datas sempre no formato 'YYYY-MM-DD HH:MM:SS': a ordem do texto é a
+    # ordem cronológica, então filtros por intervalo usam o índice direto
+    cursor.execute("""
+    UPDATE vendas SET data = strftime('%Y-%m-%d %H:%M:%S', data)
+    WHERE data IS NOT NULL AND data <> strftime('%Y-%m-%d %H:%M:%S', data)
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_vendas_data ON vendas (data)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_itens_venda_venda ON itens_venda (venda_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_itens_venda_produto ON itens_venda (produto_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_produtos_estoque ON produtos (estoque)")
+
+def _v4_estoque_minimo(cursor):
+    # Limite de reposição por produto. O padrão 5 é o limite fixo de antes
+    # (catalogo.ESTOQUE_MINIMO_PADRAO; a migração fica com o valor literal).
+    # O índice parcial só contém os produtos abaixo do mínimo e cobre a
+    # consulta do alerta, que assim não percorre a tabela inteira
+    cursor.execute("ALTER TABLE produtos ADD COLUMN estoque_minimo INTEGER NOT NULL DEFAULT 5")
+    cursor.execute("""
+    CREATE INDEX IF NOT EXISTS idx_produtos_estoque_baixo
+    ON produtos (estoque, estoque_minimo, nome, codigo_barras)
+    WHERE estoque <= estoque_minimo
+    """)
+    # Só servia ao alerta com limite fixo; cada venda deixava de atualizá-lo
+    cursor.execute("DROP INDEX IF EXISTS idx_produtos_estoque")
+
+def _v5_caixa_da_venda(cursor):
+    # Número do caixa (terminal) que gravou a venda; vendas antigas ficam no caixa 1
+    cursor.execute("ALTER TABLE vendas ADD COLUMN caixa INTEGER NOT NULL DEFAULT 1")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_vendas_caixa_data ON vendas (caixa, data)")
+
+def _v6_particoes_vendas(cursor):
+    # Meses de vendas arquivados em arquivos separados (arquivamento.py).
+    # arquivo é relativo à pasta do banco; os ids permitem achar a partição
+    # de uma venda sem abrir os arquivos.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS particoes_vendas (
+        mes TEXT PRIMARY KEY,
+        arquivo TEXT NOT NULL,
+        primeira_venda INTEGER NOT NULL,
+        ultima_venda INTEGER NOT NULL,
+        vendas INTEGER NOT NULL,
+        itens INTEGER NOT NULL,
+        total REAL NOT NULL,
+        arquivado_em TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+def _v7_busca_produtos(cursor):
+    # Índice de texto (FTS5) sobre nome e código de barras. O conteúdo fica
+    # só em produtos (content=), o índice guarda os termos e é mantido
+    # pelos gatilhos. Mudanças de estoque não disparam o gatilho de UPDATE.
+    cursor.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS produtos_busca USING fts5(
+        nome, codigo_barras,
+        content='produtos', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_produtos_busca_inserir AFTER INSERT ON produtos
+    BEGIN
+        INSERT INTO produtos_busca (rowid, nome, codigo_barras) VALUES (NEW.id, NEW.nome, NEW.codigo_barras);
+    END
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_produtos_busca_apagar AFTER DELETE ON produtos
+    BEGIN
+        INSERT INTO produtos_busca (produtos_busca, rowid, nome, codigo_barras)
+        VALUES ('delete', OLD.id, OLD.nome, OLD.codigo_barras);
+    END
+    """)
+    cursor.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_produtos_busca_alterar AFTER UPDATE OF nome, codigo_barras ON produtos
+    BEGIN
+        INSERT INTO produtos_busca (produtos_busca, rowid, nome, codigo_barras)
+        VALUES ('delete', OLD.id, OLD.nome, OLD.codigo_barras);
+        INSERT INTO produtos_busca (rowid, nome, codigo_barras) VALUES (NEW.id, NEW.nome, NEW.codigo_barras);
+    END
+    """)
+    cursor.execute("INSERT INTO produtos_busca (produtos_busca) VALUES ('rebuild')")
+
+def _v8_inventario(cursor):
+    # Contagens de estoque (inventario.py): as quantidades contadas ficam em
+    # contagem_itens até a contagem ser aplicada; cada ajuste aplicado fica
+    # em movimentos_estoque. estoque_sistema é o estoque do produto quando
+    # ele foi contado pela primeira vez na sessão.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS contagens (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        descricao TEXT,
+        caixa INTEGER NOT NULL DEFAULT 1,
+        situacao TEXT NOT NULL DEFAULT 'aberta',
+        aberta_em TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        encerrada_em TEXT,
+        ajustes INTEGER
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS contagem_itens (
+        contagem_id INTEGER NOT NULL REFERENCES contagens (id),
+        produto_id INTEGER NOT NULL REFERENCES produtos (id),
+        quantidade INTEGER NOT NULL,
+        estoque_sistema INTEGER NOT NULL,
+        PRIMARY KEY (contagem_id, produto_id)
+    ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS movimentos_estoque (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        produto_id INTEGER NOT NULL REFERENCES produtos (id),
+        data TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        tipo TEXT NOT NULL,
+        referencia INTEGER,
+        estoque_anterior INTEGER NOT NULL,
+        estoque_novo INTEGER NOT NULL,
+        diferenca INTEGER NOT NULL
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_movimentos_produto ON movimentos_estoque (produto_id, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_movimentos_referencia ON movimentos_estoque (tipo, referencia)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_contagens_situacao ON contagens (situacao)")
+
+def _v9_diario_vendas(cursor):
+    # Chave do diário (diario.py) de cada venda gravada: na recuperação,
+    # diz se a venda que estava sendo finalizada chegou ao banco. Chaves
+    # antigas são apagadas (banco.limpar_chaves_vendas).
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS diario_vendas (
+        chave TEXT PRIMARY KEY,
+        caixa INTEGER NOT NULL,
+        venda_id INTEGER NOT NULL,
+        gravada_em TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+    ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_diario_vendas_data ON diario_vendas (gravada_em)")
+
+MIGRACOES = [
+    (1, "Tabelas iniciais", _v1_tabelas_iniciais),
+    (2, "Resumo diário de vendas", _v2_vendas_diarias),
+    (3, "Índices e datas normalizadas", _v3_indices),
+    (4, "Estoque mínimo por produto", _v4_estoque_minimo),
+    (5, "Caixa de cada venda", _v5_caixa_da_venda),
+    (6, "Partições mensais de vendas", _v6_particoes_vendas),
+    (7, "Busca de texto nos produtos", _v7_busca_produtos),
+    (8, "Contagem de estoque", _v8_inventario),
+    (9, "Chave das vendas do diário", _v9_diario_vendas),
+]
+
+VERSAO_ATUAL = MIGRACOES[-1][0]
+
+def versao_esquema(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrar(conn):
+    versao = versao_esquema(conn)
+    if versao > VERSAO_ATUAL:
+        raise RuntimeError(f"Banco de dados na versão {versao}, mais nova que a suportada ({VERSAO_ATUAL})")
+
+    aplicadas = []
+    cursor = conn.cursor()
+    for numero, descricao, aplicar in MIGRACOES:
+        if numero <= versao:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Outro caixa abrindo o mesmo banco pode ter migrado antes da trava
+            if versao_esquema(conn) >= numero:
+                conn.rollback()
+                continue
+            aplicar(cursor)
+            cursor.execute(f"PRAGMA user_version = {numero}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        aplicadas.append((numero, descricao))
+    return aplicadas
+
+def _preencher_vendas_diarias(cursor, manter_arquivados=False):
+    # manter_arquivados: os dias dos meses arquivados (particoes_vendas) não
+    # estão mais inteiros em vendas, então o resumo deles fica como está
+    filtro = "WHERE substr({coluna}, 1, 7) NOT IN (SELECT mes FROM particoes_vendas)" if manter_arquivados else ""
+    cursor.execute("DELETE FROM vendas_diarias " + filtro.format(coluna="dia"))
+    cursor.execute(f"""
+    INSERT INTO vendas_diarias (dia, total, quantidade)
+    SELECT DATE(data), COALESCE(SUM(total_geral), 0), COUNT(*)
+    FROM vendas
+    {filtro.format(coluna="data")}
+    GROUP BY DATE(data)
+    """)
+
+def reconstruir_vendas_diarias(conn):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        _preencher_vendas_diarias(conn.cursor(), manter_arquivados=True)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return conn.execute("SELECT COUNT(*) FROM vendas_diarias").fetchone()[0]
+
+if __name__ == "__main__":
+    caminho = sys.argv[1] if len(sys.argv) > 1 else "pdv.db"
+    conn = sqlite3.connect(caminho)
+    for numero, descricao in migrar(conn):
+        print(f"Migração {numero} aplicada: {descricao}")
+    print(f"{caminho}: esquema na versão {versao_esquema(conn)}")
@@ -0,0 +1,347 @@
+import csv
+import sqlite3
+import time
+
+import analise
+import backup
+import banco
+import cupom
+import exportacao
+import importacao
+import inventario
+import leitor
+from carrinho import Carrinho
+from catalogo import CatalogoProdutos, IndiceBusca, validar_produto
+
+# ---------------- Núcleo do caixa ----------------
+# Regras de negócio do PDV sem dependência de interface: catálogo, carrinho,
+# gravação da venda, relatórios e backup. A tela Tk, o simulador de caixa e
+# os scripts em lote usam esta mesma API. Erros de regra sobem como
+# ErroCaixa com a mensagem pronta para mostrar ao operador.
+#
+# O catálogo e o carrinho só devem ser alterados por uma thread (a da tela,
+# no caso do Tk); as funções marcadas "thread-safe" podem rodar no pool.
+
+class ErroCaixa(Exception):
+    pass
+
+class SemEstoque(ErroCaixa):
+    def __init__(self, disponivel):
+        super().__init__(f"Estoque insuficiente! Disponível: {disponivel}")
+        self.disponivel = disponivel
+
+class VendaFinalizada:
+    def __init__(self, venda_id, total_centavos, ids_produtos, inicio_pronto):
+        self.venda_id = venda_id
+        self.total_centavos = total_centavos
+        self.ids_produtos = ids_produtos
+        # perf_counter() logo após o commit, para medir quando o caixa fica livre
+        self.inicio_pronto = inicio_pronto
+
+def validar_quantidade(texto):
+    try:
+        quantidade = int(texto)
+    except (TypeError, ValueError):
+        raise ErroCaixa("Quantidade inválida!")
+    if quantidade <= 0:
+        raise ErroCaixa("Quantidade deve ser maior que zero!")
+    return quantidade
+
+def montar_catalogo():
+    # Thread-safe: lê pelo conector de leitura e devolve objetos novos
+    novo_catalogo = CatalogoProdutos()
+    novo_catalogo.carregar(banco.listar_produtos())
+    novo_indice = IndiceBusca(novo_catalogo)
+    novo_indice.carregar(banco.frequencia_vendas())
+    return novo_catalogo, novo_indice
+
+class Caixa:
+    def __init__(self, caminho=None, carregar_catalogo=True, numero=1, registrar_venda=None, diario=None):
+        # carregar_catalogo=False: o catálogo é montado depois (ex.: no pool
+        # com montar_catalogo()) e entregue por trocar_catalogo(). Até lá as
+        # buscas vão direto ao banco e o caixa já pode vender.
+        # numero: identifica o caixa nas vendas gravadas. registrar_venda:
+        # quem grava a venda (padrão banco.registrar_venda; com o servidor de
+        # vendas, ClienteVendas.registrar_venda). diario: diario.Diario em que
+        # o carrinho é anotado; recuperar_diario() antes da primeira venda.
+        if caminho is not None:
+            banco.iniciar(caminho)
+        self.numero = numero
+        self.registrar_venda = registrar_venda or banco.registrar_venda
+        self.diario = diario
+        self.carrinho = Carrinho()
+        self.catalogo_pronto = False
+        self._alterados_sem_catalogo = set()
+        if carregar_catalogo:
+            self.trocar_catalogo(*montar_catalogo())
+        else:
+            self.catalogo = CatalogoProdutos()
+            self.indice_busca = IndiceBusca(self.catalogo)
+
+    # --- Catálogo ---
+    def cadastrar_produto(self, nome, preco, estoque, codigo_barras=None, estoque_minimo=None):
+        try:
+            nome, preco, estoque, codigo_barras, estoque_minimo = validar_produto(
+                nome, preco, estoque, codigo_barras, estoque_minimo)
+        except ValueError as e:
+            raise ErroCaixa(str(e))
+        try:
+            prod_id = banco.inserir_produto(nome, preco, estoque, codigo_barras, estoque_minimo)
+        except sqlite3.IntegrityError as e:
+            if "nome" in str(e):
+                raise ErroCaixa("Já existe um produto com este nome!")
+            raise ErroCaixa("Já existe um produto com este código de barras!")
+        pos = self.catalogo.adicionar(prod_id, nome, preco, estoque, codigo_barras, estoque_minimo)
+        self.indice_busca.adicionar(pos, nome)
+        if not self.catalogo_pronto:
+            self._alterados_sem_catalogo.add(prod_id)
+        return prod_id
+
+    def preparar_importacao(self, caminho):
+        # Thread-safe: importa e monta o catálogo novo, que trocar_catalogo() aplica
+        resultado = importacao.importar_csv(caminho)
+        return (resultado,) + montar_catalogo()
+
+    def trocar_catalogo(self, catalogo, indice_busca):
+        self.catalogo = catalogo
+        self.indice_busca = indice_busca
+        self.catalogo_pronto = True
+        if self._alterados_sem_catalogo:
+            # O catálogo pode ter sido lido antes dessas vendas e cadastros:
+            # relê os produtos afetados
+            for linha in banco.linhas_estoque(self._alterados_sem_catalogo):
+                if linha[0] in catalogo.por_id:
+                    catalogo.definir_estoque(linha[0], linha[3])
+                else:
+                    indice_busca.adicionar(catalogo.adicionar(*linha), linha[1])
+            self._alterados_sem_catalogo.clear()
+
+    def importar_csv(self, caminho):
+        resultado, catalogo, indice_busca = self.preparar_importacao(caminho)
+        self.trocar_catalogo(catalogo, indice_busca)
+        return resultado
+
+    def sugestoes(self, texto, limite=5):
+        if not texto.strip():
+            return []
+        if not self.catalogo_pronto:
+            # Até o catálogo carregar, pelo índice de texto do banco
+            return [linha[1] for linha in banco.buscar_produtos(texto, limite)]
+        return self.indice_busca.buscar(texto, limite)
+
+    def buscar_por_codigo(self, codigo):
+        if not self.catalogo_pronto:
+            return banco.produto_por_codigo(codigo.strip())
+        return self.catalogo.buscar_por_codigo(codigo.strip())
+
+    def buscar_por_nome(self, nome):
+        if not self.catalogo_pronto:
+            return banco.produto_por_nome(nome)
+        return self.catalogo.buscar_por_nome(nome)
+
+    def buscar_por_id(self, prod_id):
+        if not self.catalogo_pronto:
+            return banco.produto_por_id(prod_id)
+        return self.catalogo.buscar_por_id(prod_id)
+
+    # --- Carrinho ---
+    def adicionar_por_nome(self, nome, quantidade):
+        if not nome.strip():
+            raise ErroCaixa("Digite o nome do produto!")
+        return self._adicionar(self.buscar_por_nome(nome.strip()), quantidade)
+
+    def adicionar_por_codigo(self, codigo, quantidade=1):
+        return self._adicionar(self.buscar_por_codigo(codigo), quantidade)
+
+    def ler_codigo(self, texto):
+        # Leitura do leitor ou código digitado: "codigo" ou "qtd*codigo"
+        try:
+            quantidade, codigo = leitor.interpretar(texto)
+        except leitor.ErroLeitura as e:
+            raise ErroCaixa(str(e))
+        produto = self.buscar_por_codigo(codigo)
+        if produto is None:
+            raise ErroCaixa(f"Código {codigo} não cadastrado!")
+        return self._adicionar(produto, quantidade)
+
+    def _adicionar(self, produto, quantidade):
+        # Retorna (item, nova_linha), como Carrinho.adicionar()
+        if produto is None:
+            raise ErroCaixa("Produto não encontrado!")
+        prod_id, nome, preco, estoque = produto
+        # Desconta o que já está no carrinho para o mesmo produto
+        estoque -= self.carrinho.quantidade_de(prod_id)
+        if estoque < quantidade:
+            raise SemEstoque(estoque)
+        item, nova_linha = self.carrinho.adicionar(prod_id, nome, preco, quantidade)
+        if self.diario is not None:
+            self.diario.adicionou(item, quantidade)
+        return item, nova_linha
+
+    def alterar_quantidade(self, posicao, quantidade):
+        item = self.carrinho.ordem[posicao]
+        produto = self.buscar_por_id(item.produto_id)
+        if produto is not None and produto[3] < quantidade:
+            raise SemEstoque(produto[3])
+        item = self.carrinho.alterar_quantidade(posicao, quantidade)
+        if self.diario is not None:
+            self.diario.alterou(posicao, quantidade)
+        return item
+
+    def remover_item(self, posicao):
+        item = self.carrinho.remover(posicao)
+        if self.diario is not None:
+            self.diario.removeu(posicao)
+        return item
+
+    def finalizar_venda(self):
+        if not self.carrinho:
+            raise ErroCaixa("Nenhum item no carrinho!")
+        chave = self.diario.finalizando() if self.diario is not None else None
+        try:
+            venda_id = self.registrar_venda(self.carrinho.total, self.carrinho.itens_para_venda(), self.numero,
+                                            chave)
+        except banco.EstoqueInsuficiente as e:
+            # Outro caixa vendeu antes: corrige o cache e deixa o carrinho como está
+            for prod_id, disponivel, pedido in e.faltas:
+                self.catalogo.definir_estoque(prod_id, disponivel)
+            raise
+        inicio_pronto = time.perf_counter()
+        if self.diario is not None:
+            self.diario.gravada(chave, venda_id)
+
+        for item in self.carrinho:
+            self.catalogo.baixar_estoque(item.produto_id, item.quantidade)
+            self.indice_busca.registrar_venda(item.produto_id, item.quantidade)
+        if not self.catalogo_pronto:
+            self._alterados_sem_catalogo.update(self.carrinho.itens)
+
+        venda = VendaFinalizada(venda_id, self.carrinho.total_centavos, list(self.carrinho.itens), inicio_pronto)
+        self.carrinho.limpar()
+        return venda
+
+    def recuperar_diario(self):
+        # Na abertura: refaz o carrinho que o programa deixou no diário.
+        # Retorna o id da venda que estava sendo finalizada se ela chegou ao
+        # banco (o carrinho fica vazio), senão None
+        recuperacao = self.diario.recuperar()
+        banco.limpar_chaves_vendas()
+        if recuperacao.chave is not None:
+            venda_id = banco.venda_da_chave(recuperacao.chave)
+            if venda_id is not None:
+                self.diario.gravada(recuperacao.chave, venda_id)
+                return venda_id
+        for item in recuperacao.carrinho:
+            self.carrinho.adicionar(item.produto_id, item.nome, item.preco_centavos / 100, item.quantidade)
+        return None
+
+    # --- Contagem de estoque ---
+    def sessao_contagem(self, descricao=None):
+        # Retoma a contagem que ficou aberta ou abre uma nova
+        sessao = inventario.retomar(self.buscar_por_codigo)
+        return sessao or inventario.abrir(descricao, self.numero, self.buscar_por_codigo)
+
+    def contar(self, sessao, texto):
+        # ((id, nome, preco, estoque), quantidade) da leitura "codigo" ou "qtd*codigo"
+        try:
+            return sessao.registrar(texto)
+        except inventario.ErroInventario as e:
+            raise ErroCaixa(str(e))
+
+    def desfazer_contagem(self, sessao, produto_id, quantidade):
+        try:
+            sessao.desfazer(produto_id, quantidade)
+        except inventario.ErroInventario as e:
+            raise ErroCaixa(str(e))
+
+    def aplicar_estoques(self, ajustes):
+        # Estoques gravados por aplicar_contagem(): [(produto_id, estoque)]
+        for prod_id, estoque in ajustes:
+            self.catalogo.definir_estoque(prod_id, estoque)
+        if not self.catalogo_pronto:
+            self._alterados_sem_catalogo.update(prod_id for prod_id, _ in ajustes)
+
+    def nome_no_carrinho(self, prod_id):
+        item = self.carrinho.itens.get(prod_id)
+        return item.nome if item else prod_id
+
+# ---------------- Relatórios ----------------
+# Todas thread-safe (só leitura)
+def relatorio_periodo(inicio, fim):
+    linhas = banco.vendas_periodo(inicio, fim)
+    return linhas, sum(linha[1] for linha in linhas)
+
+def estoque_baixo():
+    return banco.produtos_estoque_baixo()
+
+def buscar_produtos(texto):
+    # Por palavras do nome ou começo do código de barras, em qualquer ordem
+    if not texto.strip():
+        raise ErroCaixa("Digite parte do nome ou do código de barras!")
+    return banco.buscar_produtos(texto)
+
+def vendas_do_produto(produto_ids, apos_item=None):
+    # (linhas, cursor da próxima página ou None): ver banco.vendas_com_produtos
+    if not produto_ids:
+        raise ErroCaixa("Selecione pelo menos um produto!")
+    return banco.vendas_com_produtos(produto_ids, apos_item)
+
+def quantidade_sugerida(estoque, estoque_minimo):
+    # Repõe até o dobro do mínimo (pelo menos uma unidade)
+    return max(1, 2 * estoque_minimo - estoque)
+
+def exportar_pedido_compra(caminho, produtos=None):
+    # produtos: linhas como as de estoque_baixo(); sem elas, consulta o banco
+    produtos = estoque_baixo() if produtos is None else produtos
+    with open(caminho, "w", newline="", encoding="utf-8") as arquivo:
+        escritor = csv.writer(arquivo, delimiter=";")
+        escritor.writerow(["produto_id", "codigo_barras", "nome", "estoque", "estoque_minimo", "quantidade_sugerida"])
+        for prod_id, nome, estoque, estoque_minimo, codigo_barras in produtos:
+            escritor.writerow([prod_id, codigo_barras or "", nome, estoque, estoque_minimo,
+                               quantidade_sugerida(estoque, estoque_minimo)])
+    return len(produtos)
+
+def exportar_relatorio(relatorio, caminho, inicio=None, fim=None, ao_progresso=None):
+    # relatorio: uma das chaves de exportacao.RELATORIOS; o formato vem da extensão
+    try:
+        return exportacao.exportar(relatorio, caminho, inicio, fim, ao_progresso)
+    except exportacao.ErroExportacao as e:
+        raise ErroCaixa(str(e))
+
+def analisar_vendas(inicio, fim):
+    # Mais vendidos, curva ABC, vendas por hora e giro de estoque (analise.Analise)
+    try:
+        return analise.analisar(inicio, fim)
+    except analise.ErroAnalise as e:
+        raise ErroCaixa(str(e))
+
+# ---------------- Contagem de estoque ----------------
+# Thread-safe desde que a sessão não seja usada pela tela ao mesmo tempo
+def diferencas_contagem(sessao, zerar_nao_contados=False):
+    return sessao.diferencas(zerar_nao_contados)
+
+def aplicar_contagem(sessao, zerar_nao_contados=False):
+    # Os estoques novos ainda precisam ir ao catálogo (Caixa.aplicar_estoques)
+    try:
+        return sessao.aplicar(zerar_nao_contados)
+    except inventario.ErroInventario as e:
+        raise ErroCaixa(str(e))
+
+def importar_contagem(sessao, caminho):
+    # (linhas lidas, [(linha, motivo)] rejeitadas)
+    try:
+        return inventario.importar_csv(sessao, caminho)
+    except (inventario.ErroInventario, OSError, UnicodeDecodeError) as e:
+        raise ErroCaixa(f"Não foi possível importar a contagem: {e}")
+
+# ---------------- Cupom ----------------
+def texto_cupom(venda_id):
+    dados = cupom.dados_venda(venda_id)
+    if dados is None:
+        raise ErroCaixa("Venda não encontrada!")
+    return cupom.como_texto(cupom.renderizar(dados))
+
+# ---------------- Backup ----------------
+def fazer_backup(ao_progresso=None):
+    # Thread-safe: copia o banco aberto por banco.iniciar()
+    return backup.fazer_backup(banco.caminho_banco(), ao_progresso=ao_progresso)
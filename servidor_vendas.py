@@ -0,0 +1,120 @@
+import json
+import socket
+import socketserver
+import sys
+import threading
+
+import banco
+
+# ---------------- Servidor de vendas ----------------
+# Modo opcional para vários caixas: um único processo grava todas as
+# vendas, uma de cada vez, e os caixas enviam a venda por TCP local em
+# vez de abrir transações de escrita no banco. Cada caixa continua lendo
+# o banco direto (catálogo, relatórios). Protocolo: uma linha JSON por
+# pedido e uma por resposta. Com --durabilidade grupo as vendas que chegam
+# juntas de vários caixas são gravadas numa transação só (ver
+# banco.definir_durabilidade).
+#
+#   python servidor_vendas.py [pdv.db] [porta] [--durabilidade normal|total|grupo]
+#   python main.py --caixa 2 --servidor 127.0.0.1:5310
+
+ENDERECO_PADRAO = "127.0.0.1"
+PORTA_PADRAO = 5310
+TEMPO_LIMITE = 30
+
+class ErroServidor(Exception):
+    pass
+
+class _Atendimento(socketserver.StreamRequestHandler):
+    def handle(self):
+        for linha in self.rfile:
+            try:
+                pedido = json.loads(linha)
+                venda_id = self.server.registrar_venda(pedido["total"], [tuple(item) for item in pedido["itens"]],
+                                                       pedido.get("caixa", 1), pedido.get("chave"))
+                resposta = {"venda_id": venda_id}
+            except banco.EstoqueInsuficiente as e:
+                resposta = {"faltas": e.faltas}
+            except Exception as e:
+                resposta = {"erro": str(e)}
+            self.wfile.write(json.dumps(resposta).encode() + b"\n")
+
+class ServidorVendas(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+def servir(caminho=banco.CAMINHO_BANCO, porta=PORTA_PADRAO, endereco=ENDERECO_PADRAO, pronto=None,
+           durabilidade="normal"):
+    # pronto: threading/multiprocessing Event avisado quando a porta estiver aberta
+    banco.iniciar(caminho)
+    with ServidorVendas((endereco, porta), _Atendimento) as servidor:
+        servidor.registrar_venda = banco.definir_durabilidade(durabilidade)
+        if pronto is not None:
+            pronto.set()
+        servidor.serve_forever()
+
+def ler_endereco(texto):
+    endereco, _, porta = texto.rpartition(":")
+    return endereco or ENDERECO_PADRAO, int(porta or PORTA_PADRAO)
+
+class ClienteVendas:
+    # Mesmo contrato de banco.registrar_venda, para ser usado por nucleo.Caixa
+    def __init__(self, endereco=ENDERECO_PADRAO, porta=PORTA_PADRAO):
+        self.endereco = (endereco, porta)
+        self._trava = threading.Lock()
+        self._conexao = None
+        self._arquivo = None
+
+    def _conectar(self):
+        self._conexao = socket.create_connection(self.endereco, timeout=TEMPO_LIMITE)
+        self._conexao.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._arquivo = self._conexao.makefile("rwb")
+
+    def fechar(self):
+        if self._conexao is not None:
+            self._arquivo.close()
+            self._conexao.close()
+            self._conexao = self._arquivo = None
+
+    def _enviar(self, pedido):
+        if self._conexao is None:
+            self._conectar()
+        self._arquivo.write(json.dumps(pedido).encode() + b"\n")
+        self._arquivo.flush()
+        linha = self._arquivo.readline()
+        if not linha:
+            raise ConnectionError("Servidor de vendas fechou a conexão")
+        return json.loads(linha)
+
+    def registrar_venda(self, total_geral, itens, caixa=1, chave=None):
+        pedido = {"total": total_geral, "itens": [list(item) for item in itens], "caixa": caixa, "chave": chave}
+        with self._trava:
+            try:
+                resposta = self._enviar(pedido)
+            except (ConnectionError, socket.timeout) as e:
+                # Sem resposta não dá para saber se a venda foi gravada: não reenvia
+                # (finalizar de novo com a mesma chave do diário não duplica)
+                self.fechar()
+                raise ErroServidor(f"Falha na comunicação com o servidor de vendas: {e}")
+            except OSError as e:
+                # Não conectou: a venda não chegou a ser enviada
+                self.fechar()
+                raise ErroServidor(f"Servidor de vendas indisponível: {e}")
+        if "faltas" in resposta:
+            raise banco.EstoqueInsuficiente([tuple(falta) for falta in resposta["faltas"]])
+        if "erro" in resposta:
+            raise ErroServidor(resposta["erro"])
+        return resposta["venda_id"]
+
+if __name__ == "__main__":
+    durabilidade = "normal"
+    if "--durabilidade" in sys.argv[:-1]:
+        durabilidade = sys.argv[sys.argv.index("--durabilidade") + 1]
+    argumentos = [arg for arg in sys.argv[1:] if not arg.startswith("--") and arg != durabilidade]
+    caminho = argumentos[0] if argumentos else banco.CAMINHO_BANCO
+    porta = int(argumentos[1]) if len(argumentos) > 1 else PORTA_PADRAO
+    print(f"Servidor de vendas em {ENDERECO_PADRAO}:{porta} gravando em {caminho} (durabilidade {durabilidade})")
+    try:
+        servir(caminho, porta, durabilidade=durabilidade)
+    except KeyboardInterrupt:
+        pass
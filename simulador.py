@@ -0,0 +1,73 @@
+import random
+import sys
+import time
+
+import banco
+from nucleo import Caixa, ErroCaixa
+
+# ---------------- Simulador de caixa ----------------
+# Passa vendas pelo núcleo (nucleo.Caixa) sem interface, o mais rápido
+# possível: bipa códigos de barras sorteados, finaliza a venda e mede o
+# tempo de cada finalização. As vendas são gravadas de verdade, então use
+# uma cópia do banco.
+#
+#   python simulador.py copia.db [vendas] [itens_por_venda] [semente]
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+def simular(caixa, vendas, itens_por_venda, semente=None):
+    sorteio = random.Random(semente)
+    codigos = [codigo for codigo in caixa.catalogo.codigos if codigo]
+    if not codigos:
+        raise ErroCaixa("Nenhum produto com código de barras para simular")
+
+    latencias = []
+    itens_vendidos = recusados = 0
+    inicio = time.perf_counter()
+    for _ in range(vendas):
+        for _ in range(itens_por_venda):
+            try:
+                caixa.adicionar_por_codigo(sorteio.choice(codigos), sorteio.randint(1, 3))
+            except ErroCaixa:
+                recusados += 1
+        if not caixa.carrinho:
+            continue
+        itens_vendidos += len(caixa.carrinho)
+        antes = time.perf_counter()
+        try:
+            caixa.finalizar_venda()
+        except banco.EstoqueInsuficiente:
+            caixa.carrinho.limpar()
+            recusados += 1
+            continue
+        latencias.append((time.perf_counter() - antes) * 1000)
+    duracao = time.perf_counter() - inicio
+
+    return {
+        "vendas": len(latencias),
+        "itens": itens_vendidos,
+        "recusados": recusados,
+        "segundos": duracao,
+        "vendas_por_segundo": len(latencias) / duracao if duracao else 0.0,
+        "p50_ms": percentil(latencias, 50),
+        "p99_ms": percentil(latencias, 99),
+    }
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python simulador.py copia.db [vendas] [itens_por_venda] [semente]")
+        sys.exit(2)
+    vendas = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    itens = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    semente = int(sys.argv[4]) if len(sys.argv) > 4 else None
+
+    caixa = Caixa(sys.argv[1])
+    resultado = simular(caixa, vendas, itens, semente)
+    banco.fechar()
+    print(f"{resultado['vendas']} vendas ({resultado['itens']} linhas, {resultado['recusados']} recusas) "
+          f"em {resultado['segundos']:.2f} s: {resultado['vendas_por_segundo']:.0f} vendas/s, "
+          f"p50 {resultado['p50_ms']:.2f} ms, p99 {resultado['p99_ms']:.2f} ms")
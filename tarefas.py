@@ -0,0 +1,51 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+import desempenho
+
+# ---------------- Fila de tarefas em segundo plano ----------------
+# Trabalho lento (impressão, consultas de relatório, atualização das
+# tabelas) roda num pool de threads. O Tkinter não é thread-safe, então os
+# resultados voltam por uma fila que a thread do Tk esvazia via root.after.
+# Tarefas e callbacks entram na medição de desempenho.
+
+class FilaTarefas:
+    def __init__(self, raiz, trabalhadores=3, intervalo_ms=20):
+        self.raiz = raiz
+        self.intervalo_ms = intervalo_ms
+        self.executor = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix="pdv-tarefa")
+        self.resultados = queue.SimpleQueue()
+        self.pendentes = 0
+        self._agendado = None
+
+    def submeter(self, funcao, *args, ao_concluir=None, ao_falhar=None):
+        self.pendentes += 1
+        futuro = self.executor.submit(desempenho.medir_chamada, "tarefa", funcao, *args)
+        futuro.add_done_callback(lambda f: self.resultados.put((f, ao_concluir, ao_falhar)))
+        if self._agendado is None:
+            self._agendado = self.raiz.after(self.intervalo_ms, self._bombear)
+        return futuro
+
+    def _bombear(self):
+        # Sempre na thread do Tk: entrega os resultados prontos aos callbacks
+        self._agendado = None
+        try:
+            while True:
+                try:
+                    futuro, ao_concluir, ao_falhar = self.resultados.get_nowait()
+                except queue.Empty:
+                    break
+                self.pendentes -= 1
+                erro = futuro.exception()
+                if erro is not None:
+                    desempenho.registrar_erro("tarefa", erro)
+                    if ao_falhar is not None:
+                        desempenho.medir_chamada("tela", ao_falhar, erro)
+                elif ao_concluir is not None:
+                    desempenho.medir_chamada("tela", ao_concluir, futuro.result())
+        finally:
+            if self.pendentes and self._agendado is None:
+                self._agendado = self.raiz.after(self.intervalo_ms, self._bombear)
+
+    def encerrar(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
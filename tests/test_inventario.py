@@ -0,0 +1,51 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import banco
+import inventario
+
+class TestDesfazer(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        banco.iniciar(os.path.join(self.pasta.name, "pdv.db"))
+        self.produto_id = banco.inserir_produto("Arroz", 10.0, 5, "7890000000001", None)
+        self.sessao = inventario.abrir("Teste")
+
+    def tearDown(self):
+        banco.fechar()
+        self.pasta.cleanup()
+
+    def contado(self):
+        self.sessao.gravar()
+        return banco.quantidade_contada(self.sessao.id, self.produto_id)
+
+    def test_desfaz_leitura_pendente(self):
+        self.sessao.registrar("3*7890000000001")
+        self.sessao.desfazer(self.produto_id, 2)
+        self.assertEqual(self.contado(), 1)
+
+    def test_desfaz_leitura_gravada(self):
+        self.sessao.registrar("3*7890000000001")
+        self.sessao.gravar()
+        self.sessao.desfazer(self.produto_id, 3)
+        self.assertEqual(self.contado(), 0)
+
+    def test_nao_desfaz_mais_que_o_contado(self):
+        self.sessao.registrar("2*7890000000001")
+        self.sessao.gravar()
+        self.sessao.registrar("7890000000001")
+        with self.assertRaises(inventario.ErroInventario):
+            self.sessao.desfazer(self.produto_id, 4)
+        self.assertEqual(self.contado(), 3)
+
+    def test_nao_desfaz_produto_nao_contado(self):
+        with self.assertRaises(inventario.ErroInventario):
+            self.sessao.desfazer(self.produto_id, 1)
+        self.assertEqual(self.contado(), 0)
+
+if __name__ == "__main__":
+    unittest.main()